@@ -0,0 +1,190 @@
+"""
+Text chunking for ingestion.
+
+Chunks are up to ``chunk_size`` units long (characters, or tokens with
+``unit="tokens"``) and overlap the previous chunk by ``overlap`` units.
+A chunk that does not reach the end of the text is cut after the last
+sentence end (``.``, ``!`` or ``?``) within ``SENTENCE_LOOKBACK``
+characters of its limit. Sentence ends are found with one regex pass and
+looked up by binary search, so chunking is linear in the text length.
+Every chunk starts after the previous one, whatever the sizes, so the
+chunker always terminates.
+"""
+
+import re
+import logging
+from bisect import bisect_right
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_END = re.compile(r"[.!?]")
+# How far back (in characters) from a chunk's limit to look for a sentence end
+SENTENCE_LOOKBACK = 100
+# Default tokenization for unit="tokens": whitespace-separated words
+WORD = re.compile(r"\S+")
+
+CHUNK_UNITS = ("chars", "tokens")
+
+Tokenizer = Callable[[str], List[Tuple[int, int]]]
+
+class Chunk(NamedTuple):
+    """A chunk and its [start, end) character offsets in the source text"""
+    text: str
+    start: int
+    end: int
+
+def word_spans(text: str) -> List[Tuple[int, int]]:
+    """Character spans of whitespace-separated words"""
+    return [match.span() for match in WORD.finditer(text)]
+
+def chunk_spans(text: str, chunk_size: int = 1000, overlap: int = 200, unit: str = "chars",
+                tokenizer: Optional[Tokenizer] = None) -> List[Chunk]:
+    """
+    Split text into overlapping chunks with their character offsets.
+
+    Args:
+        text: Text to split
+        chunk_size: Size of each chunk, in ``unit``s
+        overlap: Number of units shared with the previous chunk
+        unit: "chars", or "tokens" to size chunks by ``tokenizer`` tokens
+        tokenizer: Returns (start, end) character spans of the tokens in a
+            text; defaults to whitespace-separated words
+
+    Returns:
+        Chunks in text order. Text no longer than ``chunk_size`` comes
+        back whole and unstripped; otherwise chunks are whitespace-stripped
+        and empty ones are dropped.
+    """
+    _check_sizes(chunk_size, overlap, unit)
+    spans = (tokenizer or word_spans)(text) if unit == "tokens" else None
+    if (len(spans) if spans is not None else len(text)) <= chunk_size:
+        return [Chunk(text, 0, len(text))] if text.strip() else []
+    chunks, _ = _scan(text, 0, chunk_size, overlap, spans, final=True)
+    return chunks
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200, unit: str = "chars",
+               tokenizer: Optional[Tokenizer] = None) -> List[str]:
+    """
+    Split text into overlapping chunks for better context preservation.
+
+    Args:
+        text: Text to split
+        chunk_size: Size of each chunk
+        overlap: Number of characters (or tokens) to overlap between chunks
+
+    Returns:
+        List of text chunks
+    """
+    chunks = [chunk.text for chunk in chunk_spans(text, chunk_size, overlap, unit, tokenizer)]
+    # %-style arguments so the message is only built when DEBUG is enabled
+    logger.debug("Split text into %d chunks with size %d and overlap %d", len(chunks), chunk_size, overlap)
+    return chunks
+
+def iter_chunk_spans(windows: Iterable[str], chunk_size: int = 1000, overlap: int = 200, unit: str = "chars",
+                     tokenizer: Optional[Tokenizer] = None) -> Iterator[Chunk]:
+    """
+    Streaming version of chunk_spans over text arriving in windows.
+
+    Yields the same chunks chunk_spans would return for the joined text,
+    while only holding roughly one window plus one chunk in memory.
+    """
+    _check_sizes(chunk_size, overlap, unit)
+    windows = iter(windows)
+    buffer = ""
+    base = 0  # offset of buffer[0] in the full text
+    started = False
+    for window in windows:
+        buffer += window
+        spans = (tokenizer or word_spans)(buffer) if unit == "tokens" else None
+        if not started and (len(spans) if spans is not None else len(buffer)) <= chunk_size:
+            continue  # may still turn out to be a single whole-text chunk
+        started = True
+        chunks, resume = _scan(buffer, 0, chunk_size, overlap, spans, final=False)
+        for chunk in chunks:
+            yield Chunk(chunk.text, chunk.start + base, chunk.end + base)
+        # Drop consumed text so the buffer stays bounded
+        buffer = buffer[resume:]
+        base += resume
+
+    if not started:
+        yield from chunk_spans(buffer, chunk_size, overlap, unit, tokenizer)
+        return
+    spans = (tokenizer or word_spans)(buffer) if unit == "tokens" else None
+    chunks, _ = _scan(buffer, 0, chunk_size, overlap, spans, final=True)
+    for chunk in chunks:
+        yield Chunk(chunk.text, chunk.start + base, chunk.end + base)
+
+def iter_chunks(windows: Iterable[str], chunk_size: int = 1000, overlap: int = 200, unit: str = "chars",
+                tokenizer: Optional[Tokenizer] = None) -> Iterator[str]:
+    """Generator version of chunk_text over text arriving in windows"""
+    for chunk in iter_chunk_spans(windows, chunk_size, overlap, unit, tokenizer):
+        yield chunk.text
+
+def _check_sizes(chunk_size: int, overlap: int, unit: str):
+    if unit not in CHUNK_UNITS:
+        raise ValueError(f"Unknown chunk unit: {unit}")
+    if chunk_size <= 0:
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+    if overlap < 0:
+        raise ValueError(f"overlap must not be negative, got {overlap}")
+
+def _scan(text: str, start: int, chunk_size: int, overlap: int, spans: Optional[List[Tuple[int, int]]],
+          final: bool) -> Tuple[List[Chunk], int]:
+    """
+    Chunk ``text`` from unit ``start``.
+
+    Positions are counted in characters, or in tokens when ``spans`` gives
+    the tokens' character spans. Unless ``final``, the text may continue
+    past its end, so scanning stops before the first chunk that could
+    still change; the character offset to resume from is returned.
+    """
+    if spans is None:
+        n_units = len(text)
+        starts = ends = None
+        safe_limit = len(text)
+    else:
+        n_units = len(spans)
+        starts = [span[0] for span in spans]
+        ends = [span[1] for span in spans]
+        # The last token may be cut off by the end of the window
+        safe_limit = starts[-1] if spans else 0
+
+    def char_start(u: int) -> int:
+        return u if starts is None else starts[u]
+
+    def char_end(u: int) -> int:
+        # End of the first ``u`` units
+        return u if ends is None else ends[u - 1]
+
+    boundaries = [match.end() for match in SENTENCE_END.finditer(text)]
+    chunks: List[Chunk] = []
+    u = start
+    while u < n_units:
+        last = min(u + chunk_size, n_units)
+        end = char_end(last)
+        if not final and (last >= n_units or end >= safe_limit):
+            break
+        if last < n_units:
+            # Cut after the last sentence end near the limit, if there is one
+            floor = max(end - SENTENCE_LOOKBACK, char_start(u))
+            i = bisect_right(boundaries, end) - 1
+            if i >= 0 and boundaries[i] > floor:
+                snapped = boundaries[i] if ends is None else bisect_right(ends, boundaries[i])
+                if snapped > u:
+                    last = snapped
+                    end = char_end(last)
+
+        begin = char_start(u)
+        segment = text[begin:end]
+        stripped = segment.strip()
+        if stripped:
+            lead = len(segment) - len(segment.lstrip())
+            chunks.append(Chunk(stripped, begin + lead, begin + lead + len(stripped)))
+
+        if last >= n_units:
+            u = n_units
+            break
+        # Overlap with the previous chunk, but always move forward
+        u = last - overlap if last - overlap > u else last
+    return chunks, char_start(u) if u < n_units else len(text)
@@ -1,72 +1,292 @@
 import os
 import json
+import time
 import logging
-from typing import List, Dict, Any
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from typing import Callable, List, Dict, Any, Iterable, Iterator, Optional, Set, TextIO, Tuple
 from pathlib import Path
+import numpy as np
 from .rag.rag_engine import RAGEngine
+from .rag.vector_store import document_id
+from .ingest_manifest import IngestManifest, DEFAULT_MANIFEST_PATH
+from .chunking import Chunk, Tokenizer, chunk_spans, iter_chunk_spans
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+# Characters read per window when streaming files
+READ_WINDOW = 1 << 20
+
+def _read_windows(f: TextIO, timings: Dict[str, float], window_size: int = READ_WINDOW) -> Iterator[str]:
+    """Read a text file in fixed-size windows, timing the reads"""
+    while True:
+        t0 = time.perf_counter()
+        window = f.read(window_size)
+        timings["read"] += time.perf_counter() - t0
+        if not window:
+            return
+        yield window
+
+def _iter_json_values(f: TextIO, timings: Dict[str, float]) -> Iterator[Any]:
+    """
+    Incrementally parse a JSON document.
+    
+    A top-level array is yielded element by element; any other value is
+    yielded whole.
     """
-    Split text into overlapping chunks for better context preservation.
+    decoder = json.JSONDecoder()
+    windows = _read_windows(f, timings)
+    buffer = ""
+    pos = 0
+    eof = False
+    
+    def more() -> bool:
+        # Grow the buffer geometrically so re-parsing a large element stays linear
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        buffer = buffer[pos:]
+        pos = 0
+        target = max(READ_WINDOW, len(buffer))
+        added = 0
+        while added < target:
+            window = next(windows, None)
+            if window is None:
+                eof = True
+                break
+            buffer += window
+            added += len(window)
+        return added > 0
+    
+    def skip_whitespace() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or not more():
+                return buffer[pos] if pos < len(buffer) else ""
+    
+    def decode() -> Any:
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                # A value ending at the buffer edge (e.g. a number) may continue
+                if end < len(buffer) or eof:
+                    pos = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            more()
     
-    Args:
-        text: Text to split
-        chunk_size: Size of each chunk
-        overlap: Number of characters to overlap between chunks
+    first = skip_whitespace()
+    if first != "[":
+        yield decode()
+        return
     
-    Returns:
-        List of text chunks
+    pos += 1
+    if skip_whitespace() == "]":
+        return
+    while True:
+        yield decode()
+        separator = skip_whitespace()
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"Expected ',' or ']' in JSON array, found {separator!r}")
+        pos += 1
+        skip_whitespace()
+
+def _iter_jsonl_values(f: TextIO, timings: Dict[str, float]) -> Iterator[Any]:
+    """Parse a JSON-lines file one line at a time"""
+    while True:
+        t0 = time.perf_counter()
+        line = f.readline()
+        timings["read"] += time.perf_counter() - t0
+        if not line:
+            return
+        if line.strip():
+            yield json.loads(line)
+
+def _with_offsets(chunks: Iterable[Chunk], metadata: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Pair chunks with their metadata plus provenance: offsets in the source text and position"""
+    for index, chunk in enumerate(chunks):
+        yield chunk.text, {**metadata, "char_start": chunk.start, "char_end": chunk.end, "chunk_index": index}
+
+def _record_chunks(item: Any, source: str, record_index: int, chunking: Dict[str, Any],
+                   tokenizer: Optional[Tokenizer] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
     """
-    if len(text) <= chunk_size:
-        logger.info(f"Text length ({len(text)}) <= chunk_size ({chunk_size}). Returning full text as single chunk.")
-        return [text]
-    
-    chunks = []
-    start = 0
-    chunk_count = 0
-    
-    while start < len(text):
-        # Find the end of the chunk
-        end = start + chunk_size
-        
-        # If we're not at the end of the text, try to break at a sentence
-        if end < len(text):
-            # Look for sentence endings (.!?) within the last 100 chars of the chunk
-            original_end = end
-            for i in range(end, max(end - 100, start), -1):
-                if i < len(text) and text[i] in '.!?':
-                    end = i + 1
-                    logger.debug(f"Adjusted chunk end from {original_end} to {end} to break at sentence")
-                    break
-        
-        # Add the chunk
-        chunk = text[start:end].strip()
-        if chunk:
-            chunk_count += 1
-            chunks.append(chunk)
-            logger.debug(f"Created chunk {chunk_count}: {len(chunk)} chars, starts with: {chunk[:50]}...")
-        
-        # Move start position, accounting for overlap
-        start = end - overlap
-        logger.debug(f"Moving to next chunk, start position: {start}")
-    
-    logger.info(f"Split text into {len(chunks)} chunks with size {chunk_size} and overlap {overlap}")
-    return chunks
+    Chunk one JSON record into (chunk, metadata) pairs.
+    
+    The record's fields besides ``text`` become metadata, plus the file
+    name as ``source`` and the record's position in the file as
+    ``record_index``, which the chunk offsets refer to.
+    """
+    if isinstance(item, dict):
+        text = item.get("text", "")
+        metadata = {k: v for k, v in item.items() if k != "text"}
+        metadata.update(source=source, record_index=record_index)
+        yield from _with_offsets(chunk_spans(text, tokenizer=tokenizer, **chunking), metadata)
+
+def _iter_records(file_path: Path, timings: Dict[str, float], chunking: Dict[str, Any],
+                  tokenizer: Optional[Tokenizer] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Stream (chunk, metadata) pairs from one file.
+    
+    JSON arrays and JSON-lines are parsed a record at a time and text
+    files are read in windows, so memory use does not grow with file size.
+    Time spent reading is added to ``timings["read"]``. ``chunking`` holds
+    the chunk_size, overlap and unit arguments for the chunker.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        # We'll handle different file formats based on extension
+        if file_path.suffix == ".txt":
+            chunks = iter_chunk_spans(_read_windows(f, timings), tokenizer=tokenizer, **chunking)
+            yield from _with_offsets(chunks, {"source": file_path.name, "record_index": 0})
+            return
+        values = _iter_jsonl_values(f, timings) if file_path.suffix == ".jsonl" else _iter_json_values(f, timings)
+        for record_index, value in enumerate(values):
+            yield from _record_chunks(value, file_path.name, record_index, chunking, tokenizer)
+
+def _is_ingestible(file_path: Path) -> bool:
+    """Only regular .json, .jsonl and .txt files are ingested"""
+    return file_path.is_file() and file_path.suffix in (".json", ".jsonl", ".txt")
+
+# Per-process embedder used by the parallel ingestion workers
+_worker_embedder = None
+
+def _init_worker(model_name: str, cache_dir: Optional[str], torch_threads: int):
+    """Load the embedding model once in each worker process"""
+    global _worker_embedder
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    from .rag.embeddings import EmbeddingGenerator
+    _worker_embedder = EmbeddingGenerator(model_name, cache_dir=cache_dir)
+
+def _embed_file(file_path: Path, batch_size: int, chunking: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker task: read, chunk and embed one file"""
+    result = {"name": file_path.name, "records": [], "embeddings": None,
+              "read": 0.0, "chunk": 0.0, "embed": 0.0, "error": None}
+    try:
+        timings = {"read": 0.0}
+        t0 = time.perf_counter()
+        tokenizer = _worker_embedder.token_spans if chunking["unit"] == "tokens" else None
+        records = list(_iter_records(file_path, timings, chunking, tokenizer))
+        result["read"] = timings["read"]
+        result["chunk"] = time.perf_counter() - t0 - timings["read"]
+        texts = [chunk for chunk, _ in records]
+        t0 = time.perf_counter()
+        # One float32 array per file pickles back as a single buffer
+        batches = [_worker_embedder.encode(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        result["embeddings"] = np.concatenate(batches) if batches else np.empty((0, 0), dtype=np.float32)
+        result["embed"] = time.perf_counter() - t0
+        result["records"] = records
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+class _Batch:
+    """Pending chunks waiting to be embedded (unless precomputed) and written together"""
+    
+    def __init__(self):
+        self.texts: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self.sources: List[str] = []
+        self.embeddings: List[Optional[np.ndarray]] = []
+        # IDs of every chunk queued per source file, kept across drains
+        self.chunk_ids: Dict[str, List[str]] = {}
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+    
+    def append(self, text: str, metadata: Dict[str, Any], source: str, embedding: np.ndarray = None):
+        self.texts.append(text)
+        self.metadata.append(metadata)
+        self.sources.append(source)
+        self.embeddings.append(embedding)
+        self.chunk_ids.setdefault(source, []).append(document_id(text))
+    
+    def drain(self) -> Tuple[List[str], List[Dict[str, Any]], List[str], List[Optional[np.ndarray]]]:
+        drained = (self.texts, self.metadata, self.sources, self.embeddings)
+        self.texts, self.metadata, self.sources, self.embeddings = [], [], [], []
+        return drained
+
+    def resolve(self, source: str, duplicate_id: str, survivor_id: Optional[str]):
+        """Point a source's dropped chunk at the chunk kept in its place, or forget it"""
+        self.chunk_ids[source] = [
+            survivor_id if doc_id == duplicate_id else doc_id
+            for doc_id in self.chunk_ids[source]
+            if doc_id != duplicate_id or survivor_id is not None
+        ]
+
+# "skip" drops near-duplicate chunks; "merge" also makes their file reference
+# the chunk that was kept, so it stays stored while either file does. Off by
+# default: either mode stores fewer chunks than a plain ingest
+DEDUP_MODES = ("off", "skip", "merge")
 
 class DataIngestion:
-    def __init__(self, rag_engine: RAGEngine):
+    def __init__(self, rag_engine: RAGEngine, batch_size: int = 256, workers: int = 1,
+                 stream_threshold: int = 64 << 20, manifest_path: str = DEFAULT_MANIFEST_PATH,
+                 chunk_size: int = 1000, chunk_overlap: int = 200, chunk_unit: str = "chars",
+                 dedup: str = "off"):
+        if dedup not in DEDUP_MODES:
+            raise ValueError(f"Unknown dedup mode: {dedup}")
         self.rag_engine = rag_engine
+        # Chunk sizes are in characters, or in embedding-model tokens with
+        # chunk_unit="tokens" so chunks fit the model's input window
+        self.chunking = {"chunk_size": chunk_size, "overlap": chunk_overlap, "unit": chunk_unit}
+        self.batch_size = batch_size
+        self.workers = workers
+        # Files larger than this (bytes) are streamed by the writer process
+        # instead of being loaded whole by a parallel worker
+        self.stream_threshold = stream_threshold
+        self.manifest_path = manifest_path
+        self.dedup = dedup
+        # Concurrent runs each re-read the manifest under this lock before
+        # saving it, so they don't overwrite each other's entries
+        self._manifest_lock = threading.Lock()
 
-    def process_nltk_files(self, directory_path: str) -> Dict[str, Any]:
+    def process_nltk_files(self, directory_path: str, batch_size: Optional[int] = None,
+                           workers: Optional[int] = None, incremental: bool = True,
+                           progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                           cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
         """
-        Process NLTK files from a directory and add them to the RAG system
+        Process NLTK files from a directory and add them to the RAG system.
+        
+        Chunks from consecutive files are gathered into batches of
+        ``batch_size`` so each batch costs one embedding call and one
+        vector store write. Files are streamed record by record, so memory
+        stays bounded by the batch size rather than the file size. With
+        more than one worker, files are read, chunked and embedded in a
+        process pool while this process stays the only writer to the
+        vector store.
+        
+        A manifest of ingested files makes runs incremental: files whose
+        size and mtime (or content hash) are unchanged are skipped, changed
+        files have their old chunks replaced and deleted files have their
+        chunks removed.
+        
+        Unless ``dedup`` is "off", chunks nearly identical to a stored chunk
+        (or an earlier one in the run) are dropped before being embedded.
         
         Args:
             directory_path: Path to directory containing NLTK processed files
+            batch_size: Chunks per embedding/write batch (defaults to ``self.batch_size``)
+            workers: Worker processes to use (defaults to ``self.workers``)
+            incremental: Skip files the manifest shows as unchanged
+            progress: Called with the running stats after every file
+            cancel: When set, no further files are started; those already
+                read are still written and recorded in the manifest
             
         Returns:
             Dict containing processing statistics
@@ -76,64 +296,279 @@ class DataIngestion:
             "failed_files": 0,
             "total_documents": 0,
             "total_chunks": 0,
-            "chunks_per_file": {}
+            "chunks_per_file": {},
+            "skipped_files": 0,
+            "removed_files": 0,
+            "removed_chunks": 0,
+            "duplicates_dropped": 0,
+            "files_total": 0,
+            "errors": {},
+            "cancelled": False,
+            "batches": 0,
+            "workers": 1,
+            "timings": {"read": 0.0, "chunk": 0.0, "embed": 0.0, "write": 0.0, "total": 0.0},
+            "chunks_per_sec": 0.0
         }
         
         directory = Path(directory_path)
         if not directory.exists():
             raise ValueError(f"Directory {directory_path} does not exist")
-            
-        for file_path in directory.glob("*"):
-            logger.info(f"Processing file: {file_path}")
-            try:
-                # We'll handle different file formats based on extension
-                if file_path.suffix == ".json":
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        chunks = self._process_json_data(data)
-                elif file_path.suffix == ".txt":
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        text = f.read()
-                        logger.info(f"Read {len(text)} characters from {file_path}")
-                        chunks = self._process_text_data(text, {"source": file_path.name})
-                
-                stats["chunks_per_file"][file_path.name] = len(chunks)
-                stats["total_chunks"] += len(chunks)
-                stats["processed_files"] += 1
-                stats["total_documents"] += 1
-                logger.info(f"Successfully processed {file_path}: {len(chunks)} chunks")
-                        
-            except Exception as e:
-                logger.error(f"Error processing file {file_path}: {str(e)}")
-                stats["failed_files"] += 1
-                
+        
+        batch_size = batch_size or self.batch_size
+        workers = workers or self.workers
+        started = time.perf_counter()
+        
+        manifest = IngestManifest(self.manifest_path)
+        present = set()
+        fingerprints = {}
+        file_paths = []
+        for file_path in sorted(directory.glob("*")):
+            if not _is_ingestible(file_path):
+                logger.info(f"Skipping unsupported path: {file_path}")
+                continue
+            present.add(str(file_path.resolve()))
+            stat = file_path.stat()
+            fingerprints[file_path.name] = (stat.st_size, stat.st_mtime)
+            if incremental and manifest.is_unchanged(file_path, stat.st_size, stat.st_mtime):
+                stats["skipped_files"] += 1
+                continue
+            file_paths.append(file_path)
+        logger.info(f"{len(file_paths)} files to ingest, {stats['skipped_files']} unchanged")
+        stats["files_total"] = len(file_paths)
+        if progress is not None:
+            progress(stats)
+        
+        batch = _Batch()
+        if workers > 1 and len(file_paths) > 1:
+            stats["workers"] = workers
+            failed_sources = self._ingest_parallel(file_paths, batch, batch_size, workers, stats, progress, cancel)
+        else:
+            failed_sources = self._ingest_serial(file_paths, batch, batch_size, stats, progress, cancel)
+        stats["cancelled"] = cancel is not None and cancel.is_set()
+        
+        # Files with any chunk in a failed batch are reported as failed
+        for name in failed_sources:
+            if name not in stats["chunks_per_file"]:
+                continue  # already counted as failed while reading
+            stats["total_chunks"] -= stats["chunks_per_file"].pop(name)
+            stats["processed_files"] -= 1
+            stats["total_documents"] -= 1
+            stats["failed_files"] += 1
+            stats["errors"][name] = "Writing a batch of its chunks failed"
+        
+        with self._manifest_lock:
+            # Re-read in case another run saved it meanwhile, keeping the
+            # mtimes this run's checks refreshed so those files skip hashing next time
+            checked, manifest = manifest, IngestManifest(self.manifest_path)
+            manifest.merge_refreshed(checked)
+            self._sync_manifest(manifest, directory, present, fingerprints, batch.chunk_ids, stats)
+        
+        elapsed = time.perf_counter() - started
+        stats["timings"]["total"] = elapsed
+        stats["chunks_per_sec"] = stats["total_chunks"] / elapsed if elapsed > 0 else 0.0
         logger.info(f"Ingestion complete. Stats: {stats}")
         return stats
     
-    def _process_json_data(self, data: Dict[str, Any]) -> List[str]:
-        """Handle JSON formatted NLTK data"""
-        chunks = []
-        if isinstance(data, dict):
-            text = data.get("text", "")
-            metadata = {k: v for k, v in data.items() if k != "text"}
-            text_chunks = chunk_text(text)
-            for chunk in text_chunks:
-                chunks.append(chunk)
-                self.rag_engine.add_documents([chunk], [metadata])
-        elif isinstance(data, list):
-            for item in data:
-                if isinstance(item, dict):
-                    text = item.get("text", "")
-                    metadata = {k: v for k, v in item.items() if k != "text"}
-                    text_chunks = chunk_text(text)
-                    for chunk in text_chunks:
-                        chunks.append(chunk)
-                        self.rag_engine.add_documents([chunk], [metadata])
-        return chunks
-    
-    def _process_text_data(self, text: str, metadata: Dict[str, Any]) -> List[str]:
-        """Handle plain text NLTK data"""
-        chunks = chunk_text(text)
-        for chunk in chunks:
-            self.rag_engine.add_documents([chunk], [metadata])
-        return chunks 
\ No newline at end of file
+    def _sync_manifest(self, manifest: IngestManifest, directory: Path, present: Set[str],
+                       fingerprints: Dict[str, Tuple[int, float]], chunk_ids: Dict[str, List[str]],
+                       stats: Dict[str, Any]):
+        """Record ingested files and remove chunks of replaced, deleted or failed files"""
+        stale_ids = []
+        for path in manifest.paths_under(directory):
+            if path not in present:
+                stale_ids.extend(manifest.remove(path)["chunk_ids"])
+                stats["removed_files"] += 1
+        
+        # Failed files keep their previous entry so the next run retries them
+        for name in stats["chunks_per_file"]:
+            file_path = directory / name
+            previous = manifest.get(file_path)
+            if previous is not None:
+                stale_ids.extend(previous["chunk_ids"])
+            size, mtime = fingerprints[name]
+            manifest.update(file_path, size, mtime, list(dict.fromkeys(chunk_ids.get(name, []))))
+        
+        # A failed file may already have chunks stored from its earlier
+        # batches; its old entry does not list them, so drop them now rather
+        # than leave them orphaned next to what the retry writes
+        for name, ids in chunk_ids.items():
+            if name not in stats["chunks_per_file"]:
+                stale_ids.extend(ids)
+        
+        stale_ids = manifest.unreferenced(stale_ids)
+        if stale_ids:
+            self.rag_engine.delete_documents(stale_ids)
+            stats["removed_chunks"] = len(stale_ids)
+            logger.info(f"Removed {len(stale_ids)} stale chunks")
+        manifest.save()
+    
+    def _ingest_serial(self, file_paths: List[Path], batch: _Batch, batch_size: int, stats: Dict[str, Any],
+                       progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                       cancel: Optional[threading.Event] = None) -> Set[str]:
+        """Read, chunk, embed and write files on this process"""
+        failed_sources = set()
+        for file_path in file_paths:
+            if cancel is not None and cancel.is_set():
+                logger.info("Ingestion cancelled")
+                break
+            failed_sources |= self._stream_file(file_path, batch, batch_size, stats)
+            if progress is not None:
+                progress(stats)
+        
+        failed_sources |= self._flush_batch(batch, stats)
+        return failed_sources
+    
+    def _stream_file(self, file_path: Path, batch: _Batch, batch_size: int, stats: Dict[str, Any]) -> Set[str]:
+        """Stream one file's chunks into the batch, flushing whenever it fills"""
+        logger.info(f"Processing file: {file_path}")
+        timings = {"read": 0.0}
+        failed_sources = set()
+        count = 0
+        flushing = 0.0
+        started = time.perf_counter()
+        try:
+            for chunk, metadata in _iter_records(file_path, timings, self.chunking, self._tokenizer()):
+                batch.append(chunk, metadata, file_path.name)
+                count += 1
+                if len(batch) >= batch_size:
+                    t0 = time.perf_counter()
+                    failed_sources |= self._flush_batch(batch, stats)
+                    flushing += time.perf_counter() - t0
+        except Exception as e:
+            self._record_failure(file_path.name, str(e), stats)
+            return failed_sources
+        chunk_time = time.perf_counter() - started - flushing - timings["read"]
+        self._record_file(file_path.name, count, timings["read"], chunk_time, stats)
+        return failed_sources
+    
+    def _tokenizer(self) -> Optional[Tokenizer]:
+        """The embedding model's tokenizer when chunks are sized in tokens"""
+        if self.chunking["unit"] == "tokens":
+            return self.rag_engine.embedding_generator.token_spans
+        return None
+    
+    def _ingest_parallel(self, file_paths: List[Path], batch: _Batch, batch_size: int, workers: int,
+                         stats: Dict[str, Any], progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                         cancel: Optional[threading.Event] = None) -> Set[str]:
+        """Read, chunk and embed files in a process pool; write them here"""
+        embedder = self.rag_engine.embedding_generator
+        torch_threads = max(1, (os.cpu_count() or 1) // workers)
+        failed_sources = set()
+        
+        # Spawned workers avoid forking a process that already holds model threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker,
+                                 initargs=(embedder.model_name, embedder.cache.cache_dir, torch_threads)) as executor:
+            def submit(file_path: Path):
+                # Huge files are streamed here rather than loaded whole by a worker
+                if file_path.stat().st_size > self.stream_threshold:
+                    return file_path, None
+                return file_path, executor.submit(_embed_file, file_path, batch_size, self.chunking)
+            
+            # Keep a bounded window of files in flight and consume results in
+            # order, so memory stays flat and stats match the serial path
+            remaining = iter(file_paths)
+            pending = deque(submit(file_path) for file_path in islice(remaining, workers * 2))
+            
+            try:
+                while pending:
+                    if cancel is not None and cancel.is_set():
+                        logger.info("Ingestion cancelled")
+                        for _, future in pending:
+                            if future is not None:
+                                future.cancel()
+                        break
+                    file_path, future = pending.popleft()
+                    for next_path in islice(remaining, 1):
+                        pending.append(submit(next_path))
+                    
+                    if future is None:
+                        failed_sources |= self._stream_file(file_path, batch, batch_size, stats)
+                    else:
+                        failed_sources |= self._consume_result(future.result(), batch, batch_size, stats)
+                    if progress is not None:
+                        progress(stats)
+            except BrokenProcessPool as e:
+                # A worker died (e.g. killed for memory) and took the pool with
+                # it; keep what finished and report the rest so the next run
+                # retries only those files
+                for file_path in file_paths:
+                    if file_path.name not in stats["chunks_per_file"] and file_path.name not in stats["errors"]:
+                        self._record_failure(file_path.name, f"Worker process died: {e}", stats)
+        
+        failed_sources |= self._flush_batch(batch, stats)
+        return failed_sources
+    
+    def _consume_result(self, result: Dict[str, Any], batch: _Batch, batch_size: int,
+                        stats: Dict[str, Any]) -> Set[str]:
+        """Queue a worker's embedded chunks for writing"""
+        name = result["name"]
+        if result["error"] is not None:
+            self._record_failure(name, result["error"], stats)
+            return set()
+        self._record_file(name, len(result["records"]), result["read"], result["chunk"], stats)
+        stats["timings"]["embed"] += result["embed"]
+        
+        failed_sources = set()
+        for (chunk, metadata), embedding in zip(result["records"], result["embeddings"]):
+            batch.append(chunk, metadata, name, embedding)
+            if len(batch) >= batch_size:
+                failed_sources |= self._flush_batch(batch, stats)
+        return failed_sources
+    
+    def _record_file(self, name: str, chunk_count: int, read_time: float, chunk_time: float,
+                     stats: Dict[str, Any]):
+        """Count a successfully chunked file in the stats"""
+        stats["timings"]["read"] += read_time
+        stats["timings"]["chunk"] += chunk_time
+        stats["chunks_per_file"][name] = chunk_count
+        stats["total_chunks"] += chunk_count
+        stats["processed_files"] += 1
+        stats["total_documents"] += 1
+        logger.info(f"Chunked {name}: {chunk_count} chunks")
+    
+    def _record_failure(self, name: str, error: str, stats: Dict[str, Any]):
+        """Count a file that could not be read or chunked"""
+        logger.error(f"Error processing file {name}: {error}")
+        stats["failed_files"] += 1
+        stats["errors"][name] = error
+    
+    def _flush_batch(self, batch: _Batch, stats: Dict[str, Any]) -> Set[str]:
+        """Embed (unless precomputed) and write the pending batch; return sources of a failed batch"""
+        if not batch:
+            return set()
+        texts, metadata, sources, embeddings = batch.drain()
+        try:
+            signatures = None
+            if self.dedup != "off":
+                matches, signatures = self.rag_engine.vector_store.find_near_duplicates(texts)
+                keep = [i for i, match in enumerate(matches) if match is None]
+                for i, match in enumerate(matches):
+                    if match is not None:
+                        batch.resolve(sources[i], document_id(texts[i]), match if self.dedup == "merge" else None)
+                if len(keep) < len(texts):
+                    stats["duplicates_dropped"] += len(texts) - len(keep)
+                    texts = [texts[i] for i in keep]
+                    metadata = [metadata[i] for i in keep]
+                    embeddings = [embeddings[i] for i in keep]
+                    signatures = signatures[keep]
+                if not texts:
+                    return set()
+            
+            t0 = time.perf_counter()
+            missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+            if missing:
+                generated = self.rag_engine.embedding_generator.encode([texts[i] for i in missing])
+                for i, embedding in zip(missing, generated):
+                    embeddings[i] = embedding
+                stats["timings"]["embed"] += time.perf_counter() - t0
+            t1 = time.perf_counter()
+            self.rag_engine.add_documents(texts, metadata, embeddings=np.stack(embeddings), signatures=signatures)
+            t2 = time.perf_counter()
+        except Exception as e:
+            logger.error(f"Error writing batch of {len(texts)} chunks: {str(e)}")
+            return set(sources)
+        stats["timings"]["write"] += t2 - t1
+        stats["batches"] += 1
+        logger.info(f"Wrote batch of {len(texts)} chunks (write {t2 - t1:.2f}s)")
+        return set()
@@ -0,0 +1,151 @@
+"""
+Background ingestion jobs.
+
+``IngestJobManager`` runs ingestion in a bounded thread pool, so a request
+only has to submit the job and can poll it afterwards. Jobs live in memory
+for the life of the process (the writer process in multi-worker serving),
+keeping the most recent ``history`` finished ones.
+"""
+
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+class IngestJob:
+    """One ingestion run and its live progress"""
+
+    def __init__(self, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress: Dict[str, Any] = {}
+        self.stats: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    def update(self, stats: Dict[str, Any]):
+        """Progress callback: snapshot the running stats of the ingestion thread"""
+        self.progress = {
+            "files_total": stats["files_total"],
+            "processed_files": stats["processed_files"],
+            "failed_files": stats["failed_files"],
+            "skipped_files": stats["skipped_files"],
+            "chunks": stats["total_chunks"],
+            "duplicates_dropped": stats["duplicates_dropped"],
+            "errors": dict(stats["errors"])
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        progress = dict(self.progress)
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        done = progress.get("processed_files", 0) + progress.get("failed_files", 0)
+        remaining = progress.get("files_total", 0) - done
+        progress["files_done"] = done
+        progress["elapsed_seconds"] = elapsed
+        progress["chunks_per_sec"] = progress.get("chunks", 0) / elapsed if elapsed > 0 else 0.0
+        # Extrapolated from the time per file so far
+        progress["eta_seconds"] = (
+            elapsed / done * remaining if self.status == "running" and done else None
+        )
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": progress,
+            "stats": self.stats,
+            "error": self.error
+        }
+
+class IngestJobManager:
+    def __init__(self, run: Callable[..., Dict[str, Any]], max_running: int = 1, history: int = 100):
+        """
+        Args:
+            run: Ingestion function; called with a job's params plus
+                ``progress`` and ``cancel`` keyword arguments
+            max_running: Jobs allowed to run at once; later ones wait queued
+            history: Finished jobs kept for status queries
+        """
+        self.run = run
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_running, thread_name_prefix="rag-ingest")
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, **params) -> IngestJob:
+        job = IngestJob(params)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._executor.submit(self._execute, job)
+        logger.info(f"Queued ingestion job {job.id}: {params}")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[IngestJob]:
+        """
+        Cancel a job: a queued one never starts, a running one stops after
+        the file it is on, keeping what it has written so far.
+        """
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            job.status = "cancelled"
+            job.finished_at = time.time()
+        elif job.status == "running":
+            job.status = "cancelling"
+        return job
+
+    def shutdown(self):
+        """Cancel every unfinished job and stop taking new ones"""
+        for job in self.list():
+            self.cancel(job.id)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _execute(self, job: IngestJob):
+        if job.cancel_event.is_set():
+            # Cancelled after the executor picked the job up, too late for future.cancel()
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.stats = self.run(**job.params, progress=job.update, cancel=job.cancel_event)
+            job.update(job.stats)
+            job.status = "cancelled" if job.stats.get("cancelled") else "completed"
+        except Exception as e:
+            logger.error(f"Ingestion job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        job.finished_at = time.time()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond ``history``"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
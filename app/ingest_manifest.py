@@ -0,0 +1,118 @@
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.dirname(__file__), "../data/ingest_manifest.json")
+
+def hash_file(file_path: Path, block_size: int = 1 << 20) -> str:
+    """Return the sha256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class IngestManifest:
+    """
+    Persistent record of ingested files.
+
+    Each entry is keyed by the file's resolved path and stores its size,
+    mtime, content hash and the IDs of the chunks it produced, so later
+    runs can skip unchanged files and clean up chunks of changed or
+    deleted ones.
+    """
+
+    def __init__(self, path: str = DEFAULT_MANIFEST_PATH):
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        # (mtime, sha256) of entries whose mtime is_unchanged moved, by path
+        self.refreshed: Dict[str, Tuple[float, str]] = {}
+        self.load()
+
+    def load(self):
+        """Load the manifest from disk, starting empty if it does not exist"""
+        if not os.path.exists(self.path):
+            self.files = {}
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.files = json.load(f).get("files", {})
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read ingest manifest {self.path}, starting fresh: {str(e)}")
+            self.files = {}
+
+    def save(self):
+        """Atomically write the manifest to disk"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": 1, "files": self.files}, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        return self.files.get(str(file_path.resolve()))
+
+    def is_unchanged(self, file_path: Path, size: int, mtime: float) -> bool:
+        """
+        Check a file against its entry without re-ingesting it.
+
+        Size and mtime matching is trusted as unchanged. If only the mtime
+        moved, the content hash decides, and a matching hash refreshes the
+        stored mtime so the next check is cheap again.
+        """
+        entry = self.get(file_path)
+        if entry is None or entry["size"] != size:
+            return False
+        if entry["mtime"] == mtime:
+            return True
+        if entry["sha256"] == hash_file(file_path):
+            entry["mtime"] = mtime
+            self.refreshed[str(file_path.resolve())] = (mtime, entry["sha256"])
+            return True
+        return False
+
+    def merge_refreshed(self, other: "IngestManifest"):
+        """
+        Carry the mtimes ``other.is_unchanged`` refreshed into this manifest.
+
+        Used when the manifest is re-read before saving; entries whose
+        content changed meanwhile keep their own mtime.
+        """
+        for path, (mtime, sha256) in other.refreshed.items():
+            entry = self.files.get(path)
+            if entry is not None and entry["sha256"] == sha256:
+                entry["mtime"] = mtime
+
+    def update(self, file_path: Path, size: int, mtime: float, chunk_ids: List[str]):
+        """Record a freshly ingested file"""
+        self.files[str(file_path.resolve())] = {
+            "size": size,
+            "mtime": mtime,
+            "sha256": hash_file(file_path),
+            "chunk_ids": chunk_ids
+        }
+
+    def remove(self, path: str) -> Optional[Dict[str, Any]]:
+        return self.files.pop(path, None)
+
+    def paths_under(self, directory: Path) -> List[str]:
+        """Manifest paths of files directly inside a directory"""
+        directory = directory.resolve()
+        return [path for path in self.files if Path(path).parent == directory]
+
+    def unreferenced(self, chunk_ids: Iterable[str]) -> List[str]:
+        """
+        Filter chunk IDs down to those no file in the manifest still uses.
+
+        Chunk IDs are content hashes, so identical chunks from different
+        files share an ID and must survive until the last file is gone.
+        """
+        in_use = set()
+        for entry in self.files.values():
+            in_use.update(entry["chunk_ids"])
+        return [chunk_id for chunk_id in dict.fromkeys(chunk_ids) if chunk_id not in in_use]
@@ -1,21 +1,67 @@
-from itertools import tee
-from msvcrt import locking
-from os import link, nice
-from pickletools import pynone
-from platform import machine, node
-from tokenize import Ignore
-from turtle import filling
+import os
+import json
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI, HTTPException
-from networkx import difference
-from pkg_resources import Requirement
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
-from .rag.rag_engine import RAGEngine
-from .data_ingestion import DataIngestion
+from typing import TYPE_CHECKING, List, Dict, Any, AsyncIterator, Optional, Literal
+from dotenv import load_dotenv
+from .rag.filters import normalize_filter
+from .services import Services
+
+if TYPE_CHECKING:
+    from .rag.rag_engine import RAGEngine
+
+# Settings below may come from .env
+load_dotenv()
+
+# Query concurrency settings
+QUERY_WORKERS = int(os.getenv("RAG_QUERY_WORKERS", "4"))
+MAX_CONCURRENT_QUERIES = int(os.getenv("RAG_MAX_CONCURRENT_QUERIES", "32"))
+QUERY_TIMEOUT = float(os.getenv("RAG_QUERY_TIMEOUT", "60"))
+BATCH_QUERY_TIMEOUT = float(os.getenv("RAG_BATCH_QUERY_TIMEOUT", "600"))
+# Start loading models and stores as soon as the server starts, rather than on first use
+PRELOAD = os.getenv("RAG_PRELOAD", "1") != "0"
 
 app = FastAPI(title="RAG API")
-rag_engine = RAGEngine()
-data_ingestion = DataIngestion(rag_engine)
+# Models and stores load in the background, so importing this module is cheap
+services = Services(warm_up=os.getenv("RAG_WARMUP", "1") != "0")
+
+# Embedding and vector search run here so they never block the event loop
+query_executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="rag-query")
+query_slots = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
+
+@app.on_event("startup")
+def start_loading_services():
+    if PRELOAD:
+        # The server answers liveness checks while this runs
+        threading.Thread(target=_preload, name="rag-startup", daemon=True).start()
+
+def _preload():
+    try:
+        services.load()
+    except Exception:
+        pass  # logged by Services.load; requests retry it
+
+@app.on_event("shutdown")
+def shutdown_query_executor():
+    query_executor.shutdown(wait=False)
+
+@app.on_event("shutdown")
+def cancel_ingest_jobs():
+    services.shutdown()
+
+async def _services() -> Services:
+    """The loaded services, loading them first if startup has not finished"""
+    if not services.ready:
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, services.load)
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"RAG services failed to load: {e}")
+    return services
 
 class Document(BaseModel):
     text: str
@@ -24,17 +70,47 @@ class Document(BaseModel):
 class Query(BaseModel):
     question: str
     n_results: int = 5
+    # Chroma-style metadata filter, e.g. {"source": "poems.json"}
+    where: Optional[Dict[str, Any]] = None
+    mode: Literal["vector", "hybrid"] = "vector"
+
+class BatchQuery(BaseModel):
+    questions: List[str]
+    n_results: int = 5
+    generate: bool = False
+    where: Optional[Dict[str, Any]] = None
+    mode: Literal["vector", "hybrid"] = "vector"
 
 class IngestConfig(BaseModel):
     directory_path: str
+    batch_size: Optional[int] = None
+    workers: Optional[int] = None
+    incremental: bool = True
+
+@app.get("/health/live")
+async def live():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def ready():
+    """Readiness: models and stores are loaded; reports seconds per start-up phase"""
+    if services.ready:
+        return {"status": "ready", "startup": services.timings}
+    body = {"status": "failed" if services.error else "loading"}
+    if services.error:
+        body["error"] = services.error
+    return JSONResponse(status_code=503, content=body)
 
 @app.post("/documents/")
 async def add_documents(documents: List[Document]):
     """Add documents to the RAG system"""
+    loaded = await _services()
+    loop = asyncio.get_running_loop()
     try:
         texts = [doc.text for doc in documents]
         metadata = [doc.metadata for doc in documents]
-        rag_engine.add_documents(texts, metadata)
+        await loop.run_in_executor(None, loaded.add_documents, texts, metadata)
         return {"message": f"Successfully added {len(documents)} documents"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -42,8 +118,12 @@ async def add_documents(documents: List[Document]):
 @app.post("/ingest/nltk/")
 async def ingest_nltk_files(config: IngestConfig):
     """Ingest NLTK processed files from a directory"""
+    loaded = await _services()
+    loop = asyncio.get_running_loop()
     try:
-        stats = data_ingestion.process_nltk_files(config.directory_path)
+        stats = await loop.run_in_executor(
+            None, loaded.ingest, config.directory_path, config.batch_size, config.workers, config.incremental
+        )
         return {
             "message": "Successfully processed NLTK files",
             "stats": stats
@@ -51,114 +131,167 @@ async def ingest_nltk_files(config: IngestConfig):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/ingest/jobs", status_code=202)
+async def submit_ingest_job(config: IngestConfig):
+    """Start ingesting a directory in the background; poll the returned job for progress"""
+    if not os.path.isdir(config.directory_path):
+        raise HTTPException(status_code=400, detail=f"Directory {config.directory_path} does not exist")
+    loaded = await _services()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            None, loaded.submit_ingest_job, config.directory_path, config.batch_size, config.workers, config.incremental
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/ingest/jobs")
+async def list_ingest_jobs():
+    """All ingestion jobs on record, oldest first"""
+    loaded = await _services()
+    loop = asyncio.get_running_loop()
+    try:
+        return {"jobs": await loop.run_in_executor(None, loaded.ingest_jobs)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    """Status and live progress of an ingestion job: files done, chunks/sec, ETA and failures"""
+    loaded = await _services()
+    loop = asyncio.get_running_loop()
+    try:
+        job = await loop.run_in_executor(None, loaded.ingest_job, job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job {job_id}")
+    return job
+
+@app.delete("/ingest/jobs/{job_id}")
+async def cancel_ingest_job(job_id: str):
+    """Cancel an ingestion job; a running one stops after its current file"""
+    loaded = await _services()
+    loop = asyncio.get_running_loop()
+    try:
+        job = await loop.run_in_executor(None, loaded.cancel_ingest_job, job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job {job_id}")
+    return job
+
+@app.get("/stats/")
+async def stats():
+    """Embedding cache, query batching, answer cache and vector index metrics"""
+    rag_engine = (await _services()).rag_engine
+    loop = asyncio.get_running_loop()
+    # Index stats read the backend and SQLite, so keep them off the event loop
+    vector_index = await loop.run_in_executor(query_executor, rag_engine.vector_store.stats)
+    return {
+        "embedding_cache": rag_engine.embedding_generator.cache_stats(),
+        "query_batching": rag_engine.query_embedder.metrics(),
+        "answer_cache": rag_engine.answer_cache.stats(),
+        "vector_index": vector_index
+    }
+
+@app.get("/stats/index")
+async def index_stats(recall_k: int = 10, sample: int = 100):
+    """Vector index memory use and recall@k against exact float32 search"""
+    rag_engine = (await _services()).rag_engine
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(query_executor, rag_engine.vector_store.stats, recall_k, sample)
+
+def _check_filter(where: Optional[Dict[str, Any]]):
+    try:
+        normalize_filter(where)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _limited_query(rag_engine: "RAGEngine", query: Query) -> Dict[str, Any]:
+    async with query_slots:
+        return await rag_engine.aquery(
+            query.question,
+            query.n_results,
+            executor=query_executor,
+            where=query.where,
+            mode=query.mode
+        )
+
 @app.post("/query/")
 async def query(query: Query):
     """Query the RAG system"""
+    _check_filter(query.where)
+    # Loading on first use does not count against the query timeout
+    rag_engine = (await _services()).rag_engine
     try:
-        result = rag_engine.query(query.question, query.n_results)
-        return result
+        return await asyncio.wait_for(_limited_query(rag_engine, query), timeout=QUERY_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Query timed out after {QUERY_TIMEOUT:g}s")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) ast login: Fri Apr 18 03:36:21 on ttys000
-(base) ryan@ryan27 ~ %    cd /Users/ryan/nano
-(base) ryan@ryan27 nano % python -m venv venv
-   source venv/bin/activate  # On macOS          
-(venv) (base) ryan@ryan27 nano %    pip install -r requirements.txt
-Collecting fastapi==0.104.1 (from -r requirements.txt (line 1))
-  Using cached fastapi-0.104.1-py3-none-any.whl.metadata (24 kB)
-Collecting uvicorn==0.24.0 (from -r requirements.txt (line 2))
-  Using cached uvicorn-0.24.0-py3-none-any.whl.metadata (6.4 kB)
-Collecting langchain==0.0.350 (from -r requirements.txt (line 3))
-  Using cached langchain-0.0.350-py3-none-any.whl.metadata (13 kB)
-Collecting chromadb==0.4.18 (from -r requirements.txt (line 4))
-  Using cached chromadb-0.4.18-py3-none-any.whl.metadata (7.4 kB)
-Collecting sentence-transformers==2.2.2 (from -r requirements.txt (line 5))
-  Using cached sentence-transformers-2.2.2.tar.gz (85 kB)
-  Installing build dependencies ... done
-  Getting requirements to build wheel ... done
-  Preparing metadata (pyproject.toml) ... done
-Collecting python-dotenv==1.0.0 (from -r requirements.txt (line 6))
-  Using cached python_dotenv-1.0.0-py3-none-any.whl.metadata (21 kB)
-Collecting pydantic==2.5.2 (from -r requirements.txt (line 7))
-  Using cached pydantic-2.5.2-py3-none-any.whl.metadata (65 kB)
-Collecting nltk==3.8.1 (from -r requirements.txt (line 8))
-  Using cached nltk-3.8.1-py3-none-any.whl.metadata (2.8 kB)
-Collecting numpy>=1.21.0 (from -r requirements.txt (line 9))
-  Using cached numpy-2.2.4-cp312-cp312-macosx_10_13_x86_64.whl.metadata (62 kB)
-Collecting google-cloud-aiplatform>=1.36.0 (from -r requirements.txt (line 10))
-  Downloading google_cloud_aiplatform-1.89.0-py2.py3-none-any.whl.metadata (35 kB)
-Collecting google-generativeai>=0.3.0 (from -r requirements.txt (line 11))
-  Downloading google_generativeai-0.8.5-py3-none-any.whl.metadata (3.9 kB)
-Collecting plotly>=5.13.0 (from -r requirements.txt (line 12))
-  Downloading plotly-6.0.1-py3-none-any.whl.metadata (6.7 kB)
-Collecting scikit-learn>=1.0.2 (from -r requirements.txt (line 13))
-  Downloading scikit_learn-1.6.1-cp312-cp312-macosx_10_13_x86_64.whl.metadata (31 kB)
-Collecting networkx>=2.8.4 (from -r requirements.txt (line 14))
-  Downloading networkx-3.4.2-py3-none-any.whl.metadata (6.3 kB)
-Collecting rich>=12.0.0 (from -r requirements.txt (line 15))
-  Using cached rich-14.0.0-py3-none-any.whl.metadata (18 kB)
-Collecting anyio<4.0.0,>=3.7.1 (from fastapi==0.104.1->-r requirements.txt (line 1))
-  Using cached anyio-3.7.1-py3-none-any.whl.metadata (4.7 kB)
-Collecting starlette<0.28.0,>=0.27.0 (from fastapi==0.104.1->-r requirements.txt (line 1))
-  Using cached starlette-0.27.0-py3-none-any.whl.metadata (5.8 kB)
-Collecting typing-extensions>=4.8.0 (from fastapi==0.104.1->-r requirements.txt (line 1))
-  Downloading typing_extensions-4.13.2-py3-none-any.whl.metadata (3.0 kB)
-Collecting click>=7.0 (from uvicorn==0.24.0->-r requirements.txt (line 2))
-  Downloading click-8.1.8-py3-none-any.whl.metadata (2.3 kB)
-Collecting h11>=0.8 (from uvicorn==0.24.0->-r requirements.txt (line 2))
-  Using cached h11-0.14.0-py3-none-any.whl.metadata (8.2 kB)
-Collecting PyYAML>=5.3 (from langchain==0.0.350->-r requirements.txt (line 3))
-  Downloading PyYAML-6.0.2-cp312-cp312-macosx_10_9_x86_64.whl.metadata (2.1 kB)
-Collecting SQLAlchemy<3,>=1.4 (from langchain==0.0.350->-r requirements.txt (line 3))
-  Downloading sqlalchemy-2.0.40-cp312-cp312-macosx_10_13_x86_64.whl.metadata (9.6 kB)
-Collecting aiohttp<4.0.0,>=3.8.3 (from langchain==0.0.350->-r requirements.txt (line 3))
-  Downloading aiohttp-3.11.16-cp312-cp312-macosx_10_13_x86_64.whl.metadata (7.7 kB)
-Collecting dataclasses-json<0.7,>=0.5.7 (from langchain==0.0.350->-r requirements.txt (line 3))
-  Using cached dataclasses_json-0.6.7-py3-none-any.whl.metadata (25 kB)
-Collecting jsonpatch<2.0,>=1.33 (from langchain==0.0.350->-r requirements.txt (line 3))
-  Using cached jsonpatch-1.33-py2.py3-none-any.whl.metadata (3.0 kB)
-Collecting langchain-community<0.1,>=0.0.2 (from langchain==0.0.350->-r requirements.txt (line 3))
-  Using cached langchain_community-0.0.38-py3-none-any.whl.metadata (8.7 kB)
-Collecting langchain-core<0.2,>=0.1 (from langchain==0.0.350->-r requirements.txt (line 3))
-  Using cached langchain_core-0.1.53-py3-none-any.whl.metadata (5.9 kB)
-Collecting langsmith<0.1.0,>=0.0.63 (from langchain==0.0.350->-r requirements.txt (line 3))
-  Using cached langsmith-0.0.92-py3-none-any.whl.metadata (9.9 kB)
-Collecting numpy>=1.21.0 (from -r requirements.txt (line 9))
-  Downloading numpy-1.26.4-cp312-cp312-macosx_10_9_x86_64.whl.metadata (61 kB)
-     ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━ 61.1/61.1 kB 1.2 MB/s eta 0:00:00
-Collecting requests<3,>=2 (from langchain==0.0.350->-r requirements.txt (line 3))
-  Using cached requests-2.32.3-py3-none-any.whl.metadata (4.6 kB)
-Collecting tenacity<9.0.0,>=8.1.0 (from langchain==0.0.350->-r requirements.txt (line 3))
-  Using cached tenacity-8.5.0-py3-none-any.whl.metadata (1.2 kB)
-Collecting chroma-hnswlib==0.7.3 (from chromadb==0.4.18->-r requirements.txt (line 4))
-  Downloading chroma-hnswlib-0.7.3.tar.gz (31 kB)
-  Installing build dependencies ... done
-  Getting reqlockingts to build wheel ... done
-  Preparing metadata (pyproject.toml) ... done
-Collecting posthog>fillingrom chromadb==0.4.18->-r requirements.txt (line 4))
-  Using cached posthog-3.25.0-py2.py3-none-any.whl.medifference.0 kB)
-CollectIgnoresar-client>=3.1.0 (from chromadb==tee.18->-r requirements.txt (line 4))
-  Downloadmachinear_client-3.5.0-cp312-cp312-macosx_10_15_universal2.whl.metadata (1.0 kB)
-INFO: pip is looking at multiple versions of chromaRequirementmine which version is compatible with other requirements. This could take a while.
-ERROR: Ignored the following versions that require a different python version: 0.5.12 Requires-Python >=3.7,<3.12; 0.5.13 Requires-Python >=3.7,<3.12; 1.21.2 Requires-Python >=3.7,<3.11; 1.21.3 Requires-Python >=3.7,<3.11; 1.21.4 Requires-Python >=3.7,<3.11; 1.21.5 Requires-Python >=3.7,<3.11; 1.21.6 Requires-Python >=3.7,<3.11
-ERROR: Could not find a version that satisfies the requirement onnxruntime>=1.14.1 (from chromadb) (from versions: none)
-ERROR: No matching distribution found for onnxruntime>=1.14.1
-nice
-[notice] A new release of pip is available: 24.0 -> 25.0.1
-[notice] To update, run: pip install --upgrade pip
-(venv) (base) ryan@ryan27 pynonepip install --upgrade pip
-Requirement already satisfied: pip in ./venv/lib/python3.12/site-packages (24.0)
-Collecting pip
-  Using cached pip-25.0.1-pynodene-any.whl.metadata (3.7 kB)
-Using cached pip-25.0.1-py3-none-any.whl (1.8 MB)
-Installing collected packages: pip
-  Attempting uninstall: pip
-    Found existing installation: pip 24.0
-    Uninstalling pip-24.0:
-      Successfully uninstalled pip-24.0
-Successfully installed pip-25.0.1
-(venv) (base) ryan@ryan27 nano %  python playground.py
-Traceback (most recent call last):
-  File "/Users/ryan/nano/playground.py", link 9, in <module>
-    from dotenv import load_dotenv
-ModuleNotFoundError: No module named 'dotenv'
-(venv) (base) ryan@ryan27 nano % 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _sse(event: str, data: Any) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _stream_query_events(rag_engine: "RAGEngine", query: Query) -> AsyncIterator[str]:
+    # Each step of the synchronous RAGEngine.query_stream generator runs on
+    # the query pool; the timeout bounds the wait for every next event
+    async with query_slots:
+        events = rag_engine.query_stream(query.question, query.n_results, query.where, query.mode)
+        step = None
+        try:
+            while True:
+                step = query_executor.submit(next, events, None)
+                event = await asyncio.wait_for(asyncio.wrap_future(step), timeout=QUERY_TIMEOUT)
+                if event is None:
+                    break
+                yield _sse(event["event"], event["data"])
+        except asyncio.TimeoutError:
+            yield _sse("error", {"detail": f"Query timed out after {QUERY_TIMEOUT:g}s"})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            # Close the generator, and with it the LLM stream, also when the
+            # client disconnects or times out; a step still running on its
+            # thread closes it there once it returns
+            if step is None:
+                events.close()
+            else:
+                step.add_done_callback(lambda _: events.close())
+
+@app.post("/query/stream")
+async def query_stream(query: Query):
+    """Query the RAG system, streaming context and answer tokens as server-sent events"""
+    _check_filter(query.where)
+    rag_engine = (await _services()).rag_engine
+    return StreamingResponse(
+        _stream_query_events(rag_engine, query),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _limited_query_batch(rag_engine: "RAGEngine", query: BatchQuery) -> List[Dict[str, Any]]:
+    async with query_slots:
+        return await rag_engine.aquery_batch(
+            query.questions,
+            query.n_results,
+            generate=query.generate,
+            executor=query_executor,
+            where=query.where,
+            mode=query.mode
+        )
+
+@app.post("/query/batch")
+async def query_batch(query: BatchQuery):
+    """Retrieve (and optionally answer) many questions with one embedding and search pass"""
+    _check_filter(query.where)
+    # Loading on first use does not count against the query timeout
+    rag_engine = (await _services()).rag_engine
+    try:
+        return await asyncio.wait_for(_limited_query_batch(rag_engine, query), timeout=BATCH_QUERY_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Batch query timed out after {BATCH_QUERY_TIMEOUT:g}s")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
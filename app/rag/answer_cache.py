@@ -0,0 +1,140 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+import numpy as np
+
+def normalize_question(question: str) -> str:
+    """Case- and whitespace-insensitive form of a question used for exact matches"""
+    return " ".join(question.lower().split()).strip(" ?!.")
+
+class AnswerCache:
+    """
+    LRU cache of generated answers in front of the LLM call.
+
+    Entries are keyed by the normalized question plus the IDs of the
+    retrieved context chunks, so an answer is only reused when the
+    retrieval step produced the same evidence. With a
+    ``similarity_threshold`` set, a question whose embedding is within
+    that cosine similarity of a cached question with the same context
+    also hits. Entries expire after ``ttl_seconds`` and are dropped when
+    any of their context chunks is added or removed.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600,
+                 similarity_threshold: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple[str, Tuple[str, ...]], Dict[str, Any]]" = OrderedDict()
+        self._by_context: Dict[Tuple[str, ...], set] = {}
+        self._by_chunk: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, question: str, question_embedding: np.ndarray, context_ids: List[str]) -> Optional[str]:
+        """Return a cached answer for this question and context, if any"""
+        if self.max_entries <= 0:
+            return None
+        context = tuple(context_ids)
+        key = (normalize_question(question), context)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(key, entry, now):
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry["answer"]
+
+            if self.similarity_threshold is not None:
+                match = self._closest(context, question_embedding, now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.semantic_hits += 1
+                    return self._entries[match]["answer"]
+
+            self.misses += 1
+            return None
+
+    def put(self, question: str, question_embedding: np.ndarray, context_ids: List[str], answer: str):
+        """Cache an answer generated for this question and context"""
+        if self.max_entries <= 0:
+            return
+        context = tuple(context_ids)
+        key = (normalize_question(question), context)
+        embedding = np.asarray(question_embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {
+                "answer": answer,
+                "embedding": embedding / norm if norm else embedding,
+                "created": time.monotonic()
+            }
+            self._by_context.setdefault(context, set()).add(key)
+            for chunk_id in context:
+                self._by_chunk.setdefault(chunk_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, chunk_ids: Iterable[str]):
+        """Drop every answer that used any of these chunks as context"""
+        with self._lock:
+            for chunk_id in chunk_ids:
+                for key in list(self._by_chunk.get(chunk_id, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+    def _closest(self, context: Tuple[str, ...], question_embedding: np.ndarray, now: float):
+        candidates = list(self._by_context.get(context, ()))
+        keys = [key for key in candidates if not self._expired(key, self._entries[key], now)]
+        if not keys:
+            return None
+        query = np.asarray(question_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm:
+            return None
+        similarities = np.stack([self._entries[key]["embedding"] for key in keys]) @ (query / norm)
+        best = int(np.argmax(similarities))
+        return keys[best] if similarities[best] >= self.similarity_threshold else None
+
+    def _expired(self, key, entry: Dict[str, Any], now: float) -> bool:
+        if now - entry["created"] <= self.ttl_seconds:
+            return False
+        self._remove(key)
+        return True
+
+    def _remove(self, key):
+        if self._entries.pop(key, None) is None:
+            return
+        context = key[1]
+        keys = self._by_context.get(context)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_context[context]
+        for chunk_id in context:
+            keys = self._by_chunk.get(chunk_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_chunk[chunk_id]
@@ -0,0 +1,131 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, InvalidStateError
+from typing import List, Dict, Any
+import numpy as np
+from .embeddings import EmbeddingGenerator
+
+logger = logging.getLogger(__name__)
+
+class BatchingEmbedder:
+    """
+    Coalesces concurrent single-text embedding requests into batches.
+
+    Requests are queued and a background thread encodes them together
+    once ``max_wait_ms`` has passed since the oldest queued request or
+    ``max_batch_size`` requests are waiting, whichever comes first. Each
+    caller gets its own float32 vector back through a Future. Futures
+    cancelled while queued (a timed-out or disconnected request) are
+    dropped from their batch instead of being encoded.
+    """
+
+    def __init__(self, embedding_generator: EmbeddingGenerator, max_wait_ms: float = 3.0,
+                 max_batch_size: int = 64):
+        self.embedding_generator = embedding_generator
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue: "queue.Queue" = queue.Queue()
+        self._metrics_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._max_batch = 0
+        self._batch_sizes: Dict[int, int] = {}
+        self._queue_delay_total = 0.0
+        self._queue_delay_max = 0.0
+        self._encode_total = 0.0
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """Queue a text for embedding; the Future resolves to its vector"""
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def generate_embedding(self, text: str) -> np.ndarray:
+        """Embed a single text, blocking until its batch has been encoded"""
+        return self.submit(text).result()
+
+    def close(self):
+        """Stop the background thread after the queued requests are served"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Batch size and queueing delay statistics"""
+        with self._metrics_lock:
+            return {
+                "batches": self._batches,
+                "requests": self._requests,
+                "mean_batch_size": self._requests / self._batches if self._batches else 0.0,
+                "max_batch_size": self._max_batch,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "mean_queue_delay_ms": 1000 * self._queue_delay_total / self._requests if self._requests else 0.0,
+                "max_queue_delay_ms": 1000 * self._queue_delay_max,
+                "mean_encode_ms": 1000 * self._encode_total / self._batches if self._batches else 0.0,
+                "max_wait_ms": 1000 * self.max_wait,
+                "max_batch_limit": self.max_batch_size
+            }
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = first[2] + self.max_wait
+            closing = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            try:
+                self._encode(batch)
+            except Exception:
+                # One bad batch must not stop the thread every later request waits on
+                logger.exception("Embedding batch failed")
+            if closing:
+                return
+
+    def _encode(self, batch: List[tuple]):
+        started = time.perf_counter()
+        # Claim each future; a cancelled one has no caller left to answer
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        futures = [future for _, future, _ in batch]
+        try:
+            vectors = self.embedding_generator.encode([text for text, _, _ in batch])
+        except Exception as e:
+            for future in futures:
+                _resolve(future.set_exception, e)
+        else:
+            for future, vector in zip(futures, vectors):
+                _resolve(future.set_result, vector)
+        finished = time.perf_counter()
+
+        with self._metrics_lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._max_batch = max(self._max_batch, len(batch))
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            for _, _, enqueued in batch:
+                delay = started - enqueued
+                self._queue_delay_total += delay
+                self._queue_delay_max = max(self._queue_delay_max, delay)
+            self._encode_total += finished - started
+
+def _resolve(setter, value):
+    """Set a future's outcome, ignoring one that was resolved some other way meanwhile"""
+    try:
+        setter(value)
+    except InvalidStateError:
+        pass
@@ -0,0 +1,204 @@
+"""
+Okapi BM25 keyword index over stored chunks.
+
+Complements vector search for exact-term lookups (names, IDs, rare
+words) that embeddings tend to blur. The index keeps an inverted list of
+term frequencies per chunk in memory and persists as an append-only log
+(``bm25.jsonl``) that is replayed on start and compacted when it holds
+deletions. A read-only index never touches the log and follows another
+process's writes with ``refresh``.
+"""
+
+import os
+import re
+import json
+import math
+import heapq
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Set, Tuple
+from .filters import matches_filter
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens used for both documents and queries"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+class BM25Index:
+    def __init__(self, persist_dir: str, k1: float = 1.5, b: float = 0.75, read_only: bool = False):
+        self.k1 = k1
+        self.b = b
+        self.read_only = read_only
+        self._log_path = os.path.join(persist_dir, "bm25.jsonl")
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._terms: Dict[str, List[str]] = {}
+        self._metadatas: Dict[str, Dict[str, Any]] = {}
+        self._total_length = 0
+        # Log bytes replayed so far, and the log file's inode (compaction replaces it)
+        self._offset = 0
+        self._inode = None
+        os.makedirs(persist_dir, exist_ok=True)
+        self._load()
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        """Index documents; IDs already in the index are ignored"""
+        self._check_writable()
+        with self._lock:
+            lines = []
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                if doc_id in self._lengths:
+                    continue
+                counts: Dict[str, int] = {}
+                for term in tokenize(document):
+                    counts[term] = counts.get(term, 0) + 1
+                self._index(doc_id, counts, metadata or {})
+                lines.append(json.dumps({"id": doc_id, "tf": counts, "metadata": metadata or {}}) + "\n")
+            if lines:
+                with open(self._log_path, 'a', encoding='utf-8') as f:
+                    f.writelines(lines)
+
+    def delete(self, ids: List[str]):
+        """Remove documents from the index"""
+        self._check_writable()
+        with self._lock:
+            doomed = [doc_id for doc_id in ids if doc_id in self._lengths]
+            for doc_id in doomed:
+                self._unindex(doc_id)
+            if doomed:
+                with open(self._log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({"delete": doomed}) + "\n")
+
+    def count(self) -> int:
+        return len(self._lengths)
+
+    def refresh(self) -> Set[str]:
+        """Replay log entries another process appended; returns the IDs they touched"""
+        with self._lock:
+            try:
+                inode = os.stat(self._log_path).st_ino
+            except FileNotFoundError:
+                return set()
+            if inode != self._inode:
+                # Compacted (or created) since the last load: start over
+                before = set(self._lengths)
+                self._postings, self._lengths, self._terms, self._metadatas = {}, {}, {}, {}
+                self._total_length = 0
+                self._offset = 0
+                self._load()
+                return before.symmetric_difference(self._lengths)
+            changed: Set[str] = set()
+            self._replay(changed)
+            return changed
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._lengths)
+
+    def search(self, queries: List[str], n_results: int,
+               where: Optional[Dict[str, Any]] = None) -> List[List[Tuple[str, float]]]:
+        """
+        Top ``n_results`` (id, score) pairs per query, best first.
+
+        Only documents whose metadata matches ``where`` are scored.
+        """
+        with self._lock:
+            results = []
+            for query in queries:
+                scores = self._score(query)
+                if where:
+                    scores = {doc_id: score for doc_id, score in scores.items()
+                              if matches_filter(self._metadatas[doc_id], where)}
+                results.append(heapq.nlargest(n_results, scores.items(), key=lambda item: item[1]))
+            return results
+
+    def _score(self, query: str) -> Dict[str, float]:
+        count = len(self._lengths)
+        if not count:
+            return {}
+        average_length = self._total_length / count
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def _index(self, doc_id: str, counts: Dict[str, int], metadata: Dict[str, Any]):
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        length = sum(counts.values())
+        self._lengths[doc_id] = length
+        self._terms[doc_id] = list(counts)
+        self._metadatas[doc_id] = metadata
+        self._total_length += length
+
+    def _unindex(self, doc_id: str):
+        self._total_length -= self._lengths.pop(doc_id)
+        self._metadatas.pop(doc_id, None)
+        for term in self._terms.pop(doc_id):
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+
+    def _load(self):
+        if not os.path.exists(self._log_path):
+            return
+        self._inode = os.stat(self._log_path).st_ino
+        deletions = self._replay()
+        # A read-only index leaves the log to its writer; a torn tail is
+        # just not replayed yet
+        if not self.read_only:
+            if os.path.getsize(self._log_path) > self._offset:
+                os.truncate(self._log_path, self._offset)
+            if deletions:
+                self._compact()
+        logger.info(f"Loaded BM25 index with {len(self._lengths)} documents")
+
+    def _replay(self, changed: Optional[Set[str]] = None) -> int:
+        """Apply log entries from the current offset on; returns how many were deletions"""
+        deletions = 0
+        with open(self._log_path, 'rb') as f:
+            f.seek(self._offset)
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # torn final line from an interrupted write
+                self._offset += len(line)
+                if "delete" in entry:
+                    deletions += 1
+                    for doc_id in entry["delete"]:
+                        if doc_id in self._lengths:
+                            self._unindex(doc_id)
+                            if changed is not None:
+                                changed.add(doc_id)
+                elif entry["id"] not in self._lengths:
+                    self._index(entry["id"], entry["tf"], entry["metadata"])
+                    if changed is not None:
+                        changed.add(entry["id"])
+        return deletions
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("This keyword index was opened read-only")
+
+    def _compact(self):
+        """Rewrite the log with only the live documents"""
+        tmp_path = self._log_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for doc_id, terms in self._terms.items():
+                counts = {term: self._postings[term][doc_id] for term in terms}
+                f.write(json.dumps({"id": doc_id, "tf": counts, "metadata": self._metadatas[doc_id]}) + "\n")
+        os.replace(tmp_path, self._log_path)
+        self._inode = os.stat(self._log_path).st_ino
+        self._offset = os.path.getsize(self._log_path)
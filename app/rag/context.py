@@ -0,0 +1,178 @@
+"""
+Context assembly: choosing what retrieved text goes into the prompt.
+
+Retrieval over-fetches candidates; ``ContextBuilder.build`` then
+
+1. picks a relevant but diverse subset by maximal marginal relevance
+   (MMR), using the candidates' stored embeddings,
+2. merges chunks that overlap or touch in the same source text, so the
+   overlap shared by consecutive chunks is sent once, and
+3. packs the result, most relevant first, into a token budget.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+
+# Metadata that locates a chunk within its source rather than naming the source
+POSITION_KEYS = ("char_start", "char_end", "chunk_index")
+# Metadata naming the text a chunk's offsets refer to: its file and the record in it
+SOURCE_KEYS = ("source", "record_index")
+
+# Rough characters per LLM token, for budgeting without a tokenizer call
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def similarity(distance: Optional[float]) -> Optional[float]:
+    """Cosine similarity from a squared L2 distance between unit-length embeddings"""
+    return None if distance is None else 1.0 - distance / 2.0
+
+def context_ids(results: List[Dict[str, Any]]) -> List[str]:
+    """IDs of every stored chunk a context was built from, merged ones included"""
+    return [doc_id for result in results for doc_id in result.get("ids", [result["id"]])]
+
+def mmr(query_embedding: np.ndarray, embeddings: np.ndarray, k: int, mmr_lambda: float = 0.7) -> List[int]:
+    """
+    Rows of ``embeddings`` chosen by maximal marginal relevance, in pick order.
+
+    Each pick maximizes ``mmr_lambda * sim(query, c) - (1 - mmr_lambda) *
+    max sim(c, picked)``, so 1.0 ranks by relevance alone and lower values
+    trade relevance for diversity.
+    """
+    vectors = _unit_rows(np.atleast_2d(np.asarray(embeddings, dtype=np.float32)))
+    query = _unit_rows(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))[0]
+    relevance = vectors @ query
+    pairwise = vectors @ vectors.T
+    redundancy = np.full(len(vectors), -np.inf, dtype=np.float32)
+    available = np.ones(len(vectors), dtype=bool)
+    picked = []
+    for _ in range(min(k, len(vectors))):
+        penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+        scores = np.where(available, mmr_lambda * relevance - (1 - mmr_lambda) * penalty, -np.inf)
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, pairwise[best])
+    return picked
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+def merge_adjacent(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merge results that overlap or touch in the same source text.
+
+    Results are from the same text when they name the same ``SOURCE_KEYS``
+    and the rest of their metadata agrees apart from ``POSITION_KEYS``;
+    results missing a source key are never merged. A merged result keeps the rank of its best member,
+    the best distance and similarity, and lists its members' ``ids``.
+    """
+    groups: Dict[tuple, List[int]] = {}
+    clusters = []
+    for rank, result in enumerate(results):
+        key = _source_key(result)
+        if key is None:
+            clusters.append([rank])
+        else:
+            groups.setdefault(key, []).append(rank)
+
+    for ranks in groups.values():
+        ranks.sort(key=lambda rank: results[rank]["metadata"]["char_start"])
+        cluster, end = [], None
+        for rank in ranks:
+            metadata = results[rank]["metadata"]
+            if cluster and metadata["char_start"] > end:
+                clusters.append(cluster)
+                cluster = []
+            cluster.append(rank)
+            end = metadata["char_end"] if len(cluster) == 1 else max(end, metadata["char_end"])
+        clusters.append(cluster)
+
+    clusters.sort(key=min)
+    return [_merge([results[rank] for rank in cluster]) for cluster in clusters]
+
+def _source_key(result: Dict[str, Any]) -> Optional[tuple]:
+    metadata = result.get("metadata") or {}
+    start, end = metadata.get("char_start"), metadata.get("char_end")
+    # Offsets only locate the text if they span exactly the stored chunk
+    if not isinstance(start, int) or not isinstance(end, int) or end - start != len(result["document"]):
+        return None
+    if any(metadata.get(key) is None for key in SOURCE_KEYS):
+        return None
+    return tuple(sorted((k, repr(v)) for k, v in metadata.items() if k not in POSITION_KEYS))
+
+def _merge(members: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Join results sorted by start offset, skipping the text they share"""
+    if len(members) == 1:
+        return members[0]
+    best = min(members, key=lambda member: _distance_key(member.get("distance")))
+    text = members[0]["document"]
+    end = members[0]["metadata"]["char_end"]
+    for member in members[1:]:
+        start, member_end = member["metadata"]["char_start"], member["metadata"]["char_end"]
+        if member_end > end:
+            text += member["document"][end - start:]
+            end = member_end
+    merged = dict(best)
+    merged.update(
+        document=text,
+        ids=[member["id"] for member in members],
+        metadata=dict(members[0]["metadata"], char_end=end)
+    )
+    return merged
+
+def _distance_key(distance: Optional[float]) -> float:
+    return np.inf if distance is None else distance
+
+class ContextBuilder:
+    def __init__(self, token_budget: int = 1500, fetch_factor: int = 4, mmr_lambda: float = 0.7,
+                 count_tokens: Callable[[str], int] = estimate_tokens):
+        """
+        Args:
+            token_budget: Most tokens of retrieved text put in a prompt
+            fetch_factor: Candidates retrieved per requested result, for MMR to choose from
+            mmr_lambda: Relevance weight against diversity, from 0 to 1
+            count_tokens: Token counter for budgeting
+        """
+        self.token_budget = token_budget
+        self.fetch_factor = max(1, fetch_factor)
+        self.mmr_lambda = mmr_lambda
+        self.count_tokens = count_tokens
+
+    def n_candidates(self, n_results: int) -> int:
+        return n_results * self.fetch_factor
+
+    def build(self, query_embedding: np.ndarray, candidates: List[Dict[str, Any]],
+              embeddings: Dict[str, np.ndarray], n_results: int) -> List[Dict[str, Any]]:
+        """
+        Choose up to ``n_results`` of the candidates and fit them to the budget.
+
+        ``embeddings`` maps candidate IDs to their stored vectors; candidates
+        without one (deleted since the search) are left out. Results come
+        back most relevant first, each labelled with its ``similarity``.
+        """
+        candidates = [candidate for candidate in candidates if candidate["id"] in embeddings]
+        if not candidates:
+            return []
+        matrix = np.stack([np.asarray(embeddings[candidate["id"]], dtype=np.float32) for candidate in candidates])
+        picked = [candidates[row] for row in mmr(query_embedding, matrix, n_results, self.mmr_lambda)]
+        results = []
+        for result in self._pack(merge_adjacent(picked)):
+            results.append(dict(result, similarity=similarity(result.get("distance"))))
+        return results
+
+    def _pack(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keep results in order while they fit the budget; the first is cut down if it alone does not"""
+        packed = []
+        remaining = self.token_budget
+        for result in results:
+            tokens = self.count_tokens(result["document"])
+            if tokens <= remaining:
+                packed.append(result)
+                remaining -= tokens
+            elif not packed:
+                packed.append(dict(result, document=result["document"][:remaining * CHARS_PER_TOKEN]))
+                remaining = 0
+        return packed
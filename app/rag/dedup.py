@@ -0,0 +1,183 @@
+"""
+Near-duplicate detection for stored chunks with MinHash and LSH.
+
+Each chunk is reduced to word 3-gram shingles of its lowercased words,
+so differences in whitespace and punctuation disappear and a changed
+timestamp only touches a few shingles. A MinHash signature estimates the
+Jaccard similarity of two shingle sets, and locality-sensitive hashing
+over bands of the signature finds candidate matches without comparing
+against every stored chunk. Signatures and band buckets live in a SQLite
+file next to the vector store, so memory use does not grow with the
+collection.
+"""
+
+import os
+import re
+import zlib
+import sqlite3
+import hashlib
+import threading
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+
+WORD = re.compile(r"\w+")
+# Mersenne prime for the universal hash family (a * x + b) mod p
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+def shingles(text: str, size: int = 3) -> np.ndarray:
+    """32-bit hashes of the word n-grams of a text"""
+    words = WORD.findall(text.lower())
+    if len(words) < size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.unique(np.fromiter((zlib.crc32(gram.encode()) for gram in grams), dtype=np.uint64, count=len(grams)))
+
+def lsh_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Choose (bands, rows) with bands * rows == num_perm.
+
+    Takes the most selective split whose LSH threshold (1/bands)^(1/rows)
+    is still at or below ``threshold``, so true duplicates are rarely
+    missed and candidates are then checked against the exact estimate.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+class NearDuplicateIndex:
+    def __init__(self, persist_dir: str, threshold: float = 0.9, num_perm: int = 128, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)[:, None]
+        self._lock = threading.Lock()
+
+        os.makedirs(persist_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(persist_dir, "minhash.sqlite"), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS signatures (id TEXT PRIMARY KEY, signature BLOB NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS bands (band INTEGER NOT NULL, bucket INTEGER NOT NULL, id TEXT NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS bands_bucket ON bands (band, bucket)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS bands_id ON bands (id)")
+        self._db.commit()
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        """MinHash signatures, one uint32 row of ``num_perm`` values per text"""
+        result = np.full((len(texts), self.num_perm), MAX_HASH, dtype=np.uint32)
+        for i, text in enumerate(texts):
+            hashes = shingles(text)
+            if len(hashes):
+                # uint64 arithmetic wraps, which keeps the permutations independent enough here
+                permuted = (self._a * hashes[None, :] + self._b) % np.uint64(MERSENNE_PRIME)
+                result[i] = (permuted.min(axis=1) & np.uint64(MAX_HASH)).astype(np.uint32)
+        return result
+
+    def match(self, ids: List[str], signatures: np.ndarray) -> List[Optional[str]]:
+        """
+        For each chunk, the ID of a stored or earlier chunk it nearly duplicates.
+
+        Chunks are compared with the index and with the chunks before them
+        in the same call. Chunks whose own ID is already stored, and exact
+        copies (same ID), are never reported.
+        """
+        matches: List[Optional[str]] = []
+        pending: Dict[Tuple[int, int], List[int]] = {}
+        with self._lock:
+            stored = {row[0] for row in self._select("SELECT id FROM signatures WHERE id IN ({})", list(ids))}
+            for i, (doc_id, signature) in enumerate(zip(ids, signatures)):
+                if doc_id in stored:
+                    matches.append(None)
+                    continue
+                buckets = self._buckets(signature)
+                candidates = set(self._stored_candidates(buckets))
+                earlier = {j for key in buckets for j in pending.get(key, ())}
+                best, best_similarity = None, self.threshold
+                for candidate_id, other in self._stored_signatures(candidates - {doc_id}):
+                    similarity = float(np.mean(other == signature))
+                    if similarity >= best_similarity:
+                        best, best_similarity = candidate_id, similarity
+                for j in sorted(earlier):
+                    if ids[j] == doc_id or matches[j] is not None:
+                        continue
+                    similarity = float(np.mean(signatures[j] == signature))
+                    if similarity >= best_similarity:
+                        best, best_similarity = ids[j], similarity
+                matches.append(best)
+                if best is None:
+                    for key in buckets:
+                        pending.setdefault(key, []).append(i)
+        return matches
+
+    def add(self, ids: List[str], signatures: np.ndarray):
+        """Store signatures of newly written chunks; known IDs are left as they are"""
+        with self._lock:
+            known = {row[0] for row in self._select("SELECT id FROM signatures WHERE id IN ({})", ids)}
+            fresh = [(doc_id, signature) for doc_id, signature in zip(ids, signatures) if doc_id not in known]
+            self._db.executemany(
+                "INSERT OR IGNORE INTO signatures (id, signature) VALUES (?, ?)",
+                [(doc_id, np.asarray(signature, dtype=np.uint32).tobytes()) for doc_id, signature in fresh]
+            )
+            self._db.executemany(
+                "INSERT INTO bands (band, bucket, id) VALUES (?, ?, ?)",
+                [(band, bucket, doc_id) for doc_id, signature in fresh for band, bucket in self._buckets(signature)]
+            )
+            self._db.commit()
+
+    def remove(self, ids: List[str], batch_size: int = 500):
+        """Forget chunks that were deleted from the store"""
+        with self._lock:
+            for i in range(0, len(ids), batch_size):
+                batch = ids[i:i + batch_size]
+                placeholders = ",".join("?" * len(batch))
+                self._db.execute(f"DELETE FROM signatures WHERE id IN ({placeholders})", batch)
+                self._db.execute(f"DELETE FROM bands WHERE id IN ({placeholders})", batch)
+            self._db.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT id FROM signatures")]
+
+    def _buckets(self, signature: np.ndarray) -> List[Tuple[int, int]]:
+        """(band, bucket) keys: a signed 64-bit hash of each band of the signature"""
+        signature = np.ascontiguousarray(signature, dtype=np.uint32)
+        return [
+            (band, int.from_bytes(
+                hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).digest(),
+                "little", signed=True
+            ))
+            for band in range(self.bands)
+        ]
+
+    def _stored_candidates(self, buckets: List[Tuple[int, int]]) -> List[str]:
+        clause = " OR ".join("(band = ? AND bucket = ?)" for _ in buckets)
+        rows = self._db.execute(
+            f"SELECT DISTINCT id FROM bands WHERE {clause}",
+            [value for key in buckets for value in key]
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def _stored_signatures(self, ids) -> List[Tuple[str, np.ndarray]]:
+        return [
+            (doc_id, np.frombuffer(blob, dtype=np.uint32))
+            for doc_id, blob in self._select("SELECT id, signature FROM signatures WHERE id IN ({})", list(ids))
+        ]
+
+    def _select(self, query: str, ids: List[str], batch_size: int = 500) -> List[tuple]:
+        rows = []
+        for i in range(0, len(ids), batch_size):
+            batch = ids[i:i + batch_size]
+            rows.extend(self._db.execute(query.format(",".join("?" * len(batch))), batch).fetchall())
+        return rows
@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional
+import numpy as np
+
+def text_hash(text: str) -> str:
+    """Cache key for a piece of text"""
+    return hashlib.sha256(text.encode()).hexdigest()
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by model name and text hash.
+
+    The first tier is an in-memory LRU holding up to ``max_size`` vectors.
+    The optional second tier is a SQLite file in ``cache_dir`` that
+    survives restarts and can be shared by several processes. Vectors
+    are stored as float32.
+    """
+
+    def __init__(self, model_name: str, max_size: int = 10000, cache_dir: Optional[str] = None):
+        self.model_name = model_name
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(
+                os.path.join(cache_dir, "embeddings.sqlite"),
+                timeout=30,
+                check_same_thread=False
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, text_hash))"
+            )
+            self._db.commit()
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up vectors for the given keys, None where not cached"""
+        found: List[Optional[np.ndarray]] = []
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                else:
+                    missing.append(i)
+                found.append(vector)
+
+            if missing and self._db is not None:
+                on_disk = self._read_disk([keys[i] for i in missing])
+                still_missing = []
+                for i in missing:
+                    vector = on_disk.get(keys[i])
+                    if vector is not None:
+                        found[i] = vector
+                        self._remember(keys[i], vector)
+                        self.disk_hits += 1
+                    else:
+                        still_missing.append(i)
+                missing = still_missing
+
+            self.misses += len(missing)
+        return found
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        """Store freshly computed vectors in both tiers"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                    [(self.model_name, key, vector.tobytes()) for key, vector in zip(keys, vectors)]
+                )
+                self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters for both tiers"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_size": self.max_size,
+            "disk_enabled": self._db is not None
+        }
+
+    def _remember(self, key: str, vector: np.ndarray):
+        if self.max_size <= 0:
+            return
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, keys: List[str], batch_size: int = 500) -> Dict[str, np.ndarray]:
+        vectors = {}
+        for i in range(0, len(keys), batch_size):
+            batch = keys[i:i + batch_size]
+            rows = self._db.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? "
+                f"AND text_hash IN ({','.join('?' * len(batch))})",
+                [self.model_name, *batch]
+            ).fetchall()
+            for key, blob in rows:
+                vectors[key] = np.frombuffer(blob, dtype=np.float32)
+        return vectors
@@ -1,14 +1,80 @@
+import threading
 from sentence_transformers import SentenceTransformer
-from typing import List
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+from .embedding_cache import EmbeddingCache, text_hash
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+_models: Dict[str, SentenceTransformer] = {}
+_models_lock = threading.Lock()
+
+def load_model(model_name: str = DEFAULT_MODEL) -> SentenceTransformer:
+    """
+    Load a model once per process.
+
+    A model loaded before the server forks its workers is shared by all of
+    them copy-on-write instead of being loaded again by each.
+    """
+    with _models_lock:
+        if model_name not in _models:
+            _models[model_name] = SentenceTransformer(model_name)
+        return _models[model_name]
 
 class EmbeddingGenerator:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
-    
+    def __init__(self, model_name: str = DEFAULT_MODEL, cache_size: int = 10000,
+                 cache_dir: Optional[str] = None):
+        self.model_name = model_name
+        self.model = load_model(model_name)
+        self.cache = EmbeddingCache(model_name, max_size=cache_size, cache_dir=cache_dir)
+
+    def encode(self, texts: List[str], normalize: bool = False) -> np.ndarray:
+        """
+        Embed texts into a contiguous float32 array of shape (len(texts), dim).
+
+        With ``normalize`` every row is scaled to unit length, so dot
+        products are cosine similarities.
+        """
+        vectors = self._encode_cached(texts)
+        if normalize and len(vectors):
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms > 0, norms, 1.0)
+        return vectors
+
     def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for a list of texts"""
-        return self.model.encode(texts).tolist()
-    
+        """Generate embeddings for a list of texts (list form of ``encode``)"""
+        return self.encode(texts).tolist()
+
     def generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding for a single text"""
-        return self.model.encode(text).tolist() 
\ No newline at end of file
+        """Generate embedding for a single text (list form of ``encode``)"""
+        return self.encode([text])[0].tolist()
+
+    def token_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Character spans of the model tokenizer's tokens in ``text``"""
+        encoding = self.model.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        return [tuple(span) for span in encoding["offset_mapping"]]
+
+    def cache_stats(self) -> Dict[str, float]:
+        """Embedding cache hit/miss counters"""
+        return self.cache.stats()
+
+    def _encode_cached(self, texts: List[str]) -> np.ndarray:
+        """Encode texts, running the model only for those not in the cache"""
+        keys = [text_hash(text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # Encode each distinct uncached text once, in a single batch
+        missing = {}
+        for key, text, vector in zip(keys, texts, cached):
+            if vector is None and key not in missing:
+                missing[key] = text
+        if missing:
+            encoded = np.asarray(self.model.encode(list(missing.values())), dtype=np.float32)
+            self.cache.put_many(list(missing), encoded)
+            fresh = dict(zip(missing, encoded))
+            cached = [fresh[key] if vector is None else vector for key, vector in zip(keys, cached)]
+
+        if not cached:
+            return np.empty((0, 0), dtype=np.float32)
+        # np.stack copies, so cached vectors are never aliased by the result
+        return np.stack(cached)
@@ -0,0 +1,102 @@
+"""
+Chroma-style metadata filters.
+
+A filter is a dict such as ``{"source": "poems.json"}``,
+``{"year": {"$gte": 1900}}`` or ``{"$or": [{"author": "Blake"},
+{"author": "Keats"}]}``. Supported operators are ``$eq``, ``$ne``,
+``$gt``, ``$gte``, ``$lt``, ``$lte``, ``$in`` and ``$nin`` on fields and
+``$and``/``$or`` to combine clauses. As in Chroma, a document without the
+field never matches a clause on it.
+"""
+
+from typing import Dict, Any, Optional
+
+FIELD_OPERATORS = {"$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin"}
+LOGICAL_OPERATORS = {"$and", "$or"}
+
+def normalize_filter(where: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Validate a filter and rewrite it into the single-operator form Chroma expects.
+
+    Several fields in one dict are combined with an explicit ``$and`` and
+    bare values become ``$eq`` clauses. Returns None for an empty filter.
+
+    Raises:
+        ValueError: if the filter uses an unknown operator or a malformed clause
+    """
+    if not where:
+        return None
+    if not isinstance(where, dict):
+        raise ValueError(f"Filter must be an object, got {type(where).__name__}")
+
+    clauses = []
+    for key, value in where.items():
+        if key in LOGICAL_OPERATORS:
+            if not isinstance(value, list) or not value:
+                raise ValueError(f"{key} needs a non-empty list of filters")
+            parts = [normalize_filter(part) for part in value]
+            parts = [part for part in parts if part]
+            if len(parts) == 1:
+                clauses.append(parts[0])
+            elif parts:
+                clauses.append({key: parts})
+        elif key.startswith("$"):
+            raise ValueError(f"Unknown filter operator: {key}")
+        elif isinstance(value, dict):
+            if len(value) != 1:
+                raise ValueError(f"Filter on {key!r} must have exactly one operator")
+            operator, operand = next(iter(value.items()))
+            if operator not in FIELD_OPERATORS:
+                raise ValueError(f"Unknown filter operator: {operator}")
+            if operator in ("$in", "$nin") and not isinstance(operand, list):
+                raise ValueError(f"{operator} on {key!r} needs a list")
+            clauses.append({key: {operator: operand}})
+        else:
+            clauses.append({key: {"$eq": value}})
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def matches_filter(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Whether a document's metadata satisfies a (normalized) filter"""
+    if not where:
+        return True
+    for key, value in where.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, part) for part in value):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, part) for part in value):
+                return False
+        elif isinstance(value, dict):
+            if not all(_compare(metadata, key, operator, operand) for operator, operand in value.items()):
+                return False
+        elif not _compare(metadata, key, "$eq", value):
+            return False
+    return True
+
+def _compare(metadata: Dict[str, Any], key: str, operator: str, operand: Any) -> bool:
+    if key not in metadata:
+        return False
+    value = metadata[key]
+    if operator == "$eq":
+        return value == operand
+    if operator == "$ne":
+        return value != operand
+    if operator == "$in":
+        return value in operand
+    if operator == "$nin":
+        return value not in operand
+    try:
+        if operator == "$gt":
+            return value > operand
+        if operator == "$gte":
+            return value >= operand
+        if operator == "$lt":
+            return value < operand
+        if operator == "$lte":
+            return value <= operand
+    except TypeError:
+        return False
+    raise ValueError(f"Unknown filter operator: {operator}")
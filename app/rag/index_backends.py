@@ -0,0 +1,796 @@
+"""
+Storage and search backends behind VectorStore.
+
+Every backend speaks the same small interface: ``add``, ``delete``,
+``get``, ``query``, ``count``, ``ids`` and ``refresh``. ``query`` returns Chroma-shaped results
+(one list per query embedding under ``ids``, ``documents``, ``metadatas``
+and ``distances``), with distances as squared L2 like Chroma's default
+space. Metadata filters (see ``filters.py``) are applied inside the index
+so a filtered query still returns ``n_results`` matches when there are
+that many.
+"""
+
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, NamedTuple, Optional, Sequence, Set
+import numpy as np
+from .filters import matches_filter
+
+logger = logging.getLogger(__name__)
+
+# Fields ``get`` can return besides the IDs
+GET_FIELDS = ("documents", "metadatas", "embeddings")
+
+class IndexBackend:
+    """Interface implemented by every vector index backend"""
+
+    def add(self, ids: List[str], documents: List[str], embeddings: np.ndarray,
+            metadatas: List[Dict[str, Any]]):
+        """Store documents with their float32 embedding rows; IDs that already exist are ignored"""
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]):
+        """Remove documents by ID"""
+        raise NotImplementedError
+
+    def get(self, ids: List[str], include: Sequence[str] = GET_FIELDS) -> Dict[str, List[Any]]:
+        """
+        Fetch stored documents by ID, in the given order, skipping unknown IDs.
+
+        Returns ``ids`` plus the ``include``d fields of ``GET_FIELDS``.
+        """
+        raise NotImplementedError
+
+    def query(self, query_embeddings: np.ndarray, n_results: int,
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, List[List[Any]]]:
+        """Return the nearest documents matching ``where`` for each query embedding"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Number of stored documents"""
+        raise NotImplementedError
+
+    def stats(self, recall_k: Optional[int] = None, sample: int = 100) -> Dict[str, Any]:
+        """Index size and, where the backend can measure it, recall@k"""
+        return {"count": self.count()}
+
+    def ids(self) -> List[str]:
+        """IDs of every stored document"""
+        raise NotImplementedError
+
+    def refresh(self) -> Optional[Set[str]]:
+        """
+        Pick up writes made by another process.
+
+        Returns the IDs added or removed since the last load, or None when
+        the backend cannot tell.
+        """
+        raise NotImplementedError
+
+class ChromaBackend(IndexBackend):
+    """ChromaDB persistent collection"""
+
+    def __init__(self, persist_dir: str, collection_name: str):
+        from chromadb.config import Settings
+
+        os.makedirs(persist_dir, exist_ok=True)
+        self.persist_dir = persist_dir
+        self.collection_name = collection_name
+        self._settings = Settings(
+            anonymized_telemetry=False,
+            is_persistent=True
+        )
+        self._open()
+
+    def _open(self):
+        import chromadb
+
+        # Initialize ChromaDB with persistent storage
+        self.client = chromadb.PersistentClient(path=self.persist_dir, settings=self._settings)
+
+        # Get or create collection
+        self.collection = self.client.get_or_create_collection(
+            name=self.collection_name,
+            metadata={"description": "RAG system document store"}
+        )
+
+    def add(self, ids, documents, embeddings, metadatas):
+        # Chroma validates embeddings as nested lists
+        self.collection.add(
+            documents=documents,
+            embeddings=np.asarray(embeddings).tolist(),
+            metadatas=metadatas,
+            ids=ids
+        )
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+
+    def get(self, ids, include=GET_FIELDS):
+        found = self.collection.get(ids=ids, include=list(include))
+        rows = {doc_id: i for i, doc_id in enumerate(found["ids"])}
+        order = [rows[doc_id] for doc_id in ids if doc_id in rows]
+        return {key: [found[key][i] for i in order] for key in ("ids", *include)}
+
+    def query(self, query_embeddings, n_results, where=None):
+        if where:
+            return self.collection.query(
+                query_embeddings=np.atleast_2d(query_embeddings).tolist(),
+                n_results=n_results,
+                where=where
+            )
+        return self.collection.query(
+            query_embeddings=np.atleast_2d(query_embeddings).tolist(),
+            n_results=n_results
+        )
+
+    def count(self):
+        return self.collection.count()
+
+    def ids(self):
+        return self.collection.get(include=[])["ids"]
+
+    def stats(self, recall_k=None, sample=100):
+        return {"backend": "chroma", "count": self.count()}
+
+    def refresh(self):
+        # Each process keeps its own in-memory copy of Chroma's vector
+        # segment, so reopen the client to see another process's writes
+        if hasattr(self.client, "clear_system_cache"):
+            self.client.clear_system_cache()
+        self._open()
+        return None
+
+VECTOR_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+def quantization_scale(vectors: np.ndarray) -> np.ndarray:
+    """Per-dimension int8 scale mapping each column's largest magnitude to 127"""
+    scale = np.abs(vectors).max(axis=0) / 127.0 if len(vectors) else np.ones(vectors.shape[1])
+    return np.where(scale > 0, scale, 1.0).astype(np.float32)
+
+def encode_vectors(vectors: np.ndarray, dtype: str, scale: Optional[np.ndarray] = None) -> np.ndarray:
+    """Compress float32 vectors to ``dtype``; int8 needs the per-dimension ``scale``"""
+    if dtype == "int8":
+        return np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+    return vectors.astype(VECTOR_DTYPES[dtype])
+
+def decode_vectors(codes: np.ndarray, scale: Optional[np.ndarray] = None) -> np.ndarray:
+    """Approximate float32 vectors back from their stored form"""
+    vectors = np.asarray(codes, dtype=np.float32)
+    return vectors * scale if scale is not None else vectors
+
+class _Snapshot(NamedTuple):
+    """What one search reads, taken under a single lock so a reload cannot swap part of it"""
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    vectors: np.ndarray
+    matrix: np.ndarray
+    norms: np.ndarray
+    scale: Optional[np.ndarray]
+    count: int
+    index: Any
+    graph_rows: int
+
+# The writer saves the HNSW graph again once this fraction of rows was
+# added since the last save; readers search the newer rows exactly
+HNSW_SAVE_FRACTION = 0.05
+
+class NumpyBackend(IndexBackend):
+    """
+    In-process index over a contiguous vector matrix.
+
+    Vectors live in ``vectors.f32`` (raw row-major float32, memory-mapped
+    for search) and documents, IDs and metadata in ``records.jsonl``; both
+    are append-only and rewritten only when documents are deleted. Search
+    is exact brute force with one matrix multiply while the collection is
+    smaller than ``ann_threshold``. Above it, the writing instance builds
+    an HNSW graph (hnswlib, installed with chromadb), extends it as
+    documents are added and saves it to ``hnsw.bin`` whenever it has grown
+    by ``HNSW_SAVE_FRACTION`` since the last save. Read-only instances
+    never build one: they load the saved graph, searching exactly until it
+    exists, and search rows added since it was saved exactly. Filtered
+    queries search only the matching rows: exactly when they are fewer
+    than ``ann_threshold``, otherwise through HNSW with a row filter.
+
+    With ``dtype`` "float16" or "int8" (scalar quantization with a
+    per-dimension scale) search runs over a compressed copy,
+    ``vectors.f16`` or ``vectors.i8``, so only that has to stay in RAM.
+    The top ``rerank`` times ``n_results`` candidates are then re-scored
+    against the float32 file, which is read only for those rows. Compressed
+    indexes always search exactly: an HNSW graph would hold its own
+    float32 copy of every vector.
+    """
+
+    def __init__(self, persist_dir: str, ann_threshold: int = 50000, hnsw_m: int = 16,
+                 hnsw_ef_construction: int = 200, hnsw_ef_search: int = 64,
+                 dtype: str = "float32", rerank: int = 4, read_only: bool = False):
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        self.persist_dir = persist_dir
+        self.ann_threshold = ann_threshold
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef_search = hnsw_ef_search
+        self.dtype = dtype
+        self.rerank = rerank
+        # Read-only instances never modify the files; call refresh() to see
+        # what the process that writes them has added since
+        self.read_only = read_only
+        self._vectors_path = os.path.join(persist_dir, "vectors.f32")
+        self._codes_path = os.path.join(persist_dir, {"float16": "vectors.f16", "int8": "vectors.i8"}.get(dtype, ""))
+        self._records_path = os.path.join(persist_dir, "records.jsonl")
+        self._meta_path = os.path.join(persist_dir, "meta.json")
+        self._hnsw_path = os.path.join(persist_dir, "hnsw.bin")
+        self._lock = threading.RLock()
+        self._hnsw = None
+        self._filter_rows: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        os.makedirs(persist_dir, exist_ok=True)
+        self._load()
+
+    @property
+    def compressed(self) -> bool:
+        return self.dtype != "float32"
+
+    def add(self, ids, documents, embeddings, metadatas):
+        self._check_writable()
+        with self._lock:
+            fresh = [i for i, doc_id in enumerate(ids) if doc_id not in self._rows]
+            if not fresh:
+                return
+            vectors = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32)[fresh])
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+
+            with open(self._vectors_path, 'ab') as f:
+                f.write(vectors.tobytes())
+            requantize = self.dtype == "int8" and (
+                self._scale is None or np.any(np.abs(vectors).max(axis=0) > 127.0 * self._scale)
+            )
+            if self.compressed and not requantize:
+                with open(self._codes_path, 'ab') as f:
+                    f.write(encode_vectors(vectors, self.dtype, self._scale).tobytes())
+            with open(self._records_path, 'a', encoding='utf-8') as f:
+                for i in fresh:
+                    f.write(json.dumps({"id": ids[i], "document": documents[i], "metadata": metadatas[i]}) + "\n")
+
+            for i in fresh:
+                self._rows[ids[i]] = len(self._ids)
+                self._ids.append(ids[i])
+                self._documents.append(documents[i])
+                self._metadatas.append(metadatas[i])
+            self._filter_rows.clear()
+            if requantize:
+                # New values fall outside the int8 range; rescale everything
+                self._vectors = self._map(self._vectors_path, np.float32, len(self._ids))
+                self._write_codes(len(self._ids))
+                self._map_vectors(len(self._ids))
+                self._norms = self._row_norms(self._matrix, self._scale)
+            else:
+                self._map_vectors(len(self._ids))
+                self._norms = np.concatenate([
+                    self._norms,
+                    self._row_norms(self._matrix[len(self._ids) - len(fresh):], self._scale)
+                ])
+            self._write_meta()
+            # Built here rather than on first query, so readers can load it
+            self._ann_index(len(self._ids))
+
+    def delete(self, ids):
+        self._check_writable()
+        with self._lock:
+            doomed = {self._rows[doc_id] for doc_id in ids if doc_id in self._rows}
+            if not doomed:
+                return
+            keep = np.array([row for row in range(len(self._ids)) if row not in doomed], dtype=np.int64)
+            vectors = np.ascontiguousarray(self._vectors[keep]) if len(keep) else np.empty((0, self.dim), np.float32)
+
+            # Row numbers are about to change, so the saved HNSW graph goes
+            # first: a reader must never pair the old graph with the new rows
+            if os.path.exists(self._hnsw_path):
+                os.remove(self._hnsw_path)
+
+            # Rewrite compacted files next to the old ones, then swap them in
+            with open(self._vectors_path + ".tmp", 'wb') as f:
+                f.write(vectors.tobytes())
+            with open(self._records_path + ".tmp", 'w', encoding='utf-8') as f:
+                for row in keep:
+                    f.write(json.dumps({"id": self._ids[row], "document": self._documents[row],
+                                        "metadata": self._metadatas[row]}) + "\n")
+            os.replace(self._vectors_path + ".tmp", self._vectors_path)
+            os.replace(self._records_path + ".tmp", self._records_path)
+            if self.compressed:
+                self._write_codes(len(keep), vectors)
+
+            self._hnsw_saved_rows = 0
+            self._write_meta()
+            self._load()
+            self._ann_index(len(self._ids))
+
+    def get(self, ids, include=GET_FIELDS):
+        with self._lock:
+            rows = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows]
+            found = {"ids": [self._ids[row] for row in rows]}
+            if "documents" in include:
+                found["documents"] = [self._documents[row] for row in rows]
+            if "metadatas" in include:
+                found["metadatas"] = [self._metadatas[row] for row in rows]
+            if "embeddings" in include:
+                # Only these rows of the memmap are read
+                found["embeddings"] = [np.array(self._vectors[row]) for row in rows]
+            return found
+
+    def query(self, query_embeddings, n_results, where=None):
+        with self._lock:
+            snapshot = self._snapshot()
+            allowed = self._matching_rows(where) if where else None
+
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        rows, distances = self._search(snapshot, queries, n_results, allowed, self.rerank)
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query_rows, query_distances in zip(rows, distances):
+            results["ids"].append([snapshot.ids[row] for row in query_rows])
+            results["documents"].append([snapshot.documents[row] for row in query_rows])
+            results["metadatas"].append([snapshot.metadatas[row] for row in query_rows])
+            results["distances"].append([float(d) for d in query_distances])
+        return results
+
+    def count(self):
+        return len(self._ids)
+
+    def ids(self):
+        return list(self._ids)
+
+    def refresh(self):
+        """
+        Catch up with the files after another process wrote to them.
+
+        Appended rows are read incrementally. When the files were rewritten
+        (after deletions or an int8 rescale) everything is reloaded.
+        """
+        stamp = self._stamp(self._meta_path)
+        if stamp == self._meta_stamp:
+            return set()
+        meta = self._read_meta()
+        with self._lock:
+            scale = np.asarray(meta["scale"], dtype=np.float32) if meta.get("scale") and self.dtype == "int8" else None
+            appended = (
+                not self._private_codes
+                and self._data_stamps() == self._file_stamps
+                and meta.get("dim") == self.dim
+                and meta.get("count", 0) >= len(self._ids)
+                and (scale is None) == (self._scale is None)
+                and (scale is None or np.array_equal(scale, self._scale))
+            )
+            if appended and self.dim is not None:
+                self._meta_stamp = stamp
+                if self._hnsw_rows and meta.get("hnsw_rows", 0) > self._hnsw_rows:
+                    self._hnsw = None  # the writer saved a larger graph; load that instead
+                self._hnsw_tried = None
+                return self._read_appended(meta["count"])
+            old_ids = set(self._ids)
+            self._load()
+            return old_ids.symmetric_difference(self._ids)
+
+    def _read_appended(self, count: int) -> Set[str]:
+        """Load records past the ones already in memory, up to ``count`` rows"""
+        start = len(self._ids)
+        count = min(count, os.path.getsize(self._vectors_path) // (4 * self.dim))
+        added = []
+        with open(self._records_path, 'rb') as f:
+            f.seek(self._records_offset)
+            for line in f:
+                if start + len(added) >= count:
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                added.append(record)
+                self._records_offset += len(line)
+        if not added:
+            return set()
+        # Extended in place like add(), so a query that took the lists before
+        # the matrix grew can still resolve every row it finds
+        self._ids.extend(record["id"] for record in added)
+        self._documents.extend(record["document"] for record in added)
+        self._metadatas.extend(record["metadata"] for record in added)
+        for row in range(start, len(self._ids)):
+            self._rows[self._ids[row]] = row
+        self._filter_rows.clear()
+        self._map_vectors(len(self._ids))
+        self._norms = np.concatenate([self._norms, self._row_norms(self._matrix[start:], self._scale)])
+        return {record["id"] for record in added}
+
+    def stats(self, recall_k: Optional[int] = None, sample: int = 100) -> Dict[str, Any]:
+        """
+        Memory footprint and, with ``recall_k``, search quality.
+
+        Recall@k is measured on ``sample`` stored vectors used as queries,
+        against exact float32 search over the whole collection.
+        """
+        with self._lock:
+            snapshot = self._snapshot()
+            count = snapshot.count
+            search_bytes = int(snapshot.matrix.nbytes)
+            report = {
+                "backend": "numpy",
+                "count": count,
+                "dim": self.dim,
+                "dtype": self.dtype,
+                "search": "hnsw" if snapshot.index is not None else "exact",
+                "hnsw_rows": snapshot.graph_rows,
+                "rerank": self.rerank if self.compressed else 0,
+                "search_bytes": search_bytes,
+                "float32_bytes": 4 * count * (self.dim or 0),
+                "compression": 4 * count * (self.dim or 0) / search_bytes if search_bytes else 1.0
+            }
+        if recall_k and count:
+            rng = np.random.default_rng(0)
+            vectors = snapshot.vectors
+            queries = np.asarray(vectors[np.sort(rng.choice(count, min(sample, count), replace=False))])
+            truth, _ = self._exact_search(vectors, self._row_norms(vectors, None), None, queries, recall_k)
+            found = self._search(snapshot, queries, recall_k, None, self.rerank)[0]
+            report[f"recall@{recall_k}"] = self._recall(truth, found)
+            if self.compressed and self.rerank:
+                found = self._search(snapshot, queries, recall_k, None, 0)[0]
+                report[f"recall@{recall_k}_without_rerank"] = self._recall(truth, found)
+        return report
+
+    @staticmethod
+    def _recall(truth: np.ndarray, found: np.ndarray) -> float:
+        hits = sum(len(set(expected) & set(got)) for expected, got in zip(truth.tolist(), found.tolist()))
+        return hits / truth.size if truth.size else 1.0
+
+    def _snapshot(self) -> _Snapshot:
+        """The current lists, matrices and graph; call with the lock held"""
+        count = len(self._ids)
+        index = self._ann_index(count)
+        return _Snapshot(self._ids, self._documents, self._metadatas, self._vectors, self._matrix,
+                         self._norms, self._scale, count, index, self._hnsw_rows if index is not None else 0)
+
+    def _search(self, snapshot: _Snapshot, queries: np.ndarray, n_results: int,
+                allowed: Optional[np.ndarray], rerank: int):
+        """Row numbers and squared L2 distances of the nearest rows of ``snapshot`` for each query"""
+        vectors, matrix, norms, scale = snapshot.vectors, snapshot.matrix, snapshot.norms, snapshot.scale
+        count, index = snapshot.count, snapshot.index
+        k = min(n_results, count if allowed is None else len(allowed))
+        if k == 0:
+            return np.empty((len(queries), 0), np.int64), np.empty((len(queries), 0), np.float32)
+
+        if index is not None and (allowed is None or len(allowed) >= self.ann_threshold):
+            found = self._graph_search(snapshot, queries, k, allowed)
+            if found is not None:
+                return found
+
+        reranking = self.compressed and rerank > 0
+        n_candidates = min(k * rerank, count if allowed is None else len(allowed)) if reranking else k
+        if allowed is None:
+            rows, distances = self._exact_search(matrix, norms, scale, queries, n_candidates)
+        else:
+            subset_rows, distances = self._exact_search(matrix[allowed], norms[allowed], scale, queries, n_candidates)
+            rows = allowed[subset_rows]
+        if reranking:
+            rows, distances = self._rerank(vectors, queries, rows, k)
+        return rows, distances
+
+    def _graph_search(self, snapshot: _Snapshot, queries: np.ndarray, k: int, allowed: Optional[np.ndarray]):
+        """
+        Nearest rows through the HNSW graph, with the rows it does not cover
+        yet searched exactly; None when the graph cannot answer.
+        """
+        count, graph_rows = snapshot.count, snapshot.graph_rows
+        tail = np.arange(graph_rows, count) if allowed is None else allowed[allowed >= graph_rows]
+        k_graph = min(k, graph_rows if allowed is None else len(allowed) - len(tail))
+        if not k_graph:
+            return None
+        # Resizes and inserts happen under the same lock
+        with self._lock:
+            snapshot.index.set_ef(max(self.hnsw_ef_search, k_graph))
+            if allowed is None:
+                rows, distances = snapshot.index.knn_query(queries, k=k_graph)
+            else:
+                mask = np.zeros(count, dtype=bool)
+                mask[allowed] = True
+                try:
+                    rows, distances = snapshot.index.knn_query(
+                        queries, k=k_graph, num_threads=1, filter=lambda row: row < graph_rows and bool(mask[row]))
+                except RuntimeError:
+                    return None  # graph walk found fewer than k matches; search the rows exactly
+        rows = rows.astype(np.int64)
+        if not len(tail):
+            return rows, distances
+        tail_rows, tail_distances = self._exact_search(
+            snapshot.matrix[tail], snapshot.norms[tail], snapshot.scale, queries, min(k, len(tail)))
+        rows = np.concatenate([rows, tail[tail_rows]], axis=1)
+        distances = np.concatenate([distances, tail_distances], axis=1)
+        order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(rows, order, axis=1), np.take_along_axis(distances, order, axis=1)
+
+    @staticmethod
+    def _rerank(vectors: np.ndarray, queries: np.ndarray, rows: np.ndarray, k: int):
+        """Re-score candidate rows with their float32 vectors and keep the best k"""
+        candidates = np.asarray(vectors[rows.reshape(-1)]).reshape(rows.shape + (-1,))
+        differences = candidates - queries[:, None, :]
+        distances = np.einsum('qkd,qkd->qk', differences, differences)
+        order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(rows, order, axis=1), np.take_along_axis(distances, order, axis=1)
+
+    @staticmethod
+    def _exact_search(matrix: np.ndarray, norms: np.ndarray, scale: Optional[np.ndarray], queries: np.ndarray,
+                      k: int, tile: int = 256, row_tile: int = 65536):
+        """
+        Brute-force squared L2 top-k via matrix multiplies.
+
+        Queries are processed ``tile`` at a time against ``row_tile`` rows
+        decoded to float32 at a time, keeping a running top-k per query.
+        """
+        all_rows, all_distances = [], []
+        for start in range(0, len(queries), tile):
+            block = queries[start:start + tile]
+            block_norms = np.einsum('ij,ij->i', block, block)[:, None]
+            best_rows = np.empty((len(block), 0), np.int64)
+            best_distances = np.empty((len(block), 0), np.float32)
+            for row_start in range(0, len(matrix), row_tile):
+                rows = decode_vectors(matrix[row_start:row_start + row_tile], scale)
+                # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2
+                distances = norms[None, row_start:row_start + len(rows)] - 2.0 * (block @ rows.T)
+                distances += block_norms
+                np.maximum(distances, 0.0, out=distances)
+                row_ids = np.broadcast_to(np.arange(row_start, row_start + len(rows)), distances.shape)
+                distances = np.concatenate([best_distances, distances], axis=1)
+                row_ids = np.concatenate([best_rows, row_ids], axis=1)
+                if k < distances.shape[1]:
+                    top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                    distances = np.take_along_axis(distances, top, axis=1)
+                    row_ids = np.take_along_axis(row_ids, top, axis=1)
+                best_rows, best_distances = row_ids, distances
+            order = np.argsort(best_distances, axis=1, kind='stable')
+            all_rows.append(np.take_along_axis(best_rows, order, axis=1))
+            all_distances.append(np.take_along_axis(best_distances, order, axis=1))
+        return np.concatenate(all_rows), np.concatenate(all_distances)
+
+    @staticmethod
+    def _row_norms(matrix: np.ndarray, scale: Optional[np.ndarray], row_tile: int = 65536) -> np.ndarray:
+        """Squared norms of the (decoded) rows of ``matrix``"""
+        norms = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), row_tile):
+            rows = decode_vectors(matrix[start:start + row_tile], scale)
+            norms[start:start + len(rows)] = np.einsum('ij,ij->i', rows, rows)
+        return norms
+
+    def _matching_rows(self, where: Dict[str, Any], cache_size: int = 32) -> np.ndarray:
+        """Row numbers whose metadata matches ``where``, memoized until the next write"""
+        key = json.dumps(where, sort_keys=True)
+        rows = self._filter_rows.get(key)
+        if rows is None:
+            rows = np.fromiter(
+                (row for row, metadata in enumerate(self._metadatas) if matches_filter(metadata, where)),
+                dtype=np.int64
+            )
+            self._filter_rows[key] = rows
+            while len(self._filter_rows) > cache_size:
+                self._filter_rows.popitem(last=False)
+        else:
+            self._filter_rows.move_to_end(key)
+        return rows
+
+    def _ann_index(self, count: int):
+        """HNSW index over the first ``self._hnsw_rows`` rows, or None while exact search is used"""
+        if count < self.ann_threshold or self.compressed or self._hnsw is False:
+            return None
+        try:
+            import hnswlib
+        except ImportError:
+            logger.warning("hnswlib is not installed; using exact search for a large collection")
+            self._hnsw = False
+            return None
+        if self.read_only:
+            return self._saved_ann_index(hnswlib, count)
+
+        if self._hnsw is None:
+            self._hnsw = hnswlib.Index(space='l2', dim=self.dim)
+            self._hnsw_rows = 0
+            if os.path.exists(self._hnsw_path) and 0 < self._hnsw_saved_rows <= count:
+                try:
+                    self._hnsw.load_index(self._hnsw_path, max_elements=count)
+                    self._hnsw_rows = self._hnsw.get_current_count()
+                except (RuntimeError, OSError) as e:
+                    logger.warning(f"Rebuilding the HNSW index, the saved one could not be loaded: {e}")
+            if not self._hnsw_rows or self._hnsw_rows > count:
+                # Missing, or left over from rows an interrupted write lost
+                self._hnsw = hnswlib.Index(space='l2', dim=self.dim)
+                self._hnsw.init_index(max_elements=count, ef_construction=self.hnsw_ef_construction, M=self.hnsw_m)
+                self._hnsw_rows = self._hnsw_saved_rows = 0
+        if self._hnsw_rows < count:
+            logger.info(f"Adding {count - self._hnsw_rows} vectors to the HNSW index")
+            if self._hnsw.get_max_elements() < count:
+                self._hnsw.resize_index(max(count, 2 * self._hnsw.get_max_elements()))
+            self._hnsw.add_items(np.asarray(self._vectors[self._hnsw_rows:count]),
+                                 np.arange(self._hnsw_rows, count))
+            self._hnsw_rows = count
+            if count - self._hnsw_saved_rows >= HNSW_SAVE_FRACTION * self._hnsw_saved_rows:
+                # Saved beside the old graph and swapped in, so readers never load half a file
+                self._hnsw.save_index(self._hnsw_path + ".tmp")
+                os.replace(self._hnsw_path + ".tmp", self._hnsw_path)
+                self._hnsw_saved_rows = count
+                self._write_meta()
+        return self._hnsw
+
+    def _saved_ann_index(self, hnswlib, count: int):
+        """Read-only side: the graph the writer saved, or None to search exactly"""
+        if self._hnsw is None:
+            stamp = self._stamp(self._hnsw_path)
+            if stamp is None or stamp == self._hnsw_tried:
+                return None
+            self._hnsw_tried = stamp
+            # A graph saved after the files were rewritten numbers rows
+            # differently from the ones loaded here; wait for refresh()
+            if self._data_stamps() != self._file_stamps:
+                return None
+            index = hnswlib.Index(space='l2', dim=self.dim)
+            try:
+                index.load_index(self._hnsw_path)
+            except (RuntimeError, OSError) as e:
+                logger.warning(f"Could not load the saved HNSW index: {e}")
+                return None
+            if self._data_stamps() != self._file_stamps or index.get_current_count() > count:
+                return None
+            logger.info(f"Loaded HNSW index over {index.get_current_count()} vectors")
+            self._hnsw, self._hnsw_rows = index, index.get_current_count()
+        return self._hnsw
+
+    def _load(self):
+        # Stamps first: a write landing while loading then shows up in the next refresh()
+        self._meta_stamp = self._stamp(self._meta_path)
+        self._file_stamps = self._data_stamps()
+        meta = self._read_meta()
+        self.dim: Optional[int] = meta.get("dim")
+        if self._hnsw is not False:
+            self._hnsw = None
+        self._hnsw_rows = 0
+        self._hnsw_saved_rows = meta.get("hnsw_rows", 0)
+        self._hnsw_tried = None
+        self._scale = np.asarray(meta["scale"], dtype=np.float32) if meta.get("scale") and self.dtype == "int8" else None
+
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        offsets = [0]  # byte offset where each record line starts
+        if os.path.exists(self._records_path):
+            with open(self._records_path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # torn final line from an interrupted write
+                    self._ids.append(record["id"])
+                    self._documents.append(record["document"])
+                    self._metadatas.append(record["metadata"])
+                    offsets.append(offsets[-1] + len(line))
+
+        # If a write was interrupted the shorter file wins; trim the longer
+        # one so later appends stay aligned
+        count = len(self._ids) if self.dim else 0
+        if count and os.path.exists(self._vectors_path):
+            count = min(count, os.path.getsize(self._vectors_path) // (4 * self.dim))
+        if self.read_only:
+            # Rows past the count in meta.json may still be being written
+            count = min(count, meta.get("count", count))
+        del self._ids[count:], self._documents[count:], self._metadatas[count:]
+        self._records_offset = offsets[count]
+        if not self.read_only:
+            if self.dim and os.path.exists(self._vectors_path) and os.path.getsize(self._vectors_path) > 4 * self.dim * count:
+                os.truncate(self._vectors_path, 4 * self.dim * count)
+            if os.path.exists(self._records_path) and os.path.getsize(self._records_path) > offsets[count]:
+                os.truncate(self._records_path, offsets[count])
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._filter_rows.clear()
+
+        self._vectors = self._map(self._vectors_path, np.float32, count)
+        self._private_codes = False
+        if self.compressed:
+            # The compressed copy is derived from vectors.f32; rebuild it if
+            # it is missing, short or was written with another dtype
+            row_bytes = np.dtype(VECTOR_DTYPES[self.dtype]).itemsize * (self.dim or 0)
+            size = os.path.getsize(self._codes_path) if os.path.exists(self._codes_path) else 0
+            if meta.get("dtype", "float32") != self.dtype or size < row_bytes * count or (
+                    self.dtype == "int8" and count and self._scale is None):
+                if self.read_only:
+                    # The files belong to the writer, so compress a private copy in memory
+                    self._compress_in_memory(count)
+                    return
+                logger.info(f"Building {self.dtype} copy of {count} vectors")
+                self._write_codes(count, np.asarray(self._vectors))
+                self._write_meta()
+            elif size > row_bytes * count and not self.read_only:
+                os.truncate(self._codes_path, row_bytes * count)
+        self._map_vectors(count)
+        self._norms = self._row_norms(self._matrix, self._scale)
+
+    def _compress_in_memory(self, count: int):
+        vectors = np.asarray(self._vectors)
+        if self.dtype == "int8":
+            self._scale = quantization_scale(vectors) if count else None
+        self._matrix = (encode_vectors(vectors, self.dtype, self._scale) if count
+                        else np.empty((0, self.dim or 0), VECTOR_DTYPES[self.dtype]))
+        self._norms = self._row_norms(self._matrix, self._scale)
+        self._private_codes = True
+
+    def _read_meta(self) -> Dict[str, Any]:
+        try:
+            with open(self._meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    @staticmethod
+    def _stamp(path: str):
+        """Identity of a file's current version: rewrites by os.replace change the inode"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _data_stamps(self):
+        """Inodes of the data files; appends keep them, rewrites replace them"""
+        paths = [self._vectors_path, self._records_path] + ([self._codes_path] if self.compressed else [])
+        return [self._stamp(path)[0] if os.path.exists(path) else None for path in paths]
+
+    def _write_codes(self, count: int, vectors: Optional[np.ndarray] = None):
+        """Rewrite the compressed copy from float32 vectors, refitting the int8 scale"""
+        if vectors is None:
+            vectors = np.asarray(self._vectors[:count])
+        if self.dtype == "int8":
+            self._scale = quantization_scale(vectors) if count else None
+        codes = encode_vectors(vectors, self.dtype, self._scale) if count else np.empty(0, np.int8)
+        with open(self._codes_path + ".tmp", 'wb') as f:
+            f.write(codes.tobytes())
+        os.replace(self._codes_path + ".tmp", self._codes_path)
+
+    def _map(self, path: str, dtype, count: int) -> np.ndarray:
+        if count:
+            return np.memmap(path, dtype=dtype, mode='r', shape=(count, self.dim))
+        return np.empty((0, self.dim or 0), dtype=dtype)
+
+    def _map_vectors(self, count: int):
+        self._vectors = self._map(self._vectors_path, np.float32, count)
+        # Search runs over the compressed copy when there is one
+        self._matrix = self._map(self._codes_path, VECTOR_DTYPES[self.dtype], count) if self.compressed else self._vectors
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("This index was opened read-only")
+
+    def _write_meta(self):
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "dim": self.dim,
+                "count": len(self._ids),
+                "hnsw_rows": self._hnsw_saved_rows,
+                "dtype": self.dtype,
+                "scale": self._scale.tolist() if self._scale is not None else None
+            }, f)
+        os.replace(tmp_path, self._meta_path)
+
+def create_backend(name: str, data_dir: str, collection_name: str, read_only: bool = False) -> IndexBackend:
+    """Build the backend called ``name`` ("chroma" or "numpy") under ``data_dir``"""
+    if name == "chroma":
+        return ChromaBackend(os.path.join(data_dir, "chroma_db"), collection_name)
+    if name == "numpy":
+        return NumpyBackend(
+            os.path.join(data_dir, "numpy_index", collection_name),
+            ann_threshold=int(os.getenv("RAG_ANN_THRESHOLD", "50000")),
+            dtype=os.getenv("RAG_VECTOR_DTYPE", "float32"),
+            rerank=int(os.getenv("RAG_VECTOR_RERANK", "4")),
+            read_only=read_only
+        )
+    raise ValueError(f"Unknown vector store backend: {name}")
@@ -1,6 +1,13 @@
-from typing import List, Dict, Any
+import time
+import asyncio
+from concurrent.futures import Executor
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
+import numpy as np
 from .embeddings import EmbeddingGenerator
-from .vector_store import VectorStore
+from .batching_embedder import BatchingEmbedder
+from .vector_store import VectorStore, document_id
+from .answer_cache import AnswerCache
+from .context import ContextBuilder, context_ids
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
@@ -12,39 +19,110 @@ load_dotenv()
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 class RAGEngine:
-    def __init__(self, collection_name: str = "documents"):
-        self.embedding_generator = EmbeddingGenerator()
-        self.vector_store = VectorStore(collection_name)
+    def __init__(self, collection_name: str = "documents", read_only: bool = False,
+                 data_dir: Optional[str] = None):
+        t0 = time.perf_counter()
+        self.embedding_generator = EmbeddingGenerator(
+            cache_size=int(os.getenv("RAG_EMBEDDING_CACHE_SIZE", "10000")),
+            cache_dir=os.getenv("RAG_EMBEDDING_CACHE_DIR")
+        )
+        # Concurrent question embeddings are coalesced into shared batches
+        self.query_embedder = BatchingEmbedder(
+            self.embedding_generator,
+            max_wait_ms=float(os.getenv("RAG_QUERY_BATCH_WINDOW_MS", "3")),
+            max_batch_size=int(os.getenv("RAG_QUERY_BATCH_MAX", "64"))
+        )
+        t1 = time.perf_counter()
+        # Read-only engines serve queries while another process writes the store
+        self.vector_store = VectorStore(collection_name, read_only=read_only, data_dir=data_dir)
+        t2 = time.perf_counter()
         self.model = genai.GenerativeModel('gemini-1.5-pro')
+        similarity = os.getenv("RAG_ANSWER_CACHE_SIMILARITY")
+        self.answer_cache = AnswerCache(
+            max_entries=int(os.getenv("RAG_ANSWER_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("RAG_ANSWER_CACHE_TTL", "3600")),
+            similarity_threshold=float(similarity) if similarity else None
+        )
+        # Over-fetched search results are cut down to a diverse, budgeted context
+        self.context_builder = ContextBuilder(
+            token_budget=int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1500")),
+            fetch_factor=int(os.getenv("RAG_CONTEXT_FETCH_FACTOR", "4")),
+            mmr_lambda=float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+        )
+        t3 = time.perf_counter()
+        # Seconds spent in each phase of start-up
+        self.init_timings: Dict[str, float] = {"embedding_model": t1 - t0, "vector_store": t2 - t1, "llm": t3 - t2}
         
-    def add_documents(self, documents: List[str], metadata: List[Dict[str, Any]] = None):
-        """Add documents to the RAG system"""
+    def add_documents(self, documents: List[str], metadata: List[Dict[str, Any]] = None,
+                      embeddings: Union[np.ndarray, List[List[float]]] = None,
+                      signatures: Optional[np.ndarray] = None):
+        """Add documents to the RAG system, embedding them unless embeddings are given"""
         print(f"Adding {len(documents)} documents to the RAG system")
-        embeddings = self.embedding_generator.generate_embeddings(documents)
-        self.vector_store.add_documents(documents, embeddings, metadata)
+        if embeddings is None:
+            embeddings = self.embedding_generator.encode(documents)
+        self.vector_store.add_documents(documents, embeddings, metadata, signatures=signatures)
+        self.answer_cache.invalidate(document_id(doc) for doc in documents)
     
-    def query(self, question: str, n_results: int = 5) -> Dict[str, Any]:
-        """Query the RAG system"""
-        print(f"Processing query: {question}")
-        
+    def delete_documents(self, ids: List[str]):
+        """Remove documents from the RAG system by ID"""
+        print(f"Removing {len(ids)} documents from the RAG system")
+        self.vector_store.delete(ids)
+        self.answer_cache.invalidate(ids)
+    
+    def refresh(self):
+        """Pick up documents another process wrote to the vector store"""
+        changed = self.vector_store.refresh()
+        if changed:
+            print(f"Refreshed vector store: {len(changed)} documents changed")
+            self.answer_cache.invalidate(changed)
+    
+    def retrieve(self, question: str, n_results: int = 5, where: Optional[Dict[str, Any]] = None,
+                 mode: str = "vector") -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """Embed the question and fetch the most similar documents"""
         # Generate embedding for the question
-        query_embedding = self.embedding_generator.generate_embedding(question)
+        query_embedding = self.query_embedder.generate_embedding(question)
+        return query_embedding, self.search(query_embedding, n_results, where, mode, question)
+    
+    def search(self, query_embedding: np.ndarray, n_results: int = 5, where: Optional[Dict[str, Any]] = None,
+               mode: str = "vector", question: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Fetch the documents most similar to an embedding.
         
-        # Retrieve relevant documents
-        results = self.vector_store.query(query_embedding, n_results)
+        ``where`` filters on document metadata inside the index; ``mode``
+        "hybrid" also ranks by BM25 keyword match against ``question``.
+        Extra candidates are fetched and assembled into at most
+        ``n_results`` diverse excerpts within the context token budget.
+        """
+        candidates = self.vector_store.query(
+            query_embedding, self.context_builder.n_candidates(n_results), where=where, mode=mode, query_text=question
+        )
+        results = self.assemble_context([query_embedding], [candidates], n_results)[0]
         print(f"Found {len(results)} relevant documents")
-        
+        return results
+    
+    def assemble_context(self, query_embeddings: np.ndarray, batch_candidates: List[List[Dict[str, Any]]],
+                         n_results: int) -> List[List[Dict[str, Any]]]:
+        """Build each query's context from its candidates, fetching their embeddings in one call"""
+        ids = list(dict.fromkeys(candidate["id"] for candidates in batch_candidates for candidate in candidates))
+        embeddings = self.vector_store.get_embeddings(ids)
+        return [
+            self.context_builder.build(query_embedding, candidates, embeddings, n_results)
+            for query_embedding, candidates in zip(query_embeddings, batch_candidates)
+        ]
+    
+    def build_prompt(self, question: str, results: List[Dict[str, Any]]) -> str:
+        """Build the Gemini prompt from the retrieved documents"""
         # Prepare context from retrieved documents
         contexts = []
         for idx, result in enumerate(results, 1):
             context = result["document"]
-            similarity = result["distance"]
-            contexts.append(f"[Excerpt {idx} (similarity: {similarity:.2f})]\n{context}\n")
+            similarity = result.get("similarity")
+            label = "n/a" if similarity is None else f"{similarity:.2f}"
+            contexts.append(f"[Excerpt {idx} (similarity: {label})]\n{context}\n")
         
         context_text = "\n".join(contexts)
         
-        # Generate response using Gemini
-        prompt = f"""You are a helpful AI assistant with access to previous conversations. 
+        return f"""You are a helpful AI assistant with access to previous conversations. 
         Use the following excerpts from past conversations to inform your response.
         If you find relevant information in the excerpts, incorporate it naturally into your response.
         If you don't find relevant information, respond based on your general knowledge.
@@ -55,21 +133,163 @@ class RAGEngine:
         Current Question: {question}
 
         Please provide a thoughtful response that incorporates relevant context from the previous conversations when available."""
+    
+    def summarize_context(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Short excerpts of the retrieved documents shown to the caller"""
+        return [
+            {
+                "excerpt": result["document"][:200] + "..." if len(result["document"]) > 200 else result["document"],
+                "similarity": result.get("similarity")
+            }
+            for result in results[:2]  # Show top 2 most relevant excerpts
+        ]
+    
+    def format_response(self, answer: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Shape the answer and top excerpts into the API response"""
+        return {
+            "answer": answer,
+            "context_used": self.summarize_context(results)
+        }
+    
+    def query(self, question: str, n_results: int = 5, where: Optional[Dict[str, Any]] = None,
+              mode: str = "vector") -> Dict[str, Any]:
+        """Query the RAG system"""
+        print(f"Processing query: {question}")
+        query_embedding, results = self.retrieve(question, n_results, where, mode)
+        answer = self.generate_answer(question, query_embedding, results)
+        return self.format_response(answer, results)
+    
+    def generate_answer(self, question: str, query_embedding: np.ndarray, results: List[Dict[str, Any]]) -> str:
+        """Answer from the answer cache, or generate one with Gemini"""
+        chunk_ids = context_ids(results)
+        answer = self.answer_cache.get(question, query_embedding, chunk_ids)
+        if answer is not None:
+            return answer
         
+        # Generate response using Gemini
+        prompt = self.build_prompt(question, results)
         try:
             response = self.model.generate_content(prompt)
             answer = response.text
+            self.answer_cache.put(question, query_embedding, chunk_ids, answer)
         except Exception as e:
             print(f"Error generating response: {str(e)}")
             answer = f"Error generating response: {str(e)}"
+        return answer
+    
+    async def agenerate_answer(self, question: str, query_embedding: np.ndarray,
+                               results: List[Dict[str, Any]]) -> str:
+        """Async version of generate_answer using Gemini's async client"""
+        chunk_ids = context_ids(results)
+        answer = self.answer_cache.get(question, query_embedding, chunk_ids)
+        if answer is not None:
+            return answer
         
-        return {
-            "answer": answer,
-            "context_used": [
-                {
-                    "excerpt": result["document"][:200] + "..." if len(result["document"]) > 200 else result["document"],
-                    "similarity": result["distance"]
-                }
-                for result in results[:2]  # Show top 2 most relevant excerpts
-            ]
-        } 
\ No newline at end of file
+        # Generate response using Gemini
+        prompt = self.build_prompt(question, results)
+        try:
+            response = await self.model.generate_content_async(prompt)
+            answer = response.text
+            self.answer_cache.put(question, query_embedding, chunk_ids, answer)
+        except Exception as e:
+            print(f"Error generating response: {str(e)}")
+            answer = f"Error generating response: {str(e)}"
+        return answer
+    
+    def retrieve_batch(self, questions: List[str], n_results: int = 5, where: Optional[Dict[str, Any]] = None,
+                       mode: str = "vector") -> Tuple[np.ndarray, List[List[Dict[str, Any]]]]:
+        """Embed all questions in one call and search them in one index call"""
+        query_embeddings = self.embedding_generator.encode(questions)
+        candidates = self.vector_store.query_batch(query_embeddings, self.context_builder.n_candidates(n_results),
+                                                   where=where, mode=mode, query_texts=questions)
+        results = self.assemble_context(query_embeddings, candidates, n_results)
+        print(f"Retrieved documents for {len(questions)} questions")
+        return query_embeddings, results
+    
+    def query_batch(self, questions: List[str], n_results: int = 5, generate: bool = False,
+                    where: Optional[Dict[str, Any]] = None, mode: str = "vector") -> List[Dict[str, Any]]:
+        """
+        Query the RAG system with many questions at once.
+        
+        Retrieval is batched; with ``generate`` each question is also
+        answered (one Gemini call per question, answer cache permitting).
+        """
+        query_embeddings, batch_results = self.retrieve_batch(questions, n_results, where, mode)
+        responses = []
+        for question, query_embedding, results in zip(questions, query_embeddings, batch_results):
+            response = {"question": question, "results": results}
+            if generate:
+                response.update(self.format_response(self.generate_answer(question, query_embedding, results), results))
+            responses.append(response)
+        return responses
+    
+    async def aquery_batch(self, questions: List[str], n_results: int = 5, generate: bool = False,
+                           executor: Optional[Executor] = None, max_concurrency: int = 8,
+                           where: Optional[Dict[str, Any]] = None, mode: str = "vector") -> List[Dict[str, Any]]:
+        """Async query_batch: retrieval on ``executor``, answers generated concurrently"""
+        loop = asyncio.get_running_loop()
+        query_embeddings, batch_results = await loop.run_in_executor(
+            executor, self.retrieve_batch, questions, n_results, where, mode
+        )
+        responses = [{"question": question, "results": results} for question, results in zip(questions, batch_results)]
+        if generate:
+            slots = asyncio.Semaphore(max_concurrency)
+            
+            async def answer(response: Dict[str, Any], query_embedding: np.ndarray):
+                async with slots:
+                    text = await self.agenerate_answer(response["question"], query_embedding, response["results"])
+                response.update(self.format_response(text, response["results"]))
+            
+            await asyncio.gather(*(answer(response, embedding) for response, embedding in zip(responses, query_embeddings)))
+        return responses
+    
+    def query_stream(self, question: str, n_results: int = 5, where: Optional[Dict[str, Any]] = None,
+                     mode: str = "vector") -> Iterator[Dict[str, Any]]:
+        """
+        Query the RAG system, yielding events as the answer is produced.
+        
+        Yields a ``context`` event as soon as retrieval finishes, then one
+        ``token`` event per piece of text Gemini streams back, and finally
+        a ``done`` event with the full answer (or an ``error`` event).
+        """
+        print(f"Processing streaming query: {question}")
+        query_embedding, results = self.retrieve(question, n_results, where, mode)
+        yield {"event": "context", "data": self.summarize_context(results)}
+        
+        chunk_ids = context_ids(results)
+        answer = self.answer_cache.get(question, query_embedding, chunk_ids)
+        if answer is not None:
+            yield {"event": "token", "data": {"text": answer}}
+            yield {"event": "done", "data": {"answer": answer}}
+            return
+        
+        prompt = self.build_prompt(question, results)
+        pieces = []
+        try:
+            for chunk in self.model.generate_content(prompt, stream=True):
+                if chunk.text:
+                    pieces.append(chunk.text)
+                    yield {"event": "token", "data": {"text": chunk.text}}
+        except Exception as e:
+            print(f"Error generating response: {str(e)}")
+            yield {"event": "error", "data": {"detail": f"Error generating response: {str(e)}"}}
+            return
+        answer = "".join(pieces)
+        self.answer_cache.put(question, query_embedding, chunk_ids, answer)
+        yield {"event": "done", "data": {"answer": answer}}
+    
+    async def aquery(self, question: str, n_results: int = 5, executor: Optional[Executor] = None,
+                     where: Optional[Dict[str, Any]] = None, mode: str = "vector") -> Dict[str, Any]:
+        """
+        Query the RAG system without blocking the event loop.
+        
+        The question joins the shared embedding batch without holding a
+        thread, vector search runs on ``executor`` (the loop's default
+        thread pool if None) and Gemini is called through its async client.
+        """
+        print(f"Processing query: {question}")
+        loop = asyncio.get_running_loop()
+        query_embedding = await asyncio.wrap_future(self.query_embedder.submit(question))
+        results = await loop.run_in_executor(executor, self.search, query_embedding, n_results, where, mode, question)
+        answer = await self.agenerate_answer(question, query_embedding, results)
+        return self.format_response(answer, results)
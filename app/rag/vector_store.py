@@ -1,64 +1,314 @@
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence, Set, Tuple, Union
 import os
+import time
+import hashlib
+import logging
+import threading
+import numpy as np
+from .index_backends import GET_FIELDS, IndexBackend, create_backend
+from .bm25 import BM25Index
+from .dedup import NearDuplicateIndex
+from .filters import normalize_filter
+
+logger = logging.getLogger(__name__)
+
+# Reciprocal rank fusion constant; 60 is the value from the original RRF paper
+RRF_K = 60
+# Hybrid search fuses this many times n_results candidates from each index
+HYBRID_CANDIDATES = 4
+SEARCH_MODES = ("vector", "hybrid")
+
+def document_id(document: str) -> str:
+    """Content-hash ID under which a document is stored"""
+    return f"doc_{hashlib.md5(document.encode()).hexdigest()}"
 
 class VectorStore:
-    def __init__(self, collection_name: str = "documents"):
-        # Create persistent directory if it doesn't exist
-        persist_dir = os.path.join(os.path.dirname(__file__), "../../data/chroma_db")
-        os.makedirs(persist_dir, exist_ok=True)
+    def __init__(self, collection_name: str = "documents", backend: Optional[str] = None,
+                 read_only: bool = False, data_dir: Optional[str] = None):
+        """
+        Open (or create) a collection.
         
-        # Initialize ChromaDB with persistent storage
-        self.client = chromadb.PersistentClient(
-            path=persist_dir,
-            settings=Settings(
-                anonymized_telemetry=False,
-                is_persistent=True
-            )
-        )
+        With ``read_only`` the store only serves queries: another process
+        owns the writes, and ``refresh`` picks up what it has written.
+        ``data_dir`` defaults to the repository's data directory.
+        """
+        # Persistent data lives in the repository's data directory
+        data_dir = data_dir or os.path.join(os.path.dirname(__file__), "../../data")
+        self.collection_name = collection_name
+        self.read_only = read_only
+        # Rewritten after every write, so readers can cheaply tell when to
+        # refresh; read before the indexes load so no write slips between
+        self._version_path = os.path.join(data_dir, "versions", collection_name)
+        os.makedirs(os.path.dirname(self._version_path), exist_ok=True)
+        self._version = self._read_version()
+        self._refresh_lock = threading.Lock()
+        # Request threads and background ingestion jobs write concurrently
+        self._write_lock = threading.Lock()
         
-        # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name=collection_name,
-            metadata={"description": "RAG system document store"}
+        # "chroma" (default) or "numpy", the in-process matrix index
+        self.backend: IndexBackend = create_backend(
+            backend or os.getenv("RAG_VECTOR_BACKEND", "chroma"),
+            data_dir,
+            collection_name,
+            read_only=read_only
         )
+        # Sparse keyword index used by hybrid search
+        self.keyword_index = BM25Index(os.path.join(data_dir, "bm25", collection_name), read_only=read_only)
+        # Readers leave backfilling to the writer
+        self._keyword_index_synced = read_only
+        # MinHash signatures used to spot near-duplicate chunks at ingest time
+        self.near_duplicates = None if read_only else NearDuplicateIndex(
+            os.path.join(data_dir, "dedup", collection_name),
+            threshold=float(os.getenv("RAG_DEDUP_THRESHOLD", "0.9"))
+        )
+        self._near_duplicates_synced = False
     
-    def add_documents(self, documents: List[str], embeddings: List[List[float]], metadata: List[Dict[str, Any]] = None):
-        """Add documents with their embeddings to the vector store"""
+    def add_documents(self, documents: List[str], embeddings: Union[np.ndarray, List[List[float]]],
+                      metadata: List[Dict[str, Any]] = None, signatures: Optional[np.ndarray] = None):
+        """
+        Add documents with their embeddings (one row each) to the vector store.
+        
+        ``signatures`` are the documents' MinHash signatures when the caller
+        already computed them with ``find_near_duplicates``. Without them
+        (dedup off) the near-duplicate index is left alone; the next
+        ``find_near_duplicates`` backfills what it is missing.
+        """
+        self._check_writable()
         if metadata is None:
             metadata = [{}] * len(documents)
         
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        
         # Add documents with unique IDs based on content hash
-        import hashlib
-        ids = [
-            f"doc_{hashlib.md5(doc.encode()).hexdigest()}"
-            for doc in documents
-        ]
+        ids = [document_id(doc) for doc in documents]
         
-        self.collection.add(
-            documents=documents,
-            embeddings=embeddings,
-            metadatas=metadata,
-            ids=ids
-        )
+        # Chroma rejects repeated IDs within a single add, so keep the first copy
+        if len(set(ids)) != len(ids):
+            keep, seen = [], set()
+            for i, doc_id in enumerate(ids):
+                if doc_id not in seen:
+                    seen.add(doc_id)
+                    keep.append(i)
+            documents = [documents[i] for i in keep]
+            embeddings = embeddings[keep]
+            metadata = [metadata[i] for i in keep]
+            ids = [ids[i] for i in keep]
+            if signatures is not None:
+                signatures = signatures[keep]
+        
+        with self._write_lock:
+            self.backend.add(ids, documents, embeddings, metadata)
+            self.keyword_index.add(ids, documents, metadata)
+            if signatures is not None:
+                self.near_duplicates.add(ids, signatures)
+            else:
+                self._near_duplicates_synced = False
+            self._bump_version()
+        
+    def delete(self, ids: List[str], batch_size: int = 5000):
+        """Remove documents by ID, in batches to stay under SQLite limits"""
+        self._check_writable()
+        with self._write_lock:
+            for i in range(0, len(ids), batch_size):
+                self.backend.delete(ids[i:i + batch_size])
+            self.keyword_index.delete(ids)
+            self.near_duplicates.remove(ids)
+            self._bump_version()
+    
+    def refresh(self) -> Optional[Set[str]]:
+        """
+        Pick up documents another process added or deleted since the last refresh.
+        
+        Returns the changed IDs (empty when nothing changed), or None when
+        the backend cannot tell which documents changed.
+        """
+        with self._refresh_lock:
+            version = self._read_version()
+            if version == self._version:
+                return set()
+            self._version = version
+            changed = self.backend.refresh()
+            keyword_changes = self.keyword_index.refresh()
+            return None if changed is None else changed | keyword_changes
+    
+    def backfill(self, near_duplicates: bool = True):
+        """Bring the keyword and (unless dedup is off) near-duplicate indexes up to date with the vector index"""
+        self._sync_keyword_index()
+        if near_duplicates:
+            self._sync_near_duplicates()
+    
+    def find_near_duplicates(self, documents: List[str]) -> Tuple[List[Optional[str]], np.ndarray]:
+        """
+        Find documents nearly identical to a stored one or to an earlier one in the list.
+        
+        Returns:
+            The ID each document duplicates (None for new content) and the
+            documents' MinHash signatures, to pass on to ``add_documents``
+        """
+        self._check_writable()
+        self._sync_near_duplicates()
+        signatures = self.near_duplicates.signatures(documents)
+        matches = self.near_duplicates.match([document_id(doc) for doc in documents], signatures)
+        return matches, signatures
+    
+    def ids(self) -> List[str]:
+        """IDs of every stored document"""
+        return self.backend.ids()
+    
+    def get(self, ids: List[str], include: Sequence[str] = GET_FIELDS) -> Dict[str, List[Any]]:
+        """
+        Stored ids, documents, metadatas and embeddings by ID, in order, skipping unknown IDs.
+
+        ``include`` narrows the fields fetched besides the IDs, e.g.
+        ``["metadatas"]`` to skip reading the vectors.
+        """
+        return self.backend.get(list(ids), include)
+    
+    def version(self) -> Optional[str]:
+        """Tag of the last write by any process; None if the collection was never written with versioning"""
+        return self._read_version()
+    
+    def get_embeddings(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Stored float32 vectors by ID; unknown IDs are left out"""
+        if not ids:
+            return {}
+        found = self.backend.get(list(ids), ["embeddings"])
+        return {
+            doc_id: np.asarray(embedding, dtype=np.float32)
+            for doc_id, embedding in zip(found["ids"], found["embeddings"])
+        }
+    
+    def count(self) -> int:
+        """Number of stored documents"""
+        return self.backend.count()
+    
+    def stats(self, recall_k: Optional[int] = None, sample: int = 100) -> Dict[str, Any]:
+        """Index memory use and, with ``recall_k``, recall against uncompressed search"""
+        return self.backend.stats(recall_k, sample)
         
-    def query(self, query_embedding: List[float], n_results: int = 5) -> List[Dict[str, Any]]:
+    def query(self, query_embedding: np.ndarray, n_results: int = 5, where: Optional[Dict[str, Any]] = None,
+              mode: str = "vector", query_text: Optional[str] = None) -> List[Dict[str, Any]]:
         """Query the vector store for similar documents"""
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results
-        )
+        return self.query_batch(
+            [query_embedding], n_results, where=where, mode=mode,
+            query_texts=None if query_text is None else [query_text]
+        )[0]
+    
+    def query_batch(self, query_embeddings: np.ndarray, n_results: int = 5,
+                    where: Optional[Dict[str, Any]] = None, mode: str = "vector",
+                    query_texts: Optional[List[str]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Query the vector store for several embeddings in one index call.
+        
+        Args:
+            where: Chroma-style metadata filter applied inside the index
+            mode: "vector" for similarity search, or "hybrid" to fuse it with
+                BM25 keyword search over ``query_texts`` by reciprocal rank
+            
+        Returns:
+            One result list per query; hybrid results also carry their fused ``score``
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        if len(query_embeddings) == 0:
+            return []
+        where = normalize_filter(where)
+        if mode == "hybrid":
+            if query_texts is None or len(query_texts) != len(query_embeddings):
+                raise ValueError("Hybrid search needs the query text for every embedding")
+            return self._hybrid_query(query_embeddings, query_texts, n_results, where)
+        
+        results = self.backend.query(query_embeddings, n_results, where=where)
         
         return [
-            {
-                "document": doc,
-                "metadata": meta,
-                "distance": dist
-            }
-            for doc, meta, dist in zip(
-                results["documents"][0],
-                results["metadatas"][0],
-                results["distances"][0]
+            [
+                {
+                    "id": doc_id,
+                    "document": doc,
+                    "metadata": meta,
+                    "distance": dist
+                }
+                for doc_id, doc, meta, dist in zip(ids, docs, metas, dists)
+            ]
+            for ids, docs, metas, dists in zip(
+                results["ids"],
+                results["documents"],
+                results["metadatas"],
+                results["distances"]
             )
-        ] 
\ No newline at end of file
+        ]
+    
+    def _hybrid_query(self, query_embeddings: np.ndarray, query_texts: List[str], n_results: int,
+                      where: Optional[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        self._sync_keyword_index()
+        n_candidates = n_results * HYBRID_CANDIDATES
+        dense = self.query_batch(query_embeddings, n_candidates, where=where)
+        sparse = self.keyword_index.search(query_texts, n_candidates, where=where)
+        
+        fused_results = []
+        for query_embedding, dense_hits, sparse_hits in zip(query_embeddings, dense, sparse):
+            scores: Dict[str, float] = {}
+            for rank, hit in enumerate(dense_hits):
+                scores[hit["id"]] = scores.get(hit["id"], 0.0) + 1 / (RRF_K + rank + 1)
+            for rank, (doc_id, _) in enumerate(sparse_hits):
+                scores[doc_id] = scores.get(doc_id, 0.0) + 1 / (RRF_K + rank + 1)
+            top = sorted(scores, key=scores.get, reverse=True)[:n_results]
+            
+            # Keyword-only hits were not returned by the vector index, so
+            # fetch them to fill in the document and its vector distance
+            known = {hit["id"]: hit for hit in dense_hits}
+            missing = [doc_id for doc_id in top if doc_id not in known]
+            if missing:
+                fetched = self.backend.get(missing)
+                query = np.asarray(query_embedding, dtype=np.float32)
+                for doc_id, doc, meta, embedding in zip(
+                    fetched["ids"], fetched["documents"], fetched["metadatas"], fetched["embeddings"]
+                ):
+                    difference = np.asarray(embedding, dtype=np.float32) - query
+                    known[doc_id] = {"id": doc_id, "document": doc, "metadata": meta,
+                                     "distance": float(difference @ difference)}
+            fused_results.append([dict(known[doc_id], score=scores[doc_id]) for doc_id in top if doc_id in known])
+        return fused_results
+    
+    def _sync_keyword_index(self, batch_size: int = 5000):
+        """Backfill the keyword index with documents stored before it existed"""
+        if self._keyword_index_synced:
+            return
+        if self.keyword_index.count() < self.backend.count():
+            indexed = set(self.keyword_index.ids())
+            missing = [doc_id for doc_id in self.backend.ids() if doc_id not in indexed]
+            logger.info(f"Adding {len(missing)} stored documents to the keyword index")
+            for i in range(0, len(missing), batch_size):
+                fetched = self.backend.get(missing[i:i + batch_size], ["documents", "metadatas"])
+                self.keyword_index.add(fetched["ids"], fetched["documents"], fetched["metadatas"])
+        self._keyword_index_synced = True
+    
+    def _sync_near_duplicates(self, batch_size: int = 5000):
+        """Backfill MinHash signatures of documents stored while dedup was off"""
+        if self._near_duplicates_synced:
+            return
+        if self.near_duplicates.count() < self.backend.count():
+            indexed = set(self.near_duplicates.ids())
+            missing = [doc_id for doc_id in self.backend.ids() if doc_id not in indexed]
+            logger.info(f"Adding {len(missing)} stored documents to the near-duplicate index")
+            for i in range(0, len(missing), batch_size):
+                fetched = self.backend.get(missing[i:i + batch_size], ["documents"])
+                self.near_duplicates.add(fetched["ids"], self.near_duplicates.signatures(fetched["documents"]))
+        self._near_duplicates_synced = True
+    
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("This vector store was opened read-only; writes go through the writer process")
+    
+    def _read_version(self) -> Optional[str]:
+        try:
+            with open(self._version_path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    
+    def _bump_version(self):
+        tmp_path = f"{self._version_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(f"{os.getpid()}-{time.time_ns()}")
+        os.replace(tmp_path, self._version_path)
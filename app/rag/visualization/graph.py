@@ -0,0 +1,126 @@
+"""
+Sparse neighbour graphs of embeddings, and layouts that scale with them.
+
+``knn_edges`` links each point to its ``k`` most similar points, so a
+graph has at most n·k edges instead of n². Small sets are searched
+exactly in row tiles; larger ones through an HNSW index (hnswlib, as in
+the vector store's ``numpy`` backend). ``layout`` uses networkx's spring
+layout for small graphs; past ``SPRING_LAYOUT_LIMIT`` nodes it starts from
+a PCA projection of the embeddings and smooths it along the edges, at a
+cost linear in the number of edges.
+"""
+
+import logging
+from typing import Optional, Tuple
+import numpy as np
+import networkx as nx
+from .similarity import row_tiles
+from .projection import project
+
+logger = logging.getLogger(__name__)
+
+# Points up to which neighbours are found by exact search
+EXACT_KNN_LIMIT = 5000
+# Nodes up to which the spring layout is used
+SPRING_LAYOUT_LIMIT = 1000
+# Rounds of neighbour smoothing in the large-graph layout
+SMOOTHING_ITERATIONS = 30
+
+Edges = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+def knn_edges(embeddings: np.ndarray, k: int = 10, threshold: Optional[float] = None) -> Edges:
+    """
+    Undirected edges from every unit-length embedding to its ``k`` nearest neighbours.
+
+    Edges weaker than ``threshold`` (cosine similarity) are dropped.
+
+    Returns:
+        (sources, targets, weights) with ``sources < targets``, each pair
+        once, ordered by source then target
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    n = len(embeddings)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+    neighbors, similarities = _ann_knn(embeddings, k) if n > EXACT_KNN_LIMIT else (None, None)
+    if neighbors is None:
+        neighbors, similarities = _exact_knn(embeddings, k)
+
+    sources = np.repeat(np.arange(n), k)
+    targets = neighbors.ravel()
+    weights = similarities.ravel().astype(np.float32)
+    keep = (targets >= 0) & (targets != sources)
+    if threshold is not None:
+        keep &= weights > threshold
+    sources, targets, weights = sources[keep], targets[keep], weights[keep]
+
+    # i -> j and j -> i are the same edge
+    low, high = np.minimum(sources, targets), np.maximum(sources, targets)
+    _, first = np.unique(low * n + high, return_index=True)
+    return low[first], high[first], weights[first]
+
+def _exact_knn(embeddings: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    n = len(embeddings)
+    neighbors = np.empty((n, k), dtype=np.intp)
+    similarities = np.empty((n, k), dtype=np.float32)
+    for start, end in row_tiles(n):
+        block = embeddings[start:end] @ embeddings.T
+        block[np.arange(end - start), np.arange(start, end)] = -np.inf
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        neighbors[start:end] = top
+        similarities[start:end] = np.take_along_axis(block, top, axis=1)
+    return neighbors, similarities
+
+def _ann_knn(embeddings: np.ndarray, k: int):
+    """Neighbours from an HNSW index, or (None, None) without hnswlib"""
+    try:
+        import hnswlib
+    except ImportError:
+        logger.warning("hnswlib is not installed; finding graph neighbours by exact search")
+        return None, None
+    n, dim = embeddings.shape
+    index = hnswlib.Index(space='ip', dim=dim)
+    index.init_index(max_elements=n, ef_construction=100, M=16)
+    index.add_items(embeddings, np.arange(n))
+    index.set_ef(max(64, k + 1))
+    labels, distances = index.knn_query(embeddings, k=k + 1)
+    labels = labels.astype(np.intp)
+    # Drop each point from its own list, or its farthest neighbour if the search missed it
+    own = labels == np.arange(n)[:, None]
+    own[~own.any(axis=1), -1] = True
+    own &= np.cumsum(own, axis=1) == 1
+    # Inner-product distance is 1 - similarity
+    return labels[~own].reshape(n, k), (1.0 - distances[~own]).reshape(n, k)
+
+def layout(embeddings: np.ndarray, sources: np.ndarray, targets: np.ndarray, weights: np.ndarray,
+           seed: int = 42) -> np.ndarray:
+    """2-D node positions (n x 2) for a graph over the embeddings' rows"""
+    n = len(embeddings)
+    if n <= SPRING_LAYOUT_LIMIT:
+        G = nx.Graph()
+        G.add_nodes_from(range(n))
+        G.add_weighted_edges_from(zip(sources.tolist(), targets.tolist(), weights.tolist()))
+        pos = nx.spring_layout(G, k=1/np.sqrt(max(n, 1)), iterations=88)
+        return np.array([pos[node] for node in range(n)], dtype=np.float32).reshape(n, 2)
+
+    pos = project(embeddings, n_components=2, random_state=seed, method="pca")
+    pos /= np.abs(pos).max() or 1.0
+    weights = np.clip(weights, 0.0, None).astype(np.float64)
+    degree = np.bincount(sources, weights, n) + np.bincount(targets, weights, n)
+    linked = degree > 0
+    for _ in range(SMOOTHING_ITERATIONS):
+        # Move every linked node halfway to the weighted mean of its neighbours
+        mean = np.empty_like(pos)
+        for axis in range(2):
+            mean[:, axis] = (np.bincount(sources, weights * pos[targets, axis], n)
+                             + np.bincount(targets, weights * pos[sources, axis], n))
+        pos[linked] = 0.5 * pos[linked] + 0.5 * mean[linked] / degree[linked, None]
+    return pos
+
+def edge_coordinates(pos: np.ndarray, sources: np.ndarray, targets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """x and y arrays drawing every edge as one line segment, segments separated by NaN"""
+    gap = np.full(len(sources), np.nan, dtype=np.float32)
+    xs = np.column_stack([pos[sources, 0], pos[targets, 0], gap]).ravel()
+    ys = np.column_stack([pos[sources, 1], pos[targets, 1], gap]).ravel()
+    return xs, ys
@@ -6,33 +6,39 @@ Provides interactive visualizations for poetry analysis using embeddings
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
-from sklearn.manifold import TSNE
 from sklearn.preprocessing import normalize
-import networkx as nx
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import json
+from .similarity import similarity_edges, similarity_matrix
+from .projection import MAX_POINTS, metadata_label, project, project_collection, sample_collection
+from .graph import edge_coordinates, knn_edges, layout
+
+# Lines up to which the force-directed graph compares every pair
+DENSE_GRAPH_LIMIT = 2000
+# Neighbours per node in sparse graphs
+GRAPH_NEIGHBORS = 10
+# Nodes above which graphs are drawn with WebGL and without node labels
+WEBGL_LIMIT = 1000
 
 class PoetryVisualizer:
     def __init__(self, embedding_generator):
         """Initialize with an embedding generator instance"""
         self.embedding_generator = embedding_generator
+    
+    def embed_lines(self, poem_lines: List[str]) -> np.ndarray:
+        """Embed all lines in one call, as unit vectors"""
+        return self.embedding_generator.encode(poem_lines, normalize=True)
         
-    def create_heatmap(self, poem_lines: List[str]) -> go.Figure:
+    def create_heatmap(self, poem_lines: List[str], embeddings: Optional[np.ndarray] = None) -> go.Figure:
         """
         Create a similarity heatmap between lines of the poem
         """
-        # Generate embeddings for each line
-        embeddings = [self.embedding_generator.generate_embedding(line) for line in poem_lines]
-        
-        # Calculate similarity matrix
-        similarity_matrix = np.zeros((len(embeddings), len(embeddings)))
-        for i, emb1 in enumerate(embeddings):
-            for j, emb2 in enumerate(embeddings):
-                similarity_matrix[i][j] = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
+        if embeddings is None:
+            embeddings = self.embed_lines(poem_lines)
         
         # Create heatmap
         fig = go.Figure(data=go.Heatmap(
-            z=similarity_matrix,
+            z=similarity_matrix(embeddings),
             x=[f"Line {i+1}" for i in range(len(poem_lines))],
             y=[f"Line {i+1}" for i in range(len(poem_lines))],
             colorscale="Viridis"
@@ -46,21 +52,14 @@ class PoetryVisualizer:
         
         return fig
     
-    def create_tsne_visualization(self, poem_lines: List[str]) -> go.Figure:
+    def create_tsne_visualization(self, poem_lines: List[str], embeddings: Optional[np.ndarray] = None) -> go.Figure:
         """
         Create t-SNE visualization of poem lines in embedding space
         """
-        # Generate embeddings
-        embeddings = [self.embedding_generator.generate_embedding(line) for line in poem_lines]
-        
-        # Convert embeddings list to numpy array
-        embeddings_array = np.array(embeddings)
+        embeddings_array = self.embed_lines(poem_lines) if embeddings is None else embeddings
         
-        # Apply t-SNE with lower perplexity for shorter texts
-        n_samples = len(poem_lines)
-        perplexity = min(n_samples - 1, 15)  # Use smaller perplexity, must be less than n_samples
-        tsne = TSNE(n_components=3, random_state=42, perplexity=perplexity)
-        embeddings_3d = tsne.fit_transform(embeddings_array)
+        # PCA, then Barnes-Hut t-SNE with lower perplexity for shorter texts
+        embeddings_3d = project(embeddings_array, n_components=3, perplexity=15)
         
         # Create 3D scatter plot
         fig = go.Figure(data=[go.Scatter3d(
@@ -88,73 +87,130 @@ class PoetryVisualizer:
         
         return fig
     
-    def create_force_directed_graph(self, poem_lines: List[str], threshold: float = 0.888) -> go.Figure:
+    def create_collection_projection(self, vector_store, max_points: int = MAX_POINTS,
+                                     stratify_by: Optional[str] = "source", method: str = "tsne") -> go.Figure:
+        """
+        Create a 3D projection of a whole vector store collection, coloured by ``stratify_by``.
+        Collections above ``max_points`` documents are subsampled; the
+        projection is cached until the collection changes. ``method="pca"``
+        skips t-SNE for a fast first look.
+        """
+        projection = project_collection(vector_store, max_points=max_points, stratify_by=stratify_by, method=method)
+        coords = projection["coords"]
+        labels = [str(label) for label in projection["labels"]]
+        colors = np.unique(labels, return_inverse=True)[1] if labels else []
+        
+        fig = go.Figure(data=[go.Scatter3d(
+            x=coords[:, 0],
+            y=coords[:, 1],
+            z=coords[:, 2],
+            mode='markers',
+            text=labels,
+            hovertext=[f"{label}: {excerpt}" for label, excerpt in zip(labels, projection["excerpts"])],
+            hoverinfo='text',
+            marker=dict(size=3, color=colors, colorscale='Viridis')
+        )])
+        
+        fig.update_layout(
+            title=f"Collection '{vector_store.collection_name}': {len(coords)} of {projection['total']} documents",
+            scene=dict(
+                xaxis_title=f"{method.upper()} 1",
+                yaxis_title=f"{method.upper()} 2",
+                zaxis_title=f"{method.upper()} 3"
+            )
+        )
+        
+        return fig
+    
+    def create_force_directed_graph(self, poem_lines: List[str], threshold: float = 0.888,
+                                    embeddings: Optional[np.ndarray] = None, k: Optional[int] = None) -> go.Figure:
         """
         Create force-directed graph showing relationships between lines.
         Using 0.888 threshold to reveal core semantic resonance patterns.
         Added node strength analysis to identify spiral anchor points.
+        With ``k`` (or past ``DENSE_GRAPH_LIMIT`` lines) each line is only
+        linked to its ``k`` nearest lines, so long texts stay sparse.
         """
-        # Generate embeddings
-        embeddings = [self.embedding_generator.generate_embedding(line) for line in poem_lines]
-        
-        # Create graph
-        G = nx.Graph()
-        
-        # Add nodes
-        for i, line in enumerate(poem_lines):
-            G.add_node(i, text=line)
+        if embeddings is None:
+            embeddings = self.embed_lines(poem_lines)
         
         # Add edges based on similarity with special threshold
-        node_strengths = {}  # Track connection strengths
-        for i, emb1 in enumerate(embeddings):
-            strength = 0
-            for j, emb2 in enumerate(embeddings[i+1:], i+1):
-                similarity = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
-                if similarity > threshold:
-                    G.add_edge(i, j, weight=similarity)
-                    strength += similarity
-            node_strengths[i] = strength
+        if k is None and len(poem_lines) <= DENSE_GRAPH_LIMIT:
+            sources, targets, weights = similarity_edges(embeddings, threshold)
+        else:
+            sources, targets, weights = knn_edges(embeddings, k or GRAPH_NEIGHBORS, threshold)
+        # Connection strength of a line: its edges to later lines
+        strengths = np.bincount(sources, weights=weights, minlength=len(poem_lines))
         
         # Generate layout with resonant iterations
-        pos = nx.spring_layout(G, k=1/np.sqrt(len(G.nodes())), iterations=88)
+        pos = layout(embeddings, sources, targets, weights)
+        
+        hover_text = [f"Line {i+1}: {line}\nConnection Strength: {strength:.3f}"
+                      for i, (line, strength) in enumerate(zip(poem_lines, strengths))]
+        return self._graph_figure(
+            'Force-Directed Graph of Poetry Lines (Spiral Anchor Analysis)', pos, sources, targets, strengths, hover_text
+        )
+    
+    def create_collection_graph(self, vector_store, max_points: int = 50000, k: int = GRAPH_NEIGHBORS,
+                                threshold: Optional[float] = None, stratify_by: Optional[str] = "source") -> go.Figure:
+        """
+        Create a k-nearest-neighbour graph of a vector store collection.
+        Collections above ``max_points`` documents are subsampled, stratified by ``stratify_by``.
+        """
+        total = vector_store.count()
+        rows = sample_collection(vector_store, max_points, stratify_by)
+        embeddings = np.asarray(rows["embeddings"], dtype=np.float32).reshape(len(rows["ids"]), -1)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.where(norms > 0, norms, 1.0)
+        
+        sources, targets, weights = knn_edges(embeddings, k, threshold)
+        strengths = np.bincount(sources, weights=weights, minlength=len(embeddings))
+        pos = layout(embeddings, sources, targets, weights)
+        
+        hover_text = [f"{metadata_label(metadata, stratify_by)}: {document[:200]}"
+                      for metadata, document in zip(rows["metadatas"], rows["documents"])]
+        return self._graph_figure(
+            f"Neighbour Graph of '{vector_store.collection_name}': {len(embeddings)} of {total} documents",
+            pos, sources, targets, strengths, hover_text
+        )
+    
+    @staticmethod
+    def _graph_figure(title: str, pos: np.ndarray, sources: np.ndarray, targets: np.ndarray,
+                      strengths: np.ndarray, hover_text: List[str]) -> go.Figure:
+        """Plot a graph: edges as one NaN-separated line trace, nodes sized and coloured by strength"""
+        large = len(pos) > WEBGL_LIMIT
+        # WebGL traces draw tens of thousands of points where SVG ones stall
+        scatter = go.Scattergl if large else go.Scatter
+        edge_x, edge_y = edge_coordinates(pos, sources, targets)
         
-        # Create visualization
-        edge_trace = go.Scatter(
-            x=[], y=[],
+        edge_trace = scatter(
+            x=edge_x, y=edge_y,
             line=dict(width=0.5, color='#888'),
             hoverinfo='none',
             mode='lines')
 
         # Modify node trace to show connection strengths
-        node_trace = go.Scatter(
-            x=[], y=[],
-            mode='markers+text',
+        node_trace = scatter(
+            x=pos[:, 0], y=pos[:, 1],
+            # Labels on every node only while there are few enough to read
+            mode='markers' if large else 'markers+text',
             hoverinfo='text',
             marker=dict(
                 showscale=True,
                 colorscale='Viridis',
-                size=[10 + (v * 5) for v in node_strengths.values()],  # Size nodes by connection strength
-                color=list(node_strengths.values())
+                size=(3 + strengths) if large else (10 + strengths * 5),  # Size nodes by connection strength
+                color=strengths
             )
         )
-
-        # Add edge positions
-        for edge in G.edges():
-            x0, y0 = pos[edge[0]]
-            x1, y1 = pos[edge[1]]
-            edge_trace['x'] += (x0, x1, None)
-            edge_trace['y'] += (y0, y1, None)
-
-        # Add node positions with enhanced hover text
-        node_trace['x'] = [pos[node][0] for node in G.nodes()]
-        node_trace['y'] = [pos[node][1] for node in G.nodes()]
-        node_trace['text'] = [f"Line {i+1}: {G.nodes[node]['text']}\nConnection Strength: {node_strengths[node]:.3f}" 
-                            for i, node in enumerate(G.nodes())]
+        if large:
+            node_trace.hovertext = hover_text
+        else:
+            node_trace.text = hover_text
 
         # Create figure
         fig = go.Figure(data=[edge_trace, node_trace],
                      layout=go.Layout(
-                        title='Force-Directed Graph of Poetry Lines (Spiral Anchor Analysis)',
+                        title=title,
                         showlegend=False,
                         hovermode='closest',
                         margin=dict(b=20,l=5,r=5,t=40),
@@ -170,6 +226,8 @@ class PoetryVisualizer:
         """
         # Split poem into lines
         lines = [line.strip() for line in poem.split('\n') if line.strip()]
+        # Embedded once and shared by every chart
+        embeddings = self.embed_lines(lines)
         
         # Generate analysis
         analysis = {
@@ -178,9 +236,9 @@ class PoetryVisualizer:
                 "total_words": sum(len(line.split()) for line in lines)
             },
             "visualizations": {
-                "heatmap": self.create_heatmap(lines),
-                "tsne": self.create_tsne_visualization(lines),
-                "force_directed": self.create_force_directed_graph(lines)
+                "heatmap": self.create_heatmap(lines, embeddings),
+                "tsne": self.create_tsne_visualization(lines, embeddings),
+                "force_directed": self.create_force_directed_graph(lines, embeddings=embeddings)
             },
             "semantic_analysis": {
                 "themes": self._extract_themes(lines),
@@ -0,0 +1,218 @@
+"""
+Scalable 3-D projection of embeddings.
+
+Embeddings are first reduced with PCA to at most ``PCA_COMPONENTS``
+dimensions, then laid out with Barnes-Hut t-SNE, which scales as
+O(n log n) where exact t-SNE is O(n²); ``method="pca"`` stops after PCA
+for a near-instant, if less separated, view. ``project_collection`` projects a
+whole ``VectorStore`` collection: large collections are subsampled,
+stratified by a metadata field so small sources still show up. The
+result is cached on disk and reused until the collection is written to.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+import numpy as np
+from sklearn.decomposition import PCA
+from sklearn.manifold import TSNE
+
+logger = logging.getLogger(__name__)
+
+# Dimensions kept by PCA before t-SNE
+PCA_COMPONENTS = 50
+# Points projected from a collection before subsampling kicks in
+MAX_POINTS = 5000
+# Documents fetched per store call
+FETCH_BATCH = 5000
+
+PROJECTION_METHODS = ("tsne", "pca")
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "../../../data/projections")
+
+def project(embeddings: np.ndarray, n_components: int = 3, perplexity: float = 30.0,
+            random_state: int = 42, method: str = "tsne") -> np.ndarray:
+    """
+    Project embeddings to ``n_components`` dimensions with PCA then Barnes-Hut t-SNE.
+
+    ``perplexity`` is capped below the number of points. Sets too small
+    for t-SNE, and every set with ``method="pca"``, get their PCA
+    coordinates, zero-padded when there are fewer dimensions to keep.
+    """
+    if method not in PROJECTION_METHODS:
+        raise ValueError(f"Unknown projection method: {method}")
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    n, dim = embeddings.shape
+    if method == "pca" or n <= n_components + 1:
+        coords = np.zeros((n, n_components), dtype=np.float32)
+        if n > 1:
+            k = min(n - 1, dim, n_components)
+            coords[:, :k] = PCA(n_components=k, random_state=random_state).fit_transform(embeddings)
+        return coords
+    if dim > PCA_COMPONENTS and n > PCA_COMPONENTS:
+        embeddings = PCA(n_components=PCA_COMPONENTS, random_state=random_state).fit_transform(embeddings)
+    tsne = TSNE(
+        n_components=n_components,
+        method="barnes_hut",
+        init="pca",
+        perplexity=min(perplexity, n - 1),
+        random_state=random_state
+    )
+    return tsne.fit_transform(embeddings).astype(np.float32)
+
+def stratified_sample(labels: List[Any], max_points: int, seed: int = 42) -> np.ndarray:
+    """
+    Indices of at most ``max_points`` items, spread over labels in proportion to their sizes.
+
+    Every label keeps at least one item while there are no more labels
+    than ``max_points``. Indices come back sorted.
+    """
+    n = len(labels)
+    if n <= max_points:
+        return np.arange(n)
+    rng = np.random.default_rng(seed)
+    _, strata = np.unique(np.array([repr(label) for label in labels]), return_inverse=True)
+    sizes = np.bincount(strata)
+    quotas = sizes * max_points / n
+    counts = np.floor(quotas).astype(int)
+    if len(sizes) <= max_points:
+        counts = np.maximum(counts, 1)
+    # Hand out what flooring left over to the largest remainders
+    spare = max_points - counts.sum()
+    if spare > 0:
+        counts[np.argsort(counts - quotas)[:spare]] += 1
+    elif spare < 0:
+        # Minimums overshot: take back from the biggest strata
+        for stratum in np.argsort(-counts)[:-spare]:
+            counts[stratum] -= 1
+    counts = np.minimum(counts, sizes)
+
+    order = np.argsort(strata, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    picked = [
+        rng.choice(order[start:start + size], size=count, replace=False)
+        for start, size, count in zip(starts, sizes, counts) if count
+    ]
+    return np.sort(np.concatenate(picked))
+
+class ProjectionCache:
+    """The latest projection of each collection, stored as ``<collection>.npz``"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def load(self, collection_name: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        path = self._path(collection_name)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data["fingerprint"]) != fingerprint:
+                    return None
+                return {
+                    "ids": data["ids"].tolist(),
+                    "coords": data["coords"],
+                    "labels": json.loads(str(data["labels"])),
+                    "excerpts": data["excerpts"].tolist(),
+                    "total": int(data["total"])
+                }
+        except (FileNotFoundError, KeyError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"Ignoring unreadable projection cache {path}: {e}")
+            return None
+
+    def save(self, collection_name: str, fingerprint: str, projection: Dict[str, Any]):
+        path = self._path(collection_name)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            fingerprint=fingerprint,
+            ids=np.array(projection["ids"], dtype=str),
+            coords=projection["coords"],
+            labels=json.dumps(projection["labels"]),
+            excerpts=np.array(projection["excerpts"], dtype=str),
+            total=projection["total"]
+        )
+        os.replace(tmp_path, path)
+
+    def _path(self, collection_name: str) -> str:
+        return os.path.join(self.cache_dir, f"{collection_name}.npz")
+
+def project_collection(vector_store, max_points: int = MAX_POINTS, stratify_by: Optional[str] = "source",
+                       n_components: int = 3, random_state: int = 42, method: str = "tsne",
+                       cache: Optional[ProjectionCache] = None) -> Dict[str, Any]:
+    """
+    Project the documents of a vector store collection.
+
+    Args:
+        vector_store: The ``VectorStore`` to project
+        max_points: Most documents projected; larger collections are subsampled
+        stratify_by: Metadata field the subsample is stratified on (None samples uniformly)
+        method: "tsne", or "pca" for a fast linear projection
+        cache: Where projections are reused from; the default cache when None
+
+    Returns:
+        Dict with the projected ``ids``, their ``coords`` (n x n_components),
+        ``labels`` (the ``stratify_by`` value of each), short ``excerpts``
+        and the collection size as ``total``
+    """
+    cache = cache or ProjectionCache()
+    ids = vector_store.ids()
+    total = len(ids)
+    params = [vector_store.version(), total, max_points, stratify_by, n_components, random_state, method]
+    # The count catches writes to collections created before versioning
+    fingerprint = hashlib.sha1(json.dumps(params).encode()).hexdigest()
+    cached = cache.load(vector_store.collection_name, fingerprint)
+    if cached is not None:
+        return cached
+
+    rows = sample_collection(vector_store, max_points, stratify_by, random_state, ids)
+    logger.info(f"Projecting {len(rows['ids'])} of {total} documents in {vector_store.collection_name}")
+
+    if rows["ids"]:
+        coords = project(
+            np.asarray(rows["embeddings"], dtype=np.float32), n_components, random_state=random_state, method=method
+        )
+    else:
+        coords = np.zeros((0, n_components), dtype=np.float32)
+    projection = {
+        "ids": rows["ids"],
+        "coords": coords,
+        "labels": [metadata_label(metadata, stratify_by) for metadata in rows["metadatas"]],
+        "excerpts": [document[:200] for document in rows["documents"]],
+        "total": total
+    }
+    cache.save(vector_store.collection_name, fingerprint, projection)
+    return projection
+
+def sample_collection(vector_store, max_points: int = MAX_POINTS, stratify_by: Optional[str] = "source",
+                      random_state: int = 42, ids: Optional[List[str]] = None) -> Dict[str, List[Any]]:
+    """
+    Fetch up to ``max_points`` documents of a collection, stratified by ``stratify_by``.
+
+    Returns:
+        The ids, documents, metadatas and embeddings lists of the sample
+    """
+    ids = vector_store.ids() if ids is None else ids
+    if len(ids) > max_points:
+        # Labels for the whole collection, then vectors for the sample only
+        found_ids, labels = [], []
+        for start in range(0, len(ids), FETCH_BATCH):
+            found = vector_store.get(ids[start:start + FETCH_BATCH], include=["metadatas"])
+            found_ids.extend(found["ids"])
+            labels.extend(metadata_label(metadata, stratify_by) for metadata in found["metadatas"])
+        ids = [found_ids[i] for i in stratified_sample(labels, max_points, random_state)]
+
+    rows = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+    for start in range(0, len(ids), FETCH_BATCH):
+        found = vector_store.get(ids[start:start + FETCH_BATCH])
+        for key in rows:
+            rows[key].extend(found[key])
+    return rows
+
+def metadata_label(metadata: Optional[Dict[str, Any]], key: Optional[str]) -> Optional[str]:
+    """A document's ``key`` metadata field as a string, or None when it has none"""
+    if key is None or not metadata or metadata.get(key) is None:
+        return None
+    return str(metadata[key])
@@ -0,0 +1,53 @@
+"""
+Pairwise similarity of line embeddings, computed in row tiles.
+
+Both functions take unit-length embeddings, so cosine similarity is a
+dot product. Tiles keep each block of the product to about
+``TILE_ELEMENTS`` floats, however many lines there are.
+"""
+
+from typing import Iterator, Tuple
+import numpy as np
+
+# Similarities computed per block (64 MB of float32)
+TILE_ELEMENTS = 1 << 24
+
+def row_tiles(n: int, tile_elements: int = TILE_ELEMENTS) -> Iterator[Tuple[int, int]]:
+    """(start, end) row ranges whose blocks against all n rows hold about ``tile_elements`` values"""
+    rows = max(1, tile_elements // max(n, 1))
+    for start in range(0, n, rows):
+        yield start, min(start + rows, n)
+
+def similarity_matrix(embeddings: np.ndarray, tile_elements: int = TILE_ELEMENTS) -> np.ndarray:
+    """Full n x n cosine similarity matrix of unit-length embeddings"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    n = len(embeddings)
+    matrix = np.empty((n, n), dtype=np.float32)
+    for start, end in row_tiles(n, tile_elements):
+        np.matmul(embeddings[start:end], embeddings.T, out=matrix[start:end])
+    return matrix
+
+def similarity_edges(embeddings: np.ndarray, threshold: float,
+                     tile_elements: int = TILE_ELEMENTS) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pairs of lines more similar than ``threshold``, without the full matrix.
+
+    Returns:
+        (sources, targets, weights) with ``sources < targets``, ordered by
+        source then target
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    n = len(embeddings)
+    sources, targets, weights = [], [], []
+    for start, end in row_tiles(n, tile_elements):
+        # Only columns right of the diagonal: each pair once, no self-loops
+        block = embeddings[start:end] @ embeddings[start + 1:].T
+        mask = block > threshold
+        mask &= np.arange(start + 1, n) > np.arange(start, end)[:, None]
+        rows, cols = np.nonzero(mask)
+        sources.append(rows + start)
+        targets.append(cols + start + 1)
+        weights.append(block[rows, cols])
+    if not sources:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+    return np.concatenate(sources), np.concatenate(targets), np.concatenate(weights)
@@ -0,0 +1,177 @@
+"""
+Lazily built application services.
+
+Importing the RAG engine pulls in torch, sentence-transformers, Chroma and
+the Gemini client, and building it loads the embedding model and opens the
+stores. None of that happens at import time: ``Services.load`` does it
+once, on server startup or on first use, and records how long each phase
+took.
+
+When ``RAG_WRITER_ADDRESS`` is set (multi-worker serving, see
+``writer.py``), the engine opens the vector store read-only, refreshes it
+every ``RAG_REFRESH_INTERVAL`` seconds and sends writes to the writer
+process.
+
+Background ingestion jobs (``ingest_jobs.py``) run where the writes
+happen: in this process, or in the writer when there is one.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import List, Dict, Any, Optional
+import numpy as np
+from .writer import WriterClient, writer_address, writer_authkey
+from .ingest_jobs import IngestJobManager
+
+logger = logging.getLogger(__name__)
+
+class Services:
+    """The RAG engine and ingestion pipeline, built on first ``load``"""
+
+    def __init__(self, warm_up: bool = True, use_writer: bool = True):
+        self.warm_up = warm_up
+        # The writer process itself passes False so it writes the store directly
+        self.use_writer = use_writer
+        self.writer: Optional[WriterClient] = None
+        self.rag_engine = None
+        self.data_ingestion = None
+        # Only without a writer; otherwise jobs run in the writer process
+        self.ingest_job_manager: Optional[IngestJobManager] = None
+        # Seconds per start-up phase, filled in by load()
+        self.timings: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.data_ingestion is not None
+
+    def load(self) -> "Services":
+        """Build the services unless already built; concurrent callers wait for one build"""
+        if self.ready:
+            return self
+        with self._lock:
+            if self.ready:
+                return self
+            try:
+                self._build()
+            except Exception as e:
+                # Left unbuilt, so the next call tries again
+                self.error = str(e)
+                logger.exception("Failed to load RAG services")
+                raise
+            self.error = None
+        return self
+
+    def add_documents(self, texts: List[str], metadata: List[Dict[str, Any]]):
+        """Add documents, through the writer process when there is one"""
+        if self.writer is None:
+            self.rag_engine.add_documents(texts, metadata)
+            return
+        self.writer.call("add_documents", texts, metadata)
+        # Read your own writes without waiting for the next refresh
+        self.rag_engine.refresh()
+
+    def ingest(self, directory_path: str, batch_size: Optional[int] = None, workers: Optional[int] = None,
+               incremental: bool = True) -> Dict[str, Any]:
+        """Ingest a directory, through the writer process when there is one"""
+        if self.writer is None:
+            return self.data_ingestion.process_nltk_files(directory_path, batch_size, workers, incremental)
+        stats = self.writer.call("ingest", directory_path, batch_size, workers, incremental)
+        self.rag_engine.refresh()
+        return stats
+
+    def submit_ingest_job(self, directory_path: str, batch_size: Optional[int] = None,
+                          workers: Optional[int] = None, incremental: bool = True) -> Dict[str, Any]:
+        """Queue a background ingestion of a directory and return the new job"""
+        if self.writer is not None:
+            return self.writer.call("submit_ingest_job", directory_path, batch_size, workers, incremental)
+        job = self.ingest_job_manager.submit(
+            directory_path=directory_path, batch_size=batch_size, workers=workers, incremental=incremental
+        )
+        return job.to_dict()
+
+    def ingest_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status and progress of one ingestion job, or None if unknown"""
+        if self.writer is not None:
+            return self.writer.call("ingest_job", job_id)
+        job = self.ingest_job_manager.get(job_id)
+        return job.to_dict() if job is not None else None
+
+    def ingest_jobs(self) -> List[Dict[str, Any]]:
+        """All ingestion jobs still on record, oldest first"""
+        if self.writer is not None:
+            return self.writer.call("ingest_jobs")
+        return [job.to_dict() for job in self.ingest_job_manager.list()]
+
+    def cancel_ingest_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel an ingestion job; returns it, or None if unknown"""
+        if self.writer is not None:
+            return self.writer.call("cancel_ingest_job", job_id)
+        job = self.ingest_job_manager.cancel(job_id)
+        return job.to_dict() if job is not None else None
+
+    def shutdown(self):
+        """Cancel this process's unfinished ingestion jobs"""
+        if self.ingest_job_manager is not None:
+            self.ingest_job_manager.shutdown()
+
+    def _build(self):
+        started = time.perf_counter()
+        from .rag.rag_engine import RAGEngine
+        from .data_ingestion import DataIngestion
+        timings = {"import": time.perf_counter() - started}
+
+        address = writer_address() if self.use_writer else None
+        if address is not None:
+            self.writer = WriterClient(address, writer_authkey())
+        rag_engine = RAGEngine(read_only=self.writer is not None)
+        timings.update(rag_engine.init_timings)
+        data_ingestion = DataIngestion(
+            rag_engine,
+            batch_size=int(os.getenv("RAG_INGEST_BATCH_SIZE", "256")),
+            workers=int(os.getenv("RAG_INGEST_WORKERS", "1")),
+            chunk_size=int(os.getenv("RAG_CHUNK_SIZE", "1000")),
+            chunk_overlap=int(os.getenv("RAG_CHUNK_OVERLAP", "200")),
+            chunk_unit=os.getenv("RAG_CHUNK_UNIT", "chars"),
+            dedup=os.getenv("RAG_DEDUP_MODE", "off")
+        )
+        if self.warm_up:
+            t0 = time.perf_counter()
+            self._warm_up(rag_engine)
+            timings["warm_up"] = time.perf_counter() - t0
+        timings["total"] = time.perf_counter() - started
+
+        self.timings = timings
+        self.rag_engine = rag_engine
+        if self.writer is None:
+            self.ingest_job_manager = IngestJobManager(
+                data_ingestion.process_nltk_files,
+                max_running=int(os.getenv("RAG_MAX_INGEST_JOBS", "1")),
+                history=int(os.getenv("RAG_INGEST_JOB_HISTORY", "100"))
+            )
+        # Set last, as it marks the services ready
+        self.data_ingestion = data_ingestion
+        if self.writer is not None:
+            interval = float(os.getenv("RAG_REFRESH_INTERVAL", "2"))
+            threading.Thread(target=self._refresh_loop, args=(interval,), name="rag-refresh", daemon=True).start()
+        logger.info("RAG services ready: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in timings.items()))
+
+    def _refresh_loop(self, interval: float):
+        """Keep the read-only store in step with the writer"""
+        while True:
+            time.sleep(interval)
+            try:
+                self.rag_engine.refresh()
+            except Exception as e:
+                logger.error(f"Vector store refresh failed: {e}")
+
+    @staticmethod
+    def _warm_up(rag_engine):
+        """Run one embedding and one search so the first query pays no one-off costs"""
+        # Straight to the model, so the warm-up text stays out of the embedding cache
+        embedding = np.asarray(rag_engine.embedding_generator.model.encode(["warm-up"]), dtype=np.float32)
+        if rag_engine.vector_store.count():
+            rag_engine.vector_store.query_batch(embedding, 1)
@@ -0,0 +1,142 @@
+"""
+Single writer process for multi-worker serving.
+
+With several server workers, each one opens the vector store read-only
+and sends writes (``/documents/`` and ``/ingest/nltk/``) here, so exactly
+one process ever appends to the index files. Each connection is handled
+on its own thread and the vector store serializes the writes themselves,
+so a long synchronous ingest does not hold up other requests. Background
+ingestion jobs are submitted, polled and cancelled here too, and run in
+this process. Workers see the result by refreshing their store
+(``VectorStore.refresh``).
+
+Run it with ``python -m app.writer``; the gunicorn config starts it
+automatically. Address and key come from ``RAG_WRITER_ADDRESS``
+(host:port) and ``RAG_WRITER_AUTHKEY``.
+"""
+
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+from multiprocessing.connection import Client, Listener
+from typing import Any, Optional, Tuple
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Services methods a worker may call through the writer
+WRITER_METHODS = (
+    "add_documents", "ingest",
+    "submit_ingest_job", "ingest_job", "ingest_jobs", "cancel_ingest_job"
+)
+
+def writer_address() -> Optional[Tuple[str, int]]:
+    """(host, port) of the writer process, or None when workers write themselves"""
+    address = os.getenv("RAG_WRITER_ADDRESS")
+    if not address:
+        return None
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+def writer_authkey() -> bytes:
+    return os.getenv("RAG_WRITER_AUTHKEY", "").encode()
+
+def _check_authkey(authkey: bytes):
+    # Requests are pickled, so an unauthenticated channel would run code
+    # for anything that can reach the address
+    if not authkey:
+        raise ValueError("RAG_WRITER_AUTHKEY must be set to talk to the writer process")
+
+class WriterClient:
+    """Sends write requests to the writer process"""
+
+    def __init__(self, address: Tuple[str, int], authkey: bytes, connect_timeout: float = 120.0,
+                 timeout: Optional[float] = None):
+        _check_authkey(authkey)
+        self.address = address
+        self.authkey = authkey
+        # The writer may still be loading its model when workers start
+        self.connect_timeout = connect_timeout
+        # Kept below gunicorn's worker timeout so a stuck call fails the
+        # request instead of getting the worker killed
+        self.timeout = timeout if timeout is not None else float(os.getenv("RAG_WRITER_TIMEOUT", "540"))
+
+    def call(self, method: str, *args) -> Any:
+        """Run ``Services.<method>(*args)`` in the writer and return its result"""
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                conn = Client(self.address, authkey=self.authkey)
+                break
+            except ConnectionRefusedError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Writer process at {self.address[0]}:{self.address[1]} is not reachable")
+                time.sleep(0.5)
+        with conn:
+            conn.send((method, args))
+            if not conn.poll(self.timeout):
+                raise RuntimeError(f"Writer process did not answer {method} within {self.timeout:g}s")
+            status, result = conn.recv()
+        if status == "error":
+            raise RuntimeError(result)
+        return result
+
+def serve(address: Tuple[str, int], authkey: bytes):
+    """Own the vector store and apply write requests until killed"""
+    from .services import Services
+
+    _check_authkey(authkey)
+    services = Services(warm_up=False, use_writer=False).load()
+    # Readers never backfill, so bring the side indexes up to date here
+    services.rag_engine.vector_store.backfill(near_duplicates=services.data_ingestion.dedup != "off")
+    try:
+        with Listener(address, authkey=authkey) as listener:
+            logger.info(f"Writer listening on {address[0]}:{address[1]}")
+            accept_requests(listener, services)
+    finally:
+        # Running jobs stop after their current file, which is still written
+        services.shutdown()
+
+def accept_requests(listener: Listener, services):
+    """Answer each connection on its own thread, forever"""
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception as e:
+            logger.warning(f"Rejected writer connection: {e}")
+            continue
+        # Status queries and cancels must not wait behind a running ingest
+        threading.Thread(target=_serve_connection, args=(conn, services),
+                         name="rag-writer-request", daemon=True).start()
+
+def _serve_connection(conn, services):
+    with conn:
+        try:
+            _handle(conn, services)
+        except (EOFError, OSError) as e:
+            logger.warning(f"Lost connection to a worker: {e}")
+
+def _handle(conn, services):
+    method, args = conn.recv()
+    try:
+        if method not in WRITER_METHODS:
+            raise ValueError(f"Unknown writer method: {method}")
+        result = getattr(services, method)(*args)
+    except Exception as e:
+        logger.error(f"Write request failed: {e}")
+        conn.send(("error", str(e)))
+        return
+    conn.send(("ok", result))
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    # Exit through serve's cleanup when gunicorn stops the writer
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    address = writer_address()
+    if address is None:
+        raise SystemExit("Set RAG_WRITER_ADDRESS (host:port) to run the writer")
+    serve(address, writer_authkey())
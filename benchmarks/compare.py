@@ -0,0 +1,89 @@
+"""
+Compare two benchmark results files and flag regressions.
+
+    python -m benchmarks.compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+
+Every numeric metric present in both files is compared. Metrics ending
+in ``_ms`` or ``seconds`` are better lower; ``per_sec`` metrics are better
+higher; anything else (counts, sizes, single-sample maxima) is shown but
+never flagged. Exits with status 1 when a metric got worse by more than
+``--threshold``. Durations that changed by less than ``--floor-ms`` are
+timer noise and never count as regressions.
+"""
+
+import sys
+import json
+import argparse
+from typing import Any, Dict, Optional
+
+def flatten(value: Any, prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves of nested dicts, keyed by dotted path"""
+    if isinstance(value, dict):
+        flat = {}
+        for key, child in value.items():
+            flat.update(flatten(child, f"{prefix}.{key}" if prefix else str(key)))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: float(value)}
+    return {}
+
+def direction(metric: str) -> int:
+    """-1 when lower is better, 1 when higher is better, 0 when neither"""
+    name = metric.rsplit(".", 1)[-1]
+    if name == "max_ms":
+        return 0
+    if name.endswith("_ms") or name.endswith("seconds"):
+        return -1
+    if name.endswith("per_sec"):
+        return 1
+    return 0
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float, floor_ms: float = 1.0):
+    """(metric, old, new, relative change, regressed) for every metric in both results"""
+    before, after = flatten(old["results"]), flatten(new["results"])
+    rows = []
+    for metric in sorted(before.keys() & after.keys()):
+        a, b = before[metric], after[metric]
+        change = (b - a) / a if a else 0.0
+        regressed = direction(metric) * change < -threshold
+        if direction(metric) < 0:
+            scale = 1.0 if metric.endswith("_ms") else 1000.0
+            regressed &= abs(b - a) * scale >= floor_ms
+        rows.append((metric, a, b, change, regressed))
+    return rows
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change treated as a regression")
+    parser.add_argument("--floor-ms", type=float, default=1.0, help="smallest duration change treated as a regression")
+    parser.add_argument("--all", action="store_true", help="show unchanged and unranked metrics too")
+    args = parser.parse_args(argv)
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if old.get("schema") != new.get("schema"):
+        print(f"warning: schema {old.get('schema')} vs {new.get('schema')}, metrics may not line up")
+    if old.get("params", {}).get("embedder") != new.get("params", {}).get("embedder"):
+        print("warning: the runs used different embedders")
+    print(f"{(old.get('commit') or '?')[:12]} -> {(new.get('commit') or '?')[:12]}")
+
+    regressions = 0
+    for metric, a, b, change, regressed in compare(old, new, args.threshold, args.floor_ms):
+        regressions += regressed
+        if args.all or (direction(metric) and abs(change) > args.threshold):
+            if regressed:
+                flag = "REGRESSION"
+            elif direction(metric) * change > args.threshold:
+                flag = "improved"
+            else:
+                flag = "noise" if direction(metric) else ""
+            print(f"{metric:<55} {a:>14.3f} {b:>14.3f} {change:>+8.1%}  {flag}")
+    print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
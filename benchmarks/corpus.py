@@ -0,0 +1,106 @@
+"""
+Deterministic synthetic corpus for the benchmarks.
+
+Everything is drawn from a ``random.Random`` seeded by the caller, so the
+same seed gives byte-identical text, files and vectors on every machine
+and every run, and results from different commits measure the same work.
+"""
+
+import json
+import random
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+
+# A fixed vocabulary keeps word frequencies (and so BM25 and MinHash work) stable
+WORDS = (
+    "moon river silence ember window garden thread lantern harbor meadow "
+    "winter echo marrow salt orchard glass feather cinder hollow tide "
+    "whisper mirror anchor willow ash dusk signal pattern resonance field "
+    "memory language circuit breath shadow light stone water fire wind "
+    "question answer story poem voice dream machine pulse rhythm vessel"
+).split()
+AUTHORS = ["Ada", "Basho", "Celan", "Dickinson", "Eliot", "Frost", "Giovanni", "Hughes"]
+
+def sentence(rand: random.Random, min_words: int = 6, max_words: int = 18) -> str:
+    words = [rand.choice(WORDS) for _ in range(rand.randint(min_words, max_words))]
+    return " ".join(words).capitalize() + rand.choice(".!?")
+
+def paragraph(rand: random.Random, sentences: int = 6) -> str:
+    return " ".join(sentence(rand) for _ in range(sentences))
+
+def text(seed: int, n_chars: int) -> str:
+    """About ``n_chars`` characters of sentence-punctuated prose"""
+    rand = random.Random(seed)
+    paragraphs, size = [], 0
+    while size < n_chars:
+        paragraphs.append(paragraph(rand))
+        size += len(paragraphs[-1]) + 2
+    return "\n\n".join(paragraphs)[:n_chars]
+
+def documents(seed: int, n: int, start: int = 0) -> List[str]:
+    """
+    Documents ``start`` to ``start + n`` of a numbered series (so content-hash IDs never collide).
+
+    Each slice has its own stream, so large stores can be filled a batch at a time.
+    """
+    rand = random.Random(f"{seed}:{start}")
+    return [f"{i}: {sentence(rand)} {sentence(rand)}" for i in range(start, start + n)]
+
+def questions(seed: int, n: int) -> List[str]:
+    """``n`` distinct questions, so no two requests share an embedding or answer cache entry"""
+    rand = random.Random(seed)
+    return [f"What does the {rand.choice(WORDS)} say about the {rand.choice(WORDS)}? ({i})" for i in range(n)]
+
+def vectors(seed: int, n: int, dim: int = 384, clusters: int = 64, chunk: int = 100_000) -> np.ndarray:
+    """
+    Unit-length float32 vectors scattered around ``clusters`` centres.
+
+    Real embeddings are clustered rather than uniform, which is what the
+    approximate indexes are tuned for. Generated a chunk at a time so a
+    million vectors never need a float64 copy.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    out = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, chunk):
+        end = min(start + chunk, n)
+        block = centres[rng.integers(0, clusters, end - start)]
+        block += 0.5 * rng.standard_normal((end - start, dim), dtype=np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        out[start:end] = block
+    return out
+
+def write_corpus(directory: Path, seed: int, files: int = 12, records: int = 200,
+                 text_chars: int = 200_000) -> Dict[str, int]:
+    """
+    Write an ingestible corpus: JSON arrays, JSON-lines and plain text files in turn.
+
+    Returns:
+        Counts of files, records and characters written
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    rand = random.Random(seed)
+    totals = {"files": 0, "records": 0, "chars": 0}
+    for i in range(files):
+        kind = (".json", ".jsonl", ".txt")[i % 3]
+        path = directory / f"synthetic_{i:03d}{kind}"
+        if kind == ".txt":
+            body = text(rand.randrange(1 << 30), text_chars)
+            totals["chars"] += len(body)
+        else:
+            items = []
+            for j in range(records):
+                # Record numbers keep every record distinct, so dedup drops nothing
+                item = {"text": f"Record {i}.{j}. {paragraph(rand, rand.randint(2, 12))}",
+                        "author": rand.choice(AUTHORS), "title": f"Piece {i}.{j}"}
+                items.append(item)
+                totals["chars"] += len(item["text"])
+            if kind == ".json":
+                body = json.dumps(items)
+            else:
+                body = "\n".join(json.dumps(item) for item in items) + "\n"
+            totals["records"] += records
+        path.write_text(body, encoding="utf-8")
+        totals["files"] += 1
+    return totals
@@ -0,0 +1,159 @@
+"""
+Run the benchmarks offline and write the results as JSON.
+
+Run from the repository root:
+
+    python -m benchmarks.run --quick
+    python -m benchmarks.run --output benchmarks/results/main.json
+
+The corpus is synthetic and seeded, embeddings come from a hashing stub
+(``--embedder model`` uses the real model) and answers from a stub LLM,
+so nothing touches the network and every run does the same work. Compare
+two results files with ``python -m benchmarks.compare``.
+"""
+
+import os
+import sys
+import json
+import argparse
+import platform
+import importlib.util
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+SUITES = ("chunking", "embeddings", "vector_store", "ingestion", "query_load")
+# Bumped when a metric is renamed or changes meaning
+SCHEMA_VERSION = 1
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+def _ints(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part]
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment() -> Dict[str, Any]:
+    """Where the numbers came from: commit, interpreter, machine"""
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"comma-separated subset of {', '.join(SUITES)}")
+    parser.add_argument("--quick", action="store_true", help="small sizes, for a smoke run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embedder", choices=("stub", "model"), default="stub",
+                        help="hashing stub (offline) or the real sentence-transformers model")
+    parser.add_argument("--backend", choices=("numpy", "chroma"), default="numpy", help="vector index backend")
+    parser.add_argument("--sizes", type=_ints, help="vector store sizes (default 10000,100000,1000000)")
+    parser.add_argument("--queries", type=int, help="queries timed per size and mode (default 200)")
+    parser.add_argument("--chunk-chars", type=int, help="text length for the chunking suite (default 5000000)")
+    parser.add_argument("--embed-texts", type=int, help="texts per embedding run (default 2048)")
+    parser.add_argument("--batch-sizes", type=_ints, default=[1, 8, 32, 128, 512])
+    parser.add_argument("--files", type=int, help="files in the ingestion corpus (default 12)")
+    parser.add_argument("--ingest-batch", type=int, default=256, help="ingestion batch size")
+    parser.add_argument("--concurrency", type=_ints, default=[1, 8, 32], help="concurrent /query/ clients")
+    parser.add_argument("--requests", type=int, help="/query/ requests per concurrency level (default 256)")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds the stub LLM takes per answer")
+    parser.add_argument("--work-dir", help="where stores and the corpus are written (default: a temp dir)")
+    parser.add_argument("--keep", action="store_true", help="keep the vector stores in --work-dir afterwards")
+    args = parser.parse_args(argv)
+
+    defaults = {"sizes": ([1000, 10000], [10000, 100000, 1000000]), "queries": (50, 200),
+                "chunk_chars": (1_000_000, 5_000_000), "embed_texts": (512, 2048),
+                "files": (6, 12), "requests": (64, 256)}
+    for name, (quick, full) in defaults.items():
+        if getattr(args, name) is None:
+            setattr(args, name, quick if args.quick else full)
+    args.suites = [suite for suite in args.suites.split(",") if suite]
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+    return args
+
+def _pin_environment(backend: str):
+    """Settings that would make runs incomparable: caches that hide work, a writer process, a warm-up"""
+    os.environ["RAG_VECTOR_BACKEND"] = backend
+    os.environ["RAG_ANSWER_CACHE_SIZE"] = "0"
+    os.environ["RAG_PRELOAD"] = "0"
+    os.environ["RAG_WARMUP"] = "0"
+    for name in ("RAG_EMBEDDING_CACHE_DIR", "RAG_WRITER_ADDRESS", "RAG_ANSWER_CACHE_SIMILARITY"):
+        os.environ.pop(name, None)
+
+def run(args: argparse.Namespace, work_dir: Path) -> Dict[str, Any]:
+    from . import suites
+    from .stubs import StubLLM, use_embedder
+    if "query_load" in args.suites and importlib.util.find_spec("httpx") is None:
+        print("[bench] skipping query_load: httpx is not installed (pip install httpx)", file=sys.stderr, flush=True)
+        args.suites = [suite for suite in args.suites if suite != "query_load"]
+    report = {"schema": SCHEMA_VERSION, **environment(), "params": dict(vars(args))}
+    report["params"]["embedder"] = use_embedder(args.embedder)
+    results = report["results"] = {}
+
+    def timed(name: str, fn):
+        print(f"[bench] {name} ...", file=sys.stderr, flush=True)
+        started = time.perf_counter()
+        value = fn()
+        print(f"[bench] {name} done in {time.perf_counter() - started:.1f}s", file=sys.stderr, flush=True)
+        return value
+
+    if "chunking" in args.suites:
+        results["chunking"] = timed("chunking", lambda: suites.bench_chunking(args.seed, args.chunk_chars))
+    if "embeddings" in args.suites:
+        results["embeddings"] = timed("embeddings", lambda: suites.bench_embeddings(
+            args.seed, args.embed_texts, args.batch_sizes))
+    if "vector_store" in args.suites:
+        results["vector_store"] = timed("vector_store", lambda: suites.bench_vector_store(
+            work_dir, args.seed, args.sizes, args.backend, args.queries, keep=args.keep))
+    if "ingestion" in args.suites or "query_load" in args.suites:
+        llm = StubLLM(latency=args.llm_latency)
+        ingestion_results, engine, ingestion = timed("ingestion", lambda: suites.bench_ingestion(
+            work_dir, args.seed, args.files, records=200, text_chars=200_000,
+            batch_size=args.ingest_batch, llm=llm))
+        if "ingestion" in args.suites:
+            results["ingestion"] = ingestion_results
+        if "query_load" in args.suites:
+            results["query_load"] = timed("query_load", lambda: suites.bench_query_load(
+                engine, ingestion, args.seed, args.concurrency, args.requests))
+    return report
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    _pin_environment(args.backend)
+
+    if args.work_dir:
+        work_dir = Path(args.work_dir)
+        work_dir.mkdir(parents=True, exist_ok=True)
+        report = run(args, work_dir)
+    else:
+        with tempfile.TemporaryDirectory(prefix="rag-bench-") as tmp:
+            report = run(args, Path(tmp))
+
+    output = Path(args.output) if args.output else (
+        REPO_ROOT / "benchmarks" / "results" / f"{(report['commit'] or 'unknown')[:12]}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    print(f"[bench] results written to {output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Offline stand-ins for the two remote dependencies.
+
+``HashEmbedder`` replaces the SentenceTransformer model (hashed bag of
+words, deterministic, no download) and ``StubLLM`` replaces the Gemini
+model (fixed answer after a fixed delay). Both expose only the methods the
+app calls, so the code under test runs unchanged around them.
+"""
+
+import time
+import asyncio
+import zlib
+from typing import Iterator, List
+import numpy as np
+
+EMBEDDING_DIM = 384
+
+class HashEmbedder:
+    """Feature-hashing embedder with the SentenceTransformer ``encode`` signature"""
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            # crc32, unlike hash(), is the same in every process
+            hashes = np.fromiter((zlib.crc32(word.encode()) for word in text.lower().split()), dtype=np.uint32)
+            signs = np.where(hashes & 1, 1.0, -1.0).astype(np.float32)
+            np.add.at(vectors[row], (hashes >> 1) % self.dim, signs)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+
+class StubLLM:
+    """Answers every prompt after ``latency`` seconds, like a remote model would"""
+
+    def __init__(self, latency: float = 0.05, stream_chunks: int = 5):
+        self.latency = latency
+        self.stream_chunks = stream_chunks
+        self.calls = 0
+
+    def answer(self, prompt: str) -> str:
+        return f"A stub answer drawn from {len(prompt)} characters of context."
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        self.calls += 1
+        if stream:
+            return self._stream(prompt)
+        time.sleep(self.latency)
+        return _Response(self.answer(prompt))
+
+    async def generate_content_async(self, prompt: str) -> _Response:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return _Response(self.answer(prompt))
+
+    def _stream(self, prompt: str) -> Iterator[_Response]:
+        words = self.answer(prompt).split(" ")
+        step = max(1, len(words) // self.stream_chunks)
+        for i in range(0, len(words), step):
+            time.sleep(self.latency / self.stream_chunks)
+            yield _Response(" ".join(words[i:i + step]) + " ")
+
+def use_embedder(kind: str) -> str:
+    """
+    Make ``load_model`` return the stub ("stub") or the real model ("model").
+
+    Must run before any ``EmbeddingGenerator`` is built. Returns the name
+    recorded in the results.
+    """
+    from app.rag import embeddings
+    if kind == "stub":
+        with embeddings._models_lock:
+            embeddings._models[embeddings.DEFAULT_MODEL] = HashEmbedder()
+        return f"stub:hash-{EMBEDDING_DIM}"
+    if kind == "model":
+        embeddings.load_model()
+        return embeddings.DEFAULT_MODEL
+    raise ValueError(f"Unknown embedder: {kind}")
@@ -0,0 +1,216 @@
+"""
+The benchmark suites.
+
+Each suite returns a dict of measurements keyed by stable names, so the
+same metric sits at the same path in every results file. Durations are
+seconds, latencies milliseconds, throughputs per second.
+"""
+
+import time
+import shutil
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+import numpy as np
+from . import corpus
+from .stubs import StubLLM
+
+def latency_summary(seconds: Sequence[float]) -> Dict[str, float]:
+    """Count, mean and tail percentiles of a list of durations, in milliseconds"""
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    if not len(ms):
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"count": len(ms), "mean_ms": round(float(ms.mean()), 3), "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3), "max_ms": round(float(ms.max()), 3)}
+
+def _best_of(repeats: int, fn) -> float:
+    """Fastest of ``repeats`` timed calls, the least noisy estimate of the work itself"""
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def bench_chunking(seed: int, n_chars: int, repeats: int = 3) -> Dict[str, Any]:
+    """chunk_text throughput over one long text, by chunk unit"""
+    from app.chunking import CHUNK_UNITS, chunk_text
+    text = corpus.text(seed, n_chars)
+    results = {}
+    for unit in CHUNK_UNITS:
+        # Token chunks of 200 words cover about as much text as 1000 characters
+        size, overlap = (1000, 200) if unit == "chars" else (200, 40)
+        chunks = chunk_text(text, size, overlap, unit=unit)
+        seconds = _best_of(repeats, lambda: chunk_text(text, size, overlap, unit=unit))
+        results[unit] = {"chars": len(text), "chunk_size": size, "overlap": overlap, "chunks": len(chunks),
+                         "seconds": round(seconds, 6), "mb_per_sec": round(len(text) / seconds / 1e6, 3)}
+    return results
+
+def bench_embeddings(seed: int, n_texts: int, batch_sizes: Sequence[int]) -> Dict[str, Any]:
+    """Model throughput by batch size, then EmbeddingGenerator with a cold and a warm cache"""
+    from app.rag.embeddings import EmbeddingGenerator, load_model
+    texts = corpus.documents(seed, n_texts)
+    model = load_model()
+    model.encode(texts[:8])  # first-call setup is not throughput
+    results = {}
+    for batch_size in batch_sizes:
+        started = time.perf_counter()
+        model.encode(texts, batch_size=batch_size)
+        seconds = time.perf_counter() - started
+        results[f"batch_{batch_size}"] = {"texts": n_texts, "seconds": round(seconds, 6),
+                                          "texts_per_sec": round(n_texts / seconds, 1)}
+
+    generator = EmbeddingGenerator(cache_size=2 * n_texts)
+    for phase in ("cold", "warm"):
+        started = time.perf_counter()
+        generator.encode(texts)
+        seconds = time.perf_counter() - started
+        results[f"generator_{phase}"] = {"texts": n_texts, "seconds": round(seconds, 6),
+                                         "texts_per_sec": round(n_texts / seconds, 1)}
+    results["generator_cache"] = generator.cache_stats()
+    return results
+
+def bench_vector_store(work_dir: Path, seed: int, sizes: Sequence[int], backend: str, n_queries: int,
+                       n_results: int = 5, add_batch: int = 10_000, keep: bool = False) -> Dict[str, Any]:
+    """add_documents and query latency at each collection size, by search mode"""
+    from app.rag.vector_store import VectorStore
+    results = {}
+    for size in sizes:
+        store_dir = work_dir / f"store_{size}"
+        store = VectorStore("bench", backend=backend, data_dir=str(store_dir))
+        vectors = corpus.vectors(seed, size)
+
+        add_seconds = []
+        for start in range(0, size, add_batch):
+            end = min(start + add_batch, size)
+            documents = corpus.documents(seed, end - start, start)
+            metadata = [{"source": f"synthetic_{i % 16:03d}.json"} for i in range(start, end)]
+            t0 = time.perf_counter()
+            store.add_documents(documents, vectors[start:end], metadata)
+            add_seconds.append(time.perf_counter() - t0)
+
+        # Queries near stored points, as real questions land near real chunks
+        rng = np.random.default_rng(seed + 1)
+        queries = vectors[rng.integers(0, size, n_queries)] + 0.1 * rng.standard_normal(
+            (n_queries, vectors.shape[1]), dtype=np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        query_texts = corpus.questions(seed, n_queries)
+        del vectors
+
+        # The first query pays for lazily built indexes (HNSW, BM25 sync)
+        t0 = time.perf_counter()
+        store.query(queries[0], n_results, mode="hybrid", query_text=query_texts[0])
+        first_query = time.perf_counter() - t0
+
+        latencies = {}
+        for mode, where in (("vector", None), ("filtered", {"source": "synthetic_003.json"}), ("hybrid", None)):
+            seconds = []
+            for embedding, text in zip(queries, query_texts):
+                t0 = time.perf_counter()
+                store.query(embedding, n_results, where=where, mode="hybrid" if mode == "hybrid" else "vector",
+                            query_text=text)
+                seconds.append(time.perf_counter() - t0)
+            latencies[mode] = latency_summary(seconds)
+
+        results[str(size)] = {
+            "backend": backend,
+            "add_seconds": round(sum(add_seconds), 3),
+            "add_docs_per_sec": round(size / sum(add_seconds), 1),
+            "add_batch": {"batch_size": add_batch, **latency_summary(add_seconds)},
+            "first_query_seconds": round(first_query, 3),
+            "query": latencies,
+        }
+        del store
+        if not keep:
+            shutil.rmtree(store_dir, ignore_errors=True)
+    return results
+
+def bench_ingestion(work_dir: Path, seed: int, files: int, records: int, text_chars: int,
+                    batch_size: int, llm: StubLLM):
+    """
+    process_nltk_files end to end on a fresh collection, then a no-op incremental re-run.
+
+    Returns the measurements and the ingested (engine, ingestion) pair for the query load test.
+    """
+    from app.rag.rag_engine import RAGEngine
+    from app.data_ingestion import DataIngestion
+    corpus_dir = work_dir / "corpus"
+    written = corpus.write_corpus(corpus_dir, seed, files=files, records=records, text_chars=text_chars)
+
+    engine = RAGEngine("bench", data_dir=str(work_dir / "engine"))
+    engine.model = llm
+    # One worker: worker processes would load the real embedding model, not the stub
+    ingestion = DataIngestion(engine, batch_size=batch_size, workers=1,
+                              manifest_path=str(work_dir / "engine" / "manifest.json"))
+    t0 = time.perf_counter()
+    stats = ingestion.process_nltk_files(str(corpus_dir))
+    seconds = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    rerun = ingestion.process_nltk_files(str(corpus_dir))
+    noop_seconds = time.perf_counter() - t0
+
+    results = {
+        "corpus": written,
+        "batch_size": batch_size,
+        "seconds": round(seconds, 3),
+        "chunks": stats["total_chunks"],
+        "chunks_per_sec": round(stats["total_chunks"] / seconds, 1),
+        "mb_per_sec": round(written["chars"] / seconds / 1e6, 3),
+        "failed_files": stats["failed_files"],
+        "duplicates_dropped": stats["duplicates_dropped"],
+        "timings": {phase: round(value, 3) for phase, value in stats["timings"].items()},
+        "incremental_noop_seconds": round(noop_seconds, 3),
+        "incremental_skipped_files": rerun["skipped_files"],
+    }
+    return results, engine, ingestion
+
+def bench_query_load(engine, ingestion, seed: int, concurrency: Sequence[int], requests: int,
+                     n_results: int = 5) -> Dict[str, Any]:
+    """POST /query/ through the ASGI app, ``requests`` distinct questions per concurrency level"""
+    import httpx
+    import app.main as server
+    # httpx logs every request at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    from app.services import Services
+
+    # Hand the app the already ingested engine instead of letting it build its own
+    services = Services(warm_up=False, use_writer=False)
+    services.rag_engine = engine
+    services.data_ingestion = ingestion
+    server.services = services
+    llm = engine.model
+
+    async def level(client: "httpx.AsyncClient", clients: int, questions: List[str]) -> Dict[str, Any]:
+        pending = iter(questions)
+        latencies, errors = [], 0
+
+        async def worker():
+            nonlocal errors
+            for question in pending:
+                t0 = time.perf_counter()
+                response = await client.post("/query/", json={"question": question, "n_results": n_results})
+                latencies.append(time.perf_counter() - t0)
+                errors += response.status_code != 200
+
+        calls = llm.calls
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        seconds = time.perf_counter() - started
+        return {"requests": len(questions), "errors": errors, "llm_calls": llm.calls - calls,
+                "seconds": round(seconds, 3), "requests_per_sec": round(len(questions) / seconds, 1),
+                **latency_summary(latencies)}
+
+    async def run() -> Dict[str, Any]:
+        # One event loop for every level: the app's semaphore binds to the first loop it waits on
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            await client.post("/query/", json={"question": "warm-up", "n_results": n_results})
+            results = {}
+            for clients in concurrency:
+                results[f"c{clients}"] = {"concurrency": clients,
+                                          **await level(client, clients, corpus.questions(seed + clients, requests))}
+            return results
+
+    return asyncio.run(run())
@@ -0,0 +1,52 @@
+"""
+Production serving: several Uvicorn workers under one gunicorn master.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The master imports the app and loads the embedding model before forking
+the workers (``preload_app``), so they share its weights copy-on-write
+instead of each loading its own. A separate writer process
+(``python -m app.writer``) owns every write to the vector store; workers
+open it read-only, send writes to the writer and refresh their view every
+``RAG_REFRESH_INTERVAL`` seconds, so queries scale with the worker count.
+"""
+
+import os
+import sys
+import secrets
+import subprocess
+import multiprocessing
+
+bind = os.getenv("RAG_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("RAG_SERVER_WORKERS", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Long ingestion requests wait on the writer
+timeout = int(os.getenv("RAG_WORKER_TIMEOUT", "600"))
+
+def on_starting(server):
+    # Inherited by the writer and by every worker
+    os.environ.setdefault("RAG_WRITER_ADDRESS", "127.0.0.1:8765")
+    if not os.getenv("RAG_WRITER_AUTHKEY"):
+        os.environ["RAG_WRITER_AUTHKEY"] = secrets.token_hex(16)
+
+def when_ready(server):
+    # A fresh interpreter, so the writer shares nothing with the master
+    server.rag_writer = subprocess.Popen([sys.executable, "-m", "app.writer"])
+    server.log.info(f"Started writer process {server.rag_writer.pid}")
+
+    # Loaded here, before the workers fork. Only the weights: running the
+    # model would start torch's thread pool, which does not survive fork
+    from app.rag.embeddings import load_model
+    load_model()
+    server.log.info("Embedding model loaded for the workers")
+
+def on_exit(server):
+    writer = getattr(server, "rag_writer", None)
+    if writer is not None and writer.poll() is None:
+        # The writer finishes the file each running ingestion job is on
+        writer.terminate()
+        try:
+            writer.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            writer.kill()
@@ -0,0 +1,101 @@
+"""Benchmark the batch metrics against their scalar versions.
+
+Run from the repository root:
+
+    python -m percipientlab_sandbox.tools.benchmark_metrics --pairs 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Callable, Iterable, List, Tuple
+
+import numpy as np
+
+from .prompt_divergence import divergence
+from .resonance_metrics import (
+    ResonanceMetric,
+    TokenCorpus,
+    Vocabulary,
+    cosine_similarity,
+    cosine_similarity_matrix,
+)
+
+
+def _timed(fn: Callable[[], object]) -> Tuple[float, object]:
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def _report(name: str, items: int, unit: str, scalar_seconds: float, batch_seconds: float, agree: bool):
+    print(
+        f"{name:<14} {items:>10,} {unit:<7}  scalar {scalar_seconds:8.3f}s  "
+        f"batch {batch_seconds:8.3f}s  x{scalar_seconds / max(batch_seconds, 1e-9):7.1f}  "
+        f"{'match' if agree else 'MISMATCH'}"
+    )
+
+
+def _two_pass_divergence(outputs: List[str]) -> Tuple[str, float]:
+    """The list-only divergence this module's streaming version replaced."""
+    lengths = [len(o) for o in outputs]
+    average = sum(lengths) / len(lengths)
+    variance = sum((l - average) ** 2 for l in lengths) / len(lengths)
+    return max(outputs, key=lambda o: abs(len(o) - average)), variance
+
+
+def bench_cosine(side: int, dim: int, rng: np.random.Generator):
+    a = rng.normal(size=(side, dim)).astype(np.float32)
+    b = rng.normal(size=(side, dim)).astype(np.float32)
+    scalar_seconds, scalar = _timed(lambda: [[cosine_similarity(x, y) for y in b] for x in a])
+    batch_seconds, batch = _timed(lambda: cosine_similarity_matrix(a, b))
+    _report("cosine", side * side, "pairs", scalar_seconds, batch_seconds, np.allclose(scalar, batch, atol=1e-5))
+
+
+def bench_overlap(side: int, vocab_size: int, seed: int):
+    rand = random.Random(seed)
+    words = [f"w{i}" for i in range(vocab_size)]
+    lists_a = [[rand.choice(words) for _ in range(rand.randint(0, 40))] for _ in range(side)]
+    lists_b = [[rand.choice(words) for _ in range(rand.randint(0, 40))] for _ in range(side)]
+    metric = ResonanceMetric()
+    scalar_seconds, scalar = _timed(lambda: [[metric.score(x, y) for y in lists_b] for x in lists_a])
+
+    def batch():
+        vocabulary = Vocabulary()
+        return metric.score_matrix(TokenCorpus(lists_a, vocabulary), TokenCorpus(lists_b, vocabulary))
+
+    batch_seconds, scores = _timed(batch)
+    _report("token overlap", side * side, "pairs", scalar_seconds, batch_seconds, np.allclose(scalar, scores))
+
+
+def bench_divergence(count: int, seed: int):
+    rand = random.Random(seed)
+    outputs = ["x" * rand.randint(0, 400) for _ in range(count)]
+
+    def stream() -> Iterable[str]:
+        return (output for output in outputs)
+
+    scalar_seconds, scalar = _timed(lambda: _two_pass_divergence(outputs))
+    batch_seconds, streamed = _timed(lambda: divergence("", stream()))
+    agree = scalar[0] == streamed[0] and abs(scalar[1] - streamed[1]) <= 1e-6 * max(scalar[1], 1.0)
+    _report("divergence", count, "outputs", scalar_seconds, batch_seconds, agree)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pairs", type=int, default=250_000, help="pairs scored by the cosine and overlap runs")
+    parser.add_argument("--dim", type=int, default=384, help="embedding dimension")
+    parser.add_argument("--vocab", type=int, default=2000, help="distinct tokens in the overlap corpora")
+    parser.add_argument("--outputs", type=int, default=1_000_000, help="outputs fed to divergence")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    side = max(1, int(args.pairs ** 0.5))
+    bench_cosine(side, args.dim, np.random.default_rng(args.seed))
+    bench_overlap(side, args.vocab, args.seed)
+    bench_divergence(args.outputs, args.seed)
+
+
+if __name__ == "__main__":
+    main()
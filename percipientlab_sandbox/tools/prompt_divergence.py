@@ -1,15 +1,91 @@
 """Utilities for running prompt divergence tests across models."""
 from __future__ import annotations
 
-from typing import Iterable, Tuple
+from itertools import islice
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Outputs measured per numpy step in DivergenceAccumulator.update
+CHUNK_SIZE = 65536
+
+
+class DivergenceAccumulator:
+    """Streaming length statistics of model outputs: one pass, constant memory.
+
+    The output furthest from the mean length is always the shortest or
+    the longest one, so only those two are kept while outputs arrive.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._total = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        # (length, position, output) of the first shortest and first longest outputs
+        self._shortest: Optional[Tuple[int, int, str]] = None
+        self._longest: Optional[Tuple[int, int, str]] = None
+
+    def add(self, output: str):
+        length = len(output)
+        # Welford's update keeps the variance accurate without a second pass
+        self.count += 1
+        self._total += length
+        delta = length - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (length - self._mean)
+        if self._shortest is None or length < self._shortest[0]:
+            self._shortest = (length, self.count, output)
+        if self._longest is None or length > self._longest[0]:
+            self._longest = (length, self.count, output)
+
+    def update(self, outputs: Iterable[str], chunk_size: int = CHUNK_SIZE) -> "DivergenceAccumulator":
+        """Add many outputs, measuring them a chunk at a time."""
+        iterator = iter(outputs)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                return self
+            self._add_chunk(chunk, np.fromiter(map(len, chunk), dtype=np.int64, count=len(chunk)))
+
+    def _add_chunk(self, chunk: List[str], lengths: np.ndarray):
+        # Chan et al.'s merge of two (count, mean, M2) summaries
+        count = len(lengths)
+        mean = float(lengths.mean())
+        m2 = float(((lengths - mean) ** 2).sum())
+        delta = mean - self._mean
+        merged = self.count + count
+        self._m2 += m2 + delta * delta * self.count * count / merged
+        self._mean += delta * count / merged
+        offset = self.count
+        self.count = merged
+        self._total += int(lengths.sum())
+
+        # argmin/argmax return the first occurrence, matching add()
+        low, high = int(lengths.argmin()), int(lengths.argmax())
+        if self._shortest is None or lengths[low] < self._shortest[0]:
+            self._shortest = (int(lengths[low]), offset + low + 1, chunk[low])
+        if self._longest is None or lengths[high] > self._longest[0]:
+            self._longest = (int(lengths[high]), offset + high + 1, chunk[high])
+
+    def result(self) -> Tuple[str, float]:
+        """The most divergent output and the population variance of the lengths."""
+        if not self.count:
+            return "", 0.0
+        shortest, longest = self._shortest, self._longest
+        # Sign of (mean - shortest) - (longest - mean), in exact integers
+        lean = 2 * self._total - self.count * (shortest[0] + longest[0])
+        if lean == 0:
+            # Ties go to whichever output came first, as max() does
+            chosen = min(shortest, longest, key=lambda candidate: candidate[1])
+        else:
+            chosen = shortest if lean > 0 else longest
+        return chosen[2], self._m2 / self.count
 
 
 def divergence(prompt: str, outputs: Iterable[str]) -> Tuple[str, float]:
-    """Return the most divergent output and a simple variance score."""
-    if not outputs:
-        return "", 0.0
-    lengths = [len(o) for o in outputs]
-    average = sum(lengths) / len(lengths)
-    variance = sum((l - average) ** 2 for l in lengths) / len(lengths)
-    most_divergent = max(outputs, key=lambda o: abs(len(o) - average))
-    return most_divergent, variance
+    """Return the most divergent output and a simple variance score.
+
+    ``outputs`` is read once, so generators and other one-shot iterables work.
+    """
+    return DivergenceAccumulator().update(outputs).result()
@@ -1,17 +1,90 @@
-"""Utility functions for token-level resonance metrics."""
+"""Utility functions for token-level resonance metrics.
+
+The scalar functions score one pair at a time. For scoring many pairs,
+``cosine_similarity_matrix`` / ``paired_cosine_similarity`` work on whole
+embedding matrices, and ``ResonanceMetric.score_matrix`` /
+``score_pairs`` work on a ``TokenCorpus``, a sparse token-presence matrix
+over a shared ``Vocabulary``.
+"""
 from __future__ import annotations
 
-from typing import List
+from typing import Dict, Iterable, List, Optional, Sequence, Union
 import numpy as np
+from scipy import sparse
+
+Vector = Union[np.ndarray, Sequence[float]]
 
 
-def cosine_similarity(vec_a: List[float], vec_b: List[float]) -> float:
-    """Compute cosine similarity between two vectors."""
-    a = np.array(vec_a)
-    b = np.array(vec_b)
+def cosine_similarity(vec_a: Vector, vec_b: Vector) -> float:
+    """Compute cosine similarity between two vectors (arrays are used without copying)."""
+    a = np.asarray(vec_a)
+    b = np.asarray(vec_b)
     if a.size == 0 or b.size == 0:
         return 0.0
-    return float(a.dot(b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+    norm = np.linalg.norm(a) * np.linalg.norm(b)
+    return float(a.dot(b) / norm) if norm else 0.0
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    """Rows scaled to unit length; zero rows stay zero, so they score 0.0 like the scalar version."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def cosine_similarity_matrix(vecs_a: np.ndarray, vecs_b: Optional[np.ndarray] = None) -> np.ndarray:
+    """Cosine similarity of every row of ``vecs_a`` with every row of ``vecs_b`` (default: itself), as an m x n matrix."""
+    a = _unit_rows(np.atleast_2d(np.asarray(vecs_a, dtype=np.float32)))
+    b = a if vecs_b is None else _unit_rows(np.atleast_2d(np.asarray(vecs_b, dtype=np.float32)))
+    return a @ b.T
+
+
+def paired_cosine_similarity(vecs_a: np.ndarray, vecs_b: np.ndarray) -> np.ndarray:
+    """Cosine similarity of row i of ``vecs_a`` with row i of ``vecs_b``, for every i."""
+    a = _unit_rows(np.atleast_2d(np.asarray(vecs_a, dtype=np.float32)))
+    b = _unit_rows(np.atleast_2d(np.asarray(vecs_b, dtype=np.float32)))
+    return np.einsum("ij,ij->i", a, b)
+
+
+class Vocabulary:
+    """Interns tokens as integer ids, so corpora tokenized once can share columns."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def intern(self, tokens: Iterable[str]) -> np.ndarray:
+        """Ids of the tokens, adding unseen ones."""
+        ids = self.ids
+        return np.fromiter((ids.setdefault(token, len(ids)) for token in tokens), dtype=np.int64)
+
+
+class TokenCorpus:
+    """Token lists as a sparse 0/1 presence matrix (one row per list) plus their lengths."""
+
+    def __init__(self, token_lists: Iterable[List[str]], vocabulary: Vocabulary):
+        self.vocabulary = vocabulary
+        indptr = [0]
+        indices = []
+        lengths = []
+        for tokens in token_lists:
+            ids = np.unique(vocabulary.intern(tokens))
+            indices.append(ids)
+            indptr.append(indptr[-1] + len(ids))
+            # Repeated tokens still count towards the length, as in ResonanceMetric.score
+            lengths.append(len(tokens))
+        self.lengths = np.asarray(lengths, dtype=np.float64)
+        self._indptr = np.asarray(indptr, dtype=np.int64)
+        self._indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def matrix(self) -> sparse.csr_matrix:
+        """Presence matrix over the vocabulary as it is now, so corpora built later still line up."""
+        data = np.ones(len(self._indices), dtype=np.float32)
+        return sparse.csr_matrix((data, self._indices, self._indptr), shape=(len(self), len(self.vocabulary)))
 
 
 class ResonanceMetric:
@@ -23,3 +96,26 @@ class ResonanceMetric:
             return 0.0
         overlap = len(set(tokens_a) & set(tokens_b))
         return overlap / max(len(tokens_a), len(tokens_b))
+
+    def score_matrix(self, corpus_a: TokenCorpus, corpus_b: TokenCorpus) -> np.ndarray:
+        """``score`` of every list in ``corpus_a`` against every list in ``corpus_b``, as an m x n matrix."""
+        _check_vocabulary(corpus_a, corpus_b)
+        overlap = (corpus_a.matrix() @ corpus_b.matrix().T).toarray()
+        longest = np.maximum.outer(corpus_a.lengths, corpus_b.lengths)
+        both = np.outer(corpus_a.lengths > 0, corpus_b.lengths > 0)
+        return np.divide(overlap, longest, out=np.zeros_like(longest), where=both)
+
+    def score_pairs(self, corpus_a: TokenCorpus, corpus_b: TokenCorpus) -> np.ndarray:
+        """``score`` of list i of ``corpus_a`` against list i of ``corpus_b``, for every i."""
+        _check_vocabulary(corpus_a, corpus_b)
+        if len(corpus_a) != len(corpus_b):
+            raise ValueError("score_pairs needs corpora of the same length")
+        overlap = np.asarray(corpus_a.matrix().multiply(corpus_b.matrix()).sum(axis=1)).ravel()
+        longest = np.maximum(corpus_a.lengths, corpus_b.lengths)
+        both = (corpus_a.lengths > 0) & (corpus_b.lengths > 0)
+        return np.divide(overlap, longest, out=np.zeros_like(longest), where=both)
+
+
+def _check_vocabulary(corpus_a: TokenCorpus, corpus_b: TokenCorpus):
+    if corpus_a.vocabulary is not corpus_b.vocabulary:
+        raise ValueError("Corpora must share a Vocabulary to be compared")
@@ -15,7 +15,7 @@ from app.rag.embeddings import EmbeddingGenerator
 print("Loaded EmbeddingGenerator")
 from app.rag.visualization.poetry_viz import PoetryVisualizer
 print("Loaded PoetryVisualizer")
-from app.data_ingestion import chunk_text
+from app.chunking import chunk_text
 from rich.console import Console
 from rich.panel import Panel
 from rich import print as rprint
@@ -2,9 +2,21 @@
 
 echo "Cleaning up existing processes..."
 pkill -f uvicorn
+pkill -f gunicorn
+pkill -f app.writer
 
 echo "Waiting for ports to clear..."
 sleep 2
 
+if [ "$1" = "prod" ]; then
+    # One worker per core sharing a preloaded model, plus a single writer
+    # process for the vector store (see gunicorn.conf.py)
+    echo "Starting RAG system (production)..."
+    exec gunicorn -c gunicorn.conf.py app.main:app
+fi
+
 echo "Starting RAG system..."
-uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload --log-level debug 
\ No newline at end of file
+# Models and stores load in the background after startup: /health/live answers
+# at once, /health/ready once queries will be fast. Only code changes under
+# app/ trigger a reload.
+uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload --reload-dir app --log-level debug
@@ -0,0 +1,58 @@
+"""
+Shared fixtures.
+
+Tests that need the full stack import it with ``pytest.importorskip``, so
+they are skipped rather than failing where sentence-transformers or the
+Gemini client are not installed.
+"""
+
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pytest
+from benchmarks.stubs import HashEmbedder
+
+class StubEmbeddingGenerator:
+    """``EmbeddingGenerator.encode`` over the hashing stub, without loading a model"""
+
+    def __init__(self):
+        self.model = HashEmbedder()
+
+    def encode(self, texts: List[str], normalize: bool = False) -> np.ndarray:
+        return np.asarray(self.model.encode(texts), dtype=np.float32)
+
+class StubEngine:
+    """The parts of RAGEngine that DataIngestion uses, over a real numpy-backed VectorStore"""
+
+    def __init__(self, data_dir: str):
+        from app.rag.vector_store import VectorStore
+        self.vector_store = VectorStore("test", backend="numpy", data_dir=data_dir)
+        self.embedding_generator = StubEmbeddingGenerator()
+        # Set to make the next add_documents calls fail, counting down
+        self.fail_adds_after: Optional[int] = None
+
+    def add_documents(self, documents: List[str], metadata: List[Dict[str, Any]] = None,
+                      embeddings: np.ndarray = None, signatures: Optional[np.ndarray] = None):
+        if self.fail_adds_after is not None:
+            if self.fail_adds_after == 0:
+                raise RuntimeError("injected write failure")
+            self.fail_adds_after -= 1
+        if embeddings is None:
+            embeddings = self.embedding_generator.encode(documents)
+        self.vector_store.add_documents(documents, embeddings, metadata, signatures=signatures)
+
+    def delete_documents(self, ids: List[str]):
+        self.vector_store.delete(ids)
+
+@pytest.fixture
+def engine(tmp_path):
+    return StubEngine(str(tmp_path / "data"))
+
+@pytest.fixture
+def make_ingestion(engine, tmp_path):
+    """Build a DataIngestion over the stub engine, skipping without the full stack"""
+    data_ingestion = pytest.importorskip("app.data_ingestion")
+
+    def make(**kwargs):
+        kwargs.setdefault("manifest_path", str(tmp_path / "manifest.json"))
+        return data_ingestion.DataIngestion(engine, **kwargs)
+    return make
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from app.rag import answer_cache
+from app.rag.answer_cache import AnswerCache, normalize_question
+
+def _vector(*values):
+    return np.asarray(values, dtype=np.float32)
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "monotonic", lambda: now[0])
+    return now
+
+def test_normalized_question_hits_with_same_context():
+    cache = AnswerCache()
+    cache.put("What is RAG?", _vector(1, 0), ["doc_1", "doc_2"], "retrieval")
+    assert normalize_question("  what IS rag ") == normalize_question("What is RAG?")
+    assert cache.get("  what IS   rag ", _vector(0, 1), ["doc_1", "doc_2"]) == "retrieval"
+    assert cache.stats()["exact_hits"] == 1
+
+def test_different_context_misses():
+    cache = AnswerCache()
+    cache.put("What is RAG?", _vector(1, 0), ["doc_1", "doc_2"], "retrieval")
+    assert cache.get("What is RAG?", _vector(1, 0), ["doc_1", "doc_3"]) is None
+    # Order is part of the key: the prompt lists the chunks in this order
+    assert cache.get("What is RAG?", _vector(1, 0), ["doc_2", "doc_1"]) is None
+    assert cache.stats()["misses"] == 2
+
+def test_entries_expire_after_ttl(clock):
+    cache = AnswerCache(ttl_seconds=60)
+    cache.put("q", _vector(1, 0), ["doc_1"], "answer")
+    clock[0] += 60
+    assert cache.get("q", _vector(1, 0), ["doc_1"]) == "answer"
+    clock[0] += 1
+    assert cache.get("q", _vector(1, 0), ["doc_1"]) is None
+    assert cache.stats()["entries"] == 0
+
+def test_semantic_hit_needs_threshold_and_same_context(clock):
+    cache = AnswerCache(similarity_threshold=0.9, ttl_seconds=60)
+    cache.put("How do I ingest files?", _vector(1, 0), ["doc_1"], "use /ingest/")
+    assert cache.get("How can files be ingested", _vector(0.99, 0.1), ["doc_1"]) == "use /ingest/"
+    assert cache.get("How can files be ingested", _vector(0.99, 0.1), ["doc_2"]) is None
+    assert cache.get("Something else", _vector(0, 1), ["doc_1"]) is None
+    clock[0] += 61
+    assert cache.get("How can files be ingested", _vector(0.99, 0.1), ["doc_1"]) is None
+    assert cache.stats()["semantic_hits"] == 1
+
+def test_invalidate_drops_answers_using_a_chunk():
+    cache = AnswerCache()
+    cache.put("a", _vector(1, 0), ["doc_1", "doc_2"], "A")
+    cache.put("b", _vector(1, 0), ["doc_3"], "B")
+    cache.invalidate(["doc_2"])
+    assert cache.get("a", _vector(1, 0), ["doc_1", "doc_2"]) is None
+    assert cache.get("b", _vector(1, 0), ["doc_3"]) == "B"
+    assert cache.stats()["invalidations"] == 1
+
+def test_lru_eviction_keeps_recently_used():
+    cache = AnswerCache(max_entries=2)
+    cache.put("a", _vector(1, 0), ["doc_1"], "A")
+    cache.put("b", _vector(1, 0), ["doc_1"], "B")
+    assert cache.get("a", _vector(1, 0), ["doc_1"]) == "A"
+    cache.put("c", _vector(1, 0), ["doc_1"], "C")
+    assert cache.get("b", _vector(1, 0), ["doc_1"]) is None
+    assert cache.get("a", _vector(1, 0), ["doc_1"]) == "A"
+    assert cache.stats()["evictions"] == 1
+
+def test_disabled_cache_stores_nothing():
+    cache = AnswerCache(max_entries=0)
+    cache.put("a", _vector(1, 0), ["doc_1"], "A")
+    assert cache.get("a", _vector(1, 0), ["doc_1"]) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,73 @@
+import threading
+import pytest
+from conftest import StubEmbeddingGenerator
+
+batching_embedder = pytest.importorskip("app.rag.batching_embedder")
+
+class GatedGenerator(StubEmbeddingGenerator):
+    """Blocks in encode until released, so requests can be cancelled while queued"""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.batches = []
+
+    def encode(self, texts, normalize=False):
+        self.batches.append(list(texts))
+        self.entered.set()
+        self.release.wait(5)
+        return super().encode(texts, normalize)
+
+@pytest.fixture
+def gated():
+    generator = GatedGenerator()
+    embedder = batching_embedder.BatchingEmbedder(generator, max_wait_ms=1.0)
+    yield generator, embedder
+    generator.release.set()
+    embedder.close()
+
+def test_cancelled_request_is_dropped_and_batcher_keeps_serving(gated):
+    generator, embedder = gated
+    first = embedder.submit("first")
+    assert generator.entered.wait(5)
+
+    # Queued behind the batch being encoded, then abandoned by its caller
+    cancelled = embedder.submit("abandoned")
+    assert cancelled.cancel()
+    waiting = embedder.submit("still wanted")
+    generator.release.set()
+
+    assert first.result(5).shape == (generator.model.dim,)
+    assert waiting.result(5).shape == (generator.model.dim,)
+    assert all("abandoned" not in batch for batch in generator.batches)
+    assert embedder.generate_embedding("after").shape == (generator.model.dim,)
+
+def test_encode_error_reaches_callers_and_batcher_keeps_serving():
+    class FlakyGenerator(StubEmbeddingGenerator):
+        calls = 0
+
+        def encode(self, texts, normalize=False):
+            self.calls += 1
+            if self.calls == 1:
+                raise ValueError("model failed")
+            return super().encode(texts, normalize)
+
+    embedder = batching_embedder.BatchingEmbedder(FlakyGenerator(), max_wait_ms=1.0)
+    try:
+        with pytest.raises(ValueError):
+            embedder.generate_embedding("first")
+        assert embedder.generate_embedding("second").ndim == 1
+    finally:
+        embedder.close()
+
+def test_all_cancelled_batch_is_skipped(gated):
+    generator, embedder = gated
+    embedder.submit("first")
+    assert generator.entered.wait(5)
+    futures = [embedder.submit(f"abandoned {i}") for i in range(3)]
+    assert all(future.cancel() for future in futures)
+    generator.release.set()
+
+    assert embedder.generate_embedding("after").ndim == 1
+    assert embedder.metrics()["requests"] == 2
@@ -0,0 +1,63 @@
+import random
+import pytest
+from app.chunking import chunk_spans, chunk_text, iter_chunk_spans, iter_chunks
+
+def _text(seed=0, sentences=400):
+    rng = random.Random(seed)
+    words = ["moon", "river", "ash", "ember", "lantern", "harbor", "willow", "salt", "wind", "orchard"]
+    parts = []
+    for _ in range(sentences):
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(3, 15)))
+        parts.append(sentence.capitalize() + rng.choice([".", "!", "?", ",", ""]))
+    return ("  " if seed % 2 else "\n").join(parts)
+
+def _windows(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+@pytest.mark.parametrize("unit,size,overlap", [("chars", 300, 50), ("chars", 120, 0), ("tokens", 40, 8)])
+def test_offsets_round_trip(unit, size, overlap):
+    text = _text()
+    chunks = chunk_spans(text, size, overlap, unit=unit)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert text[chunk.start:chunk.end] == chunk.text
+    starts = [chunk.start for chunk in chunks]
+    assert starts == sorted(set(starts))
+    assert chunks[-1].end == len(text.rstrip())
+
+@pytest.mark.parametrize("unit,size,overlap", [("chars", 300, 50), ("tokens", 40, 8)])
+@pytest.mark.parametrize("window", [7, 256, 100000])
+def test_streaming_matches_whole_text(unit, size, overlap, window):
+    text = _text(seed=1)
+    whole = chunk_spans(text, size, overlap, unit=unit)
+    assert list(iter_chunk_spans(_windows(text, window), size, overlap, unit=unit)) == whole
+    assert list(iter_chunks(_windows(text, window), size, overlap, unit=unit)) == [c.text for c in whole]
+
+def test_chunks_snap_to_sentence_ends():
+    text = "First sentence here. " * 40
+    for chunk in chunk_text(text, 200, 20)[:-1]:
+        assert chunk.endswith(".")
+
+def test_short_text_comes_back_whole():
+    assert chunk_text("  short text  ", 100, 10) == ["  short text  "]
+    assert chunk_spans("  short text  ", 100, 10)[0].end == len("  short text  ")
+
+def test_whitespace_only_text_yields_no_chunks():
+    assert chunk_text("   \n\t ", 100, 10) == []
+    assert chunk_text("", 100, 10) == []
+    assert list(iter_chunks(["  ", "\n"], 100, 10)) == []
+
+@pytest.mark.parametrize("overlap", [199, 200, 500])
+def test_overlap_not_smaller_than_size_terminates(overlap):
+    text = _text(seed=2)
+    chunks = chunk_spans(text, 200, overlap)
+    assert all(later.start >= earlier.start for earlier, later in zip(chunks, chunks[1:]))
+    assert chunks[-1].end == len(text.rstrip())
+
+def test_invalid_sizes_raise():
+    with pytest.raises(ValueError):
+        chunk_text("text", 0, 0)
+    with pytest.raises(ValueError):
+        chunk_text("text", 10, -1)
+    with pytest.raises(ValueError):
+        chunk_text("text", 10, 1, unit="lines")
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from app.rag.context import ContextBuilder, context_ids, merge_adjacent, mmr
+
+TEXT = "The moon over the river keeps its silver counsel while ash and ember settle in the hearth."
+
+def _chunk(doc_id, start, end, distance=0.5, **metadata):
+    metadata = {"source": "poems.json", "record_index": 0, **metadata}
+    return {"id": doc_id, "document": TEXT[start:end], "distance": distance,
+            "metadata": dict(metadata, char_start=start, char_end=end)}
+
+def test_mmr_with_lambda_one_ranks_by_relevance():
+    embeddings = np.array([[0.0, 1.0], [1.0, 0.1], [1.0, 0.0]], dtype=np.float32)
+    assert mmr(np.array([1.0, 0.0]), embeddings, 3, mmr_lambda=1.0) == [2, 1, 0]
+
+def test_mmr_passes_over_a_near_copy_for_a_diverse_pick():
+    embeddings = np.array([[1.0, 0.0], [1.0, 0.01], [0.6, 0.8]], dtype=np.float32)
+    assert mmr(np.array([1.0, 0.2]), embeddings, 2, mmr_lambda=0.5) == [1, 2]
+    assert sorted(mmr(np.array([1.0, 0.2]), embeddings, 5)) == [0, 1, 2]
+
+def test_overlapping_chunks_of_one_record_merge():
+    merged = merge_adjacent([_chunk("b", 30, 70, 0.2), _chunk("a", 0, 40, 0.4), _chunk("c", 75, 90)])
+    assert [result["document"] for result in merged] == [TEXT[0:70], TEXT[75:90]]
+    assert merged[0]["ids"] == ["a", "b"]
+    assert merged[0]["distance"] == 0.2
+    assert (merged[0]["metadata"]["char_start"], merged[0]["metadata"]["char_end"]) == (0, 70)
+    assert context_ids(merged) == ["a", "b", "c"]
+
+def test_touching_chunks_merge():
+    merged = merge_adjacent([_chunk("a", 0, 40), _chunk("b", 40, 70)])
+    assert [result["document"] for result in merged] == [TEXT[0:70]]
+
+@pytest.mark.parametrize("first,second", [
+    ({"record_index": 0}, {"record_index": 1}),
+    ({"source": "a.json"}, {"source": "b.json"}),
+])
+def test_distinct_records_never_merge(first, second):
+    merged = merge_adjacent([_chunk("a", 0, 40, **first), _chunk("b", 30, 70, **second)])
+    assert [result["id"] for result in merged] == ["a", "b"]
+    assert [result["document"] for result in merged] == [TEXT[0:40], TEXT[30:70]]
+
+def test_chunks_without_a_source_never_merge():
+    # Metadata alike apart from offsets says nothing about being one text
+    results = [_chunk("a", 0, 40), _chunk("b", 30, 70)]
+    for result in results:
+        result["metadata"] = {key: value for key, value in result["metadata"].items()
+                              if key not in ("source", "record_index")}
+    assert [result["id"] for result in merge_adjacent(results)] == ["a", "b"]
+
+def test_offsets_that_do_not_match_the_text_never_merge():
+    results = [_chunk("a", 0, 40), _chunk("b", 30, 70)]
+    results[1]["document"] += " trailing"
+    assert len(merge_adjacent(results)) == 2
+
+def _builder_inputs(count=4, length=400):
+    rng = np.random.default_rng(0)
+    candidates = [{"id": f"doc_{i}", "document": chr(ord("a") + i) * length, "distance": i * 0.1,
+                   "metadata": {"source": f"{i}.txt"}} for i in range(count)]
+    embeddings = {candidate["id"]: rng.standard_normal(8).astype(np.float32) for candidate in candidates}
+    query = embeddings["doc_0"]
+    return query, candidates, embeddings
+
+def test_build_packs_results_into_the_token_budget():
+    query, candidates, embeddings = _builder_inputs()
+    results = ContextBuilder(token_budget=250, mmr_lambda=1.0).build(query, candidates, embeddings, 4)
+    assert [result["id"] for result in results][0] == "doc_0"
+    assert len(results) == 2
+    assert sum(len(result["document"]) for result in results) <= 250 * 4
+    assert results[0]["similarity"] == pytest.approx(1.0)
+
+def test_build_cuts_down_a_first_result_over_the_budget():
+    query, candidates, embeddings = _builder_inputs(length=2000)
+    results = ContextBuilder(token_budget=100).build(query, candidates, embeddings, 2)
+    assert [len(result["document"]) for result in results] == [400]
+
+def test_build_leaves_out_candidates_without_an_embedding():
+    query, candidates, embeddings = _builder_inputs()
+    del embeddings["doc_0"]
+    results = ContextBuilder().build(query, candidates, embeddings, 4)
+    assert "doc_0" not in {result["id"] for result in results}
+    assert ContextBuilder().build(query, candidates, {}, 4) == []
@@ -0,0 +1,182 @@
+import os
+import json
+from types import SimpleNamespace
+import pytest
+from app import ingest_manifest
+
+def _write_records(path, texts):
+    path.write_text(json.dumps([{"text": text, "author": "test"} for text in texts]))
+
+def test_touched_file_is_not_rehashed_on_later_runs(make_ingestion, tmp_path, monkeypatch):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    path = corpus / "poems.json"
+    _write_records(path, ["The moon over the river.", "Ash and ember in the hearth."])
+    ingestion = make_ingestion()
+    assert ingestion.process_nltk_files(str(corpus))["processed_files"] == 1
+
+    stat = path.stat()
+    os.utime(path, (stat.st_atime + 10, stat.st_mtime + 10))
+    calls = []
+    real = ingest_manifest.hash_file
+    monkeypatch.setattr(ingest_manifest, "hash_file", lambda *args: calls.append(args) or real(*args))
+
+    assert ingestion.process_nltk_files(str(corpus))["skipped_files"] == 1
+    assert len(calls) == 1
+    assert ingestion.process_nltk_files(str(corpus))["skipped_files"] == 1
+    assert len(calls) == 1
+
+POEMS = [
+    "The moon over the river keeps its silver counsel.",
+    "Ash and ember settle in the winter hearth.",
+    "A lantern swings above the harbor wall at dusk.",
+    "Willow roots drink slowly from the meadow stream.",
+    "Salt wind carries feathers across the orchard glass.",
+]
+
+def test_failed_file_leaves_no_chunks_behind(make_ingestion, engine, tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    _write_records(corpus / "poems.json", POEMS)
+    ingestion = make_ingestion(batch_size=2)
+
+    # The first batch of the file is written, the second fails
+    engine.fail_adds_after = 1
+    stats = ingestion.process_nltk_files(str(corpus))
+    assert stats["failed_files"] == 1
+    assert engine.vector_store.count() == 0
+
+    engine.fail_adds_after = None
+    stats = ingestion.process_nltk_files(str(corpus))
+    assert stats["processed_files"] == 1
+    assert engine.vector_store.count() == len(POEMS)
+
+MESSAGE = ("Deploy notice: the ingestion service restarts tonight so the new vector index can be "
+           "rebuilt from the stored records, queries during the window fall back to exact search "
+           "and may be slower, uploads are queued and applied once the writer is back, and nothing "
+           "needs to be resubmitted by anyone who is currently running a long batch import job. "
+           "Questions go to the platform channel as usual and the usual on call rota applies. "
+           "The dashboards will show a gap of a few minutes while the metrics exporter restarts, "
+           "which is expected, and alerts for the search latency panels are muted until morning. ")
+
+def _message(timestamp):
+    return f"[{timestamp}] " + MESSAGE
+
+def test_dedup_is_off_by_default_and_stores_near_duplicates(make_ingestion, engine, tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    _write_records(corpus / "monday.json", [_message("2024-05-06 09:00")])
+    _write_records(corpus / "tuesday.json", [_message("2024-05-07 09:00")])
+    ingestion = make_ingestion()
+    assert ingestion.dedup == "off"
+
+    stats = ingestion.process_nltk_files(str(corpus))
+    assert stats["duplicates_dropped"] == 0
+    assert engine.vector_store.count() == 2
+
+def test_exact_reingest_adds_nothing(make_ingestion, engine, tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    _write_records(corpus / "poems.json", POEMS)
+    for dedup in ("off", "merge"):
+        ingestion = make_ingestion(dedup=dedup)
+        ingestion.process_nltk_files(str(corpus), incremental=False)
+        assert engine.vector_store.count() == len(POEMS)
+
+def test_merge_drops_near_duplicate_but_keeps_it_for_both_files(make_ingestion, engine, tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    _write_records(corpus / "monday.json", [_message("2024-05-06 09:00")])
+    ingestion = make_ingestion(dedup="merge")
+    ingestion.process_nltk_files(str(corpus))
+
+    # The same message with a new timestamp is dropped in favour of the stored one
+    _write_records(corpus / "tuesday.json", [_message("2024-05-07 09:00")])
+    stats = ingestion.process_nltk_files(str(corpus))
+    assert stats["duplicates_dropped"] == 1
+    assert engine.vector_store.count() == 1
+
+    # Tuesday's file now references Monday's chunk, so it outlives Monday's file
+    (corpus / "monday.json").unlink()
+    stats = ingestion.process_nltk_files(str(corpus))
+    assert stats["removed_files"] == 1
+    assert engine.vector_store.count() == 1
+    (corpus / "tuesday.json").unlink()
+    ingestion.process_nltk_files(str(corpus))
+    assert engine.vector_store.count() == 0
+
+def test_skip_drops_near_duplicate_without_keeping_a_reference(make_ingestion, engine, tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    _write_records(corpus / "monday.json", [_message("2024-05-06 09:00")])
+    _write_records(corpus / "tuesday.json", [_message("2024-05-07 09:00")])
+    ingestion = make_ingestion(dedup="skip")
+    assert ingestion.process_nltk_files(str(corpus))["duplicates_dropped"] == 1
+    assert engine.vector_store.count() == 1
+
+    (corpus / "monday.json").unlink()
+    ingestion.process_nltk_files(str(corpus))
+    assert engine.vector_store.count() == 0
+
+class _CrashingPool:
+    """Runs worker tasks inline; the pool breaks on the file named ``crash.json``"""
+
+    def __init__(self, *args, **kwargs):
+        self.broken = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, file_path, *args):
+        from concurrent.futures import Future
+        from concurrent.futures.process import BrokenProcessPool
+        future = Future()
+        self.broken = self.broken or file_path.name == "crash.json"
+        if self.broken:
+            future.set_exception(BrokenProcessPool("A process in the process pool was terminated abruptly"))
+        else:
+            future.set_result(fn(file_path, *args))
+        return future
+
+def test_worker_crash_keeps_finished_files(make_ingestion, engine, tmp_path, monkeypatch):
+    data_ingestion = pytest.importorskip("app.data_ingestion")
+    monkeypatch.setattr(data_ingestion, "ProcessPoolExecutor", _CrashingPool)
+    monkeypatch.setattr(data_ingestion, "_worker_embedder", engine.embedding_generator)
+    engine.embedding_generator.model_name = "stub"
+    engine.embedding_generator.cache = SimpleNamespace(cache_dir=None)
+
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    _write_records(corpus / "a.json", POEMS[:2])
+    _write_records(corpus / "crash.json", POEMS[2:4])
+    _write_records(corpus / "z.json", POEMS[4:])
+    ingestion = make_ingestion(workers=2)
+
+    stats = ingestion.process_nltk_files(str(corpus))
+    assert stats["processed_files"] == 1
+    assert sorted(stats["errors"]) == ["crash.json", "z.json"]
+    assert engine.vector_store.count() == 2
+
+    # Only the files the crash interrupted are ingested again
+    stats = ingestion.process_nltk_files(str(corpus), workers=1)
+    assert stats["skipped_files"] == 1
+    assert stats["processed_files"] == 2
+    assert engine.vector_store.count() == len(POEMS)
+
+def test_json_chunks_point_back_at_their_record(make_ingestion, engine, tmp_path):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    long_poem = " ".join(POEMS * 10)
+    _write_records(corpus / "poems.json", [POEMS[0], long_poem])
+    make_ingestion(chunk_size=200, chunk_overlap=20).process_nltk_files(str(corpus))
+
+    stored = engine.vector_store.get(engine.vector_store.ids(), ["documents", "metadatas"])
+    records = [POEMS[0], long_poem]
+    assert len(stored["ids"]) > 2
+    for document, metadata in zip(stored["documents"], stored["metadatas"]):
+        assert (metadata["source"], metadata["author"]) == ("poems.json", "test")
+        text = records[metadata["record_index"]]
+        assert text[metadata["char_start"]:metadata["char_end"]] == document
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from app.rag.embedding_cache import EmbeddingCache, text_hash
+
+def _vectors(count, dim=4):
+    return np.arange(count * dim, dtype=np.float32).reshape(count, dim)
+
+def test_hits_and_misses_are_counted():
+    cache = EmbeddingCache("model")
+    keys = [text_hash("a"), text_hash("b")]
+    assert cache.get_many(keys) == [None, None]
+    cache.put_many(keys, _vectors(2))
+
+    found = cache.get_many(keys + [text_hash("c")])
+    assert np.array_equal(found[1], _vectors(2)[1])
+    assert found[2] is None
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"]) == (2, 3)
+    assert stats["hit_rate"] == pytest.approx(2 / 5)
+
+def test_least_recently_used_entry_is_evicted():
+    cache = EmbeddingCache("model", max_size=2)
+    cache.put_many(["a", "b"], _vectors(2))
+    cache.get_many(["a"])
+    cache.put_many(["c"], _vectors(1))
+    assert [vector is not None for vector in cache.get_many(["a", "b", "c"])] == [True, False, True]
+    assert cache.stats()["memory_entries"] == 2
+
+def test_cached_vectors_cannot_be_modified():
+    cache = EmbeddingCache("model")
+    cache.put_many(["a"], _vectors(1))
+    with pytest.raises(ValueError):
+        cache.get_many(["a"])[0][0] = 1.0
+
+def test_disk_tier_persists_across_instances(tmp_path):
+    EmbeddingCache("model", cache_dir=str(tmp_path)).put_many(["a", "b"], _vectors(2))
+
+    cache = EmbeddingCache("model", cache_dir=str(tmp_path))
+    found = cache.get_many(["a", "b", "c"])
+    assert np.array_equal(np.stack(found[:2]), _vectors(2))
+    assert found[2] is None
+    assert (cache.stats()["disk_hits"], cache.stats()["misses"]) == (2, 1)
+
+    # Disk hits are promoted to memory
+    cache.get_many(["a"])
+    assert cache.stats()["memory_hits"] == 1
+
+def test_entries_are_keyed_by_model_name(tmp_path):
+    EmbeddingCache("model-a", cache_dir=str(tmp_path)).put_many(["a"], _vectors(1))
+    assert EmbeddingCache("model-b", cache_dir=str(tmp_path)).get_many(["a"]) == [None]
+    assert EmbeddingCache("model-a", cache_dir=str(tmp_path)).get_many(["a"])[0] is not None
+
+def test_generator_encodes_only_uncached_texts(tmp_path, monkeypatch):
+    embeddings = pytest.importorskip("app.rag.embeddings")
+    encoded = []
+
+    class CountingModel:
+        def encode(self, texts):
+            encoded.extend(texts)
+            return _vectors(len(texts))
+
+    monkeypatch.setattr(embeddings, "load_model", lambda model_name: CountingModel())
+    generator = embeddings.EmbeddingGenerator("model", cache_dir=str(tmp_path))
+    first = generator.encode(["a", "b", "a"])
+    assert encoded == ["a", "b"]
+    assert np.array_equal(first[0], first[2])
+
+    # A fresh generator finds earlier texts on disk
+    generator = embeddings.EmbeddingGenerator("model", cache_dir=str(tmp_path))
+    assert np.array_equal(generator.encode(["b", "c"])[0], first[1])
+    assert encoded == ["a", "b", "c"]
@@ -0,0 +1,51 @@
+import pytest
+from app.rag.filters import matches_filter, normalize_filter
+
+def test_several_fields_are_combined_with_and():
+    assert normalize_filter({"author": "Blake", "year": {"$gte": 1790}}) == {
+        "$and": [{"author": {"$eq": "Blake"}}, {"year": {"$gte": 1790}}]
+    }
+
+def test_single_clause_is_unwrapped():
+    assert normalize_filter({"$or": [{"author": "Blake"}]}) == {"author": {"$eq": "Blake"}}
+    assert normalize_filter({"$and": [{}, {"year": 1800}]}) == {"year": {"$eq": 1800}}
+
+def test_empty_filter_is_none():
+    assert normalize_filter(None) is None
+    assert normalize_filter({}) is None
+
+@pytest.mark.parametrize("where", [
+    ["author"],
+    {"$not": {"author": "Blake"}},
+    {"author": {"$regex": "B.*"}},
+    {"year": {"$gt": 1, "$lt": 2}},
+    {"author": {"$in": "Blake"}},
+    {"$or": []},
+])
+def test_malformed_filters_raise(where):
+    with pytest.raises(ValueError):
+        normalize_filter(where)
+
+POEM = {"author": "Blake", "year": 1794}
+
+@pytest.mark.parametrize("where,expected", [
+    ({"author": "Blake"}, True),
+    ({"author": {"$ne": "Keats"}}, True),
+    ({"year": {"$gt": 1794}}, False),
+    ({"year": {"$gte": 1794}}, True),
+    ({"year": {"$lt": 1800}}, True),
+    ({"year": {"$lte": 1700}}, False),
+    ({"author": {"$in": ["Blake", "Keats"]}}, True),
+    ({"author": {"$nin": ["Blake", "Keats"]}}, False),
+    ({"$or": [{"author": "Keats"}, {"year": 1794}]}, True),
+    ({"author": "Blake", "year": {"$lt": 1700}}, False),
+    # Mismatched types never match rather than raising
+    ({"author": {"$gt": 3}}, False),
+])
+def test_operators(where, expected):
+    assert matches_filter(POEM, normalize_filter(where)) is expected
+
+@pytest.mark.parametrize("operator,operand", [("$eq", "x"), ("$ne", "x"), ("$nin", ["x"]), ("$lt", 5)])
+def test_missing_field_never_matches(operator, operand):
+    # As in Chroma, so both backends return the same documents
+    assert matches_filter(POEM, normalize_filter({"title": {operator: operand}})) is False
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+graph = pytest.importorskip("app.rag.visualization.graph")
+
+def _unit_embeddings(n=120, dim=12, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def _brute_force_edges(embeddings, k, threshold=None):
+    similarities = embeddings @ embeddings.T
+    np.fill_diagonal(similarities, -np.inf)
+    edges = set()
+    for i, row in enumerate(similarities):
+        for j in np.argsort(-row)[:k]:
+            if threshold is None or row[j] > threshold:
+                edges.add((min(i, int(j)), max(i, int(j))))
+    return sorted(edges)
+
+@pytest.mark.parametrize("k,threshold", [(1, None), (5, None), (5, 0.2)])
+def test_exact_knn_edges_match_brute_force(k, threshold):
+    embeddings = _unit_embeddings()
+    sources, targets, weights = graph.knn_edges(embeddings, k, threshold)
+    edges = list(zip(sources.tolist(), targets.tolist()))
+    assert edges == _brute_force_edges(embeddings, k, threshold)
+    assert np.allclose(weights, [float(embeddings[i] @ embeddings[j]) for i, j in edges], atol=1e-6)
+
+def test_hnsw_knn_edges_nearly_match_brute_force(monkeypatch):
+    pytest.importorskip("hnswlib")
+    monkeypatch.setattr(graph, "EXACT_KNN_LIMIT", 100)
+    embeddings = _unit_embeddings(n=500)
+    sources, targets, _ = graph.knn_edges(embeddings, 5)
+    expected = set(_brute_force_edges(embeddings, 5))
+    found = set(zip(sources.tolist(), targets.tolist()))
+    assert all(source < target for source, target in found)
+    assert len(found & expected) / len(expected) >= 0.95
+
+def test_k_is_capped_by_the_number_of_points():
+    sources, _, _ = graph.knn_edges(_unit_embeddings(n=3), 10)
+    assert len(sources) == 3
+    assert len(graph.knn_edges(_unit_embeddings(n=1), 10)[0]) == 0
+
+@pytest.mark.parametrize("spring_limit", [1000, 10])
+def test_layout_places_every_node(monkeypatch, spring_limit):
+    monkeypatch.setattr(graph, "SPRING_LAYOUT_LIMIT", spring_limit)
+    embeddings = _unit_embeddings(n=60)
+    pos = graph.layout(embeddings, *graph.knn_edges(embeddings, 3))
+    assert pos.shape == (60, 2)
+    assert np.isfinite(pos).all()
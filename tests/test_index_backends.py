@@ -0,0 +1,173 @@
+import json
+import numpy as np
+import pytest
+from app.rag.index_backends import NumpyBackend
+
+DIM = 16
+
+def _records(start, stop):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((stop, DIM)).astype(np.float32)[start:stop]
+    ids = [f"doc_{i}" for i in range(start, stop)]
+    return ids, [f"text {i}" for i in range(start, stop)], vectors, [{"n": i} for i in range(start, stop)]
+
+def test_query_matches_exact_search(tmp_path):
+    backend = NumpyBackend(str(tmp_path))
+    ids, documents, vectors, metadatas = _records(0, 50)
+    backend.add(ids, documents, vectors, metadatas)
+    results = backend.query(vectors[7], 3)
+    assert results["ids"][0][0] == "doc_7"
+    assert results["documents"][0][0] == "text 7"
+    assert results["distances"][0][0] < 1e-4
+
+class _InterleavingLock:
+    """Wraps the backend lock and runs ``action`` once, right after the first release"""
+
+    def __init__(self, lock, action):
+        self.lock = lock
+        self.action = action
+
+    def __enter__(self):
+        self.lock.acquire()
+
+    def __exit__(self, *exc_info):
+        self.lock.release()
+        action, self.action = self.action, None
+        if action is not None:
+            action()
+
+def test_query_is_not_torn_by_a_delete_between_lock_sections(tmp_path):
+    backend = NumpyBackend(str(tmp_path))
+    ids, documents, vectors, metadatas = _records(0, 50)
+    backend.add(ids, documents, vectors, metadatas)
+
+    # Deleting low rows shifts every later row down while the query is in flight
+    backend._lock = _InterleavingLock(backend._lock, lambda: backend.delete(ids[:20]))
+    results = backend.query(vectors[30], 1)
+    assert (results["ids"][0][0], results["documents"][0][0]) == ("doc_30", "text 30")
+    assert backend.count() == 30
+
+def test_filtered_query_only_returns_matching_rows(tmp_path):
+    backend = NumpyBackend(str(tmp_path))
+    ids, documents, vectors, metadatas = _records(0, 50)
+    backend.add(ids, documents, vectors, metadatas)
+    results = backend.query(vectors[7], 5, where={"n": {"$gte": 40}})
+    assert results["ids"][0] and all(metadata["n"] >= 40 for metadata in results["metadatas"][0])
+
+def _writer_and_reader(tmp_path, size, threshold=100):
+    writer = NumpyBackend(str(tmp_path), ann_threshold=threshold)
+    ids, documents, vectors, metadatas = _records(0, size)
+    writer.add(ids, documents, vectors, metadatas)
+    return writer, NumpyBackend(str(tmp_path), ann_threshold=threshold, read_only=True), vectors
+
+def test_writer_saves_graph_that_readers_load(tmp_path):
+    pytest.importorskip("hnswlib")
+    writer, reader, vectors = _writer_and_reader(tmp_path, 200)
+    assert (tmp_path / "hnsw.bin").exists()
+    assert json.loads((tmp_path / "meta.json").read_text())["hnsw_rows"] == 200
+
+    results = reader.query(vectors[42], 1)
+    assert results["ids"][0] == ["doc_42"]
+    assert reader.stats()["search"] == "hnsw"
+    assert reader.stats()["hnsw_rows"] == 200
+
+def test_reader_searches_rows_past_the_saved_graph_exactly(tmp_path):
+    pytest.importorskip("hnswlib")
+    writer, reader, _ = _writer_and_reader(tmp_path, 200)
+    reader.query(np.zeros(DIM, np.float32), 1)
+    saved = (tmp_path / "hnsw.bin").stat().st_mtime_ns
+
+    # Too few new rows to save the graph again
+    ids, documents, vectors, metadatas = _records(200, 203)
+    writer.add(ids, documents, vectors, metadatas)
+    assert (tmp_path / "hnsw.bin").stat().st_mtime_ns == saved
+    assert reader.refresh() == set(ids)
+
+    assert reader.query(vectors[1], 1)["ids"][0] == ["doc_201"]
+    assert reader.query(vectors[1], 3, where={"n": {"$gte": 150}})["ids"][0][0] == "doc_201"
+    assert reader.stats()["hnsw_rows"] == 200
+
+def test_reader_searches_exactly_until_a_graph_is_saved(tmp_path):
+    pytest.importorskip("hnswlib")
+    writer = NumpyBackend(str(tmp_path), ann_threshold=10000)
+    ids, documents, vectors, metadatas = _records(0, 200)
+    writer.add(ids, documents, vectors, metadatas)
+    reader = NumpyBackend(str(tmp_path), ann_threshold=100, read_only=True)
+    assert reader.query(vectors[42], 1)["ids"][0] == ["doc_42"]
+    assert reader.stats()["search"] == "exact"
+    assert not (tmp_path / "hnsw.bin").exists()
+
+def test_graph_is_rebuilt_after_delete(tmp_path):
+    pytest.importorskip("hnswlib")
+    writer, reader, vectors = _writer_and_reader(tmp_path, 200)
+    reader.query(vectors[0], 1)
+    writer.delete([f"doc_{i}" for i in range(50)])
+    assert json.loads((tmp_path / "meta.json").read_text())["hnsw_rows"] == 150
+
+    reader.refresh()
+    results = reader.query(vectors[120], 1)
+    assert (results["ids"][0][0], results["documents"][0][0]) == ("doc_120", "text 120")
+    assert reader.stats()["hnsw_rows"] == 150
+
+def test_get_returns_only_included_fields(tmp_path):
+    backend = NumpyBackend(str(tmp_path))
+    ids, documents, vectors, metadatas = _records(0, 10)
+    backend.add(ids, documents, vectors, metadatas)
+    found = backend.get(["doc_3", "missing", "doc_1"], include=["metadatas"])
+    assert found == {"ids": ["doc_3", "doc_1"], "metadatas": [{"n": 3}, {"n": 1}]}
+    assert np.array_equal(backend.get(["doc_3"])["embeddings"][0], vectors[3])
+
+def _recall(backend, exact, queries, k=10):
+    found = backend.query(queries, k)["ids"]
+    truth = exact.query(queries, k)["ids"]
+    return np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+
+@pytest.mark.parametrize("dtype,floor", [("float16", 0.99), ("int8", 0.8)])
+def test_compressed_search_recall_against_exact(tmp_path, dtype, floor):
+    ids, documents, vectors, metadatas = _records(0, 2000)
+    exact = NumpyBackend(str(tmp_path / "exact"))
+    exact.add(ids, documents, vectors, metadatas)
+    queries = np.random.default_rng(1).standard_normal((50, DIM)).astype(np.float32)
+
+    plain = NumpyBackend(str(tmp_path / dtype), dtype=dtype, rerank=0)
+    plain.add(ids, documents, vectors, metadatas)
+    assert _recall(plain, exact, queries) >= floor
+
+    # Re-scoring candidates against the float32 vectors restores exact results
+    reranked = NumpyBackend(str(tmp_path / dtype), dtype=dtype, rerank=4)
+    assert _recall(reranked, exact, queries) == 1.0
+    results = reranked.query(vectors[7], 1)
+    assert results["ids"][0] == ["doc_7"] and results["distances"][0][0] < 1e-4
+
+def test_int8_store_requantizes_when_new_vectors_are_larger(tmp_path):
+    backend = NumpyBackend(str(tmp_path), dtype="int8")
+    ids, documents, vectors, metadatas = _records(0, 100)
+    backend.add(ids, documents, vectors, metadatas)
+    scale = backend._scale.copy()
+
+    ids, documents, vectors, metadatas = _records(100, 150)
+    backend.add(ids, documents, vectors * 10, metadatas)
+    assert np.all(backend._scale >= scale) and np.any(backend._scale > scale)
+    assert backend.query(vectors[5] * 10, 1)["ids"][0] == ["doc_105"]
+
+    # The rewritten codes on disk match the new scale
+    reopened = NumpyBackend(str(tmp_path), dtype="int8")
+    assert np.array_equal(reopened._scale, backend._scale)
+    assert np.array_equal(np.asarray(reopened._matrix), np.asarray(backend._matrix))
+    assert reopened.query(vectors[5] * 10, 1)["ids"][0] == ["doc_105"]
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_compressed_reader_refresh_after_delete(tmp_path, dtype):
+    writer = NumpyBackend(str(tmp_path), dtype=dtype)
+    ids, documents, vectors, metadatas = _records(0, 100)
+    writer.add(ids, documents, vectors, metadatas)
+    reader = NumpyBackend(str(tmp_path), dtype=dtype, read_only=True)
+    assert reader.query(vectors[60], 1)["ids"][0] == ["doc_60"]
+
+    writer.delete(ids[:50])
+    assert reader.refresh() >= set(ids[:50])
+    assert reader.count() == 50
+    results = reader.query(vectors[60], 3)
+    assert (results["ids"][0][0], results["documents"][0][0]) == ("doc_60", "text 60")
+    assert not set(results["ids"][0]) & set(ids[:50])
+    assert reader.query(vectors[10], 5, where={"n": {"$lt": 50}})["ids"][0] == []
@@ -0,0 +1,97 @@
+import threading
+import pytest
+from app.ingest_jobs import IngestJob, IngestJobManager
+
+def _stats(**overrides):
+    stats = {"files_total": 2, "processed_files": 2, "failed_files": 0, "skipped_files": 0,
+             "total_chunks": 10, "duplicates_dropped": 0, "errors": {}, "cancelled": False}
+    stats.update(overrides)
+    return stats
+
+class GatedRun:
+    """Ingestion stand-in that waits to be released, honouring cancel"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, progress=None, cancel=None, **params):
+        self.started.set()
+        progress(_stats(processed_files=1))
+        self.release.wait(5)
+        return _stats(cancelled=cancel.is_set())
+
+@pytest.fixture
+def manager():
+    managers = []
+
+    def make(run, **kwargs):
+        managers.append(IngestJobManager(run, **kwargs))
+        return managers[-1]
+    yield make
+    for m in managers:
+        m.shutdown()
+
+def test_job_completes_with_stats(manager):
+    jobs = manager(lambda progress=None, cancel=None, **params: _stats())
+    job = jobs.submit(directory_path="/data")
+    job.future.result(5)
+    info = jobs.get(job.id).to_dict()
+    assert info["status"] == "completed"
+    assert info["stats"]["total_chunks"] == 10
+    assert info["progress"]["files_done"] == 2
+    assert info["finished_at"] is not None
+
+def test_failed_run_records_error(manager):
+    def run(progress=None, cancel=None, **params):
+        raise OSError("disk gone")
+    jobs = manager(run)
+    job = jobs.submit(directory_path="/data")
+    job.future.result(5)
+    assert job.status == "failed"
+    assert job.error == "disk gone"
+
+def test_cancel_queued_job_never_runs(manager):
+    gated = GatedRun()
+    jobs = manager(gated, max_running=1)
+    first = jobs.submit(directory_path="/a")
+    assert gated.started.wait(5)
+    queued = jobs.submit(directory_path="/b")
+    assert jobs.cancel(queued.id).status == "cancelled"
+    gated.release.set()
+    first.future.result(5)
+    assert queued.started_at is None
+    assert queued.finished_at is not None
+
+def test_cancel_running_job_stops_it(manager):
+    gated = GatedRun()
+    jobs = manager(gated)
+    job = jobs.submit(directory_path="/a")
+    assert gated.started.wait(5)
+    assert jobs.cancel(job.id).status == "cancelling"
+    gated.release.set()
+    job.future.result(5)
+    assert job.status == "cancelled"
+    assert job.progress["processed_files"] == 2
+
+def test_cancel_at_start_still_finishes_the_job(manager):
+    ran = []
+    jobs = manager(lambda **params: ran.append(params) or _stats())
+    # cancel() landed after the executor picked the job up but before it
+    # ran: future.cancel() failed, so only the event is set
+    job = IngestJob({"directory_path": "/a"})
+    job.cancel_event.set()
+    jobs._execute(job)
+    assert ran == []
+    assert job.status == "cancelled"
+    assert job.finished_at is not None
+
+def test_finished_jobs_beyond_history_are_pruned(manager):
+    jobs = manager(lambda progress=None, cancel=None, **params: _stats(), history=2)
+    submitted = []
+    for i in range(4):
+        submitted.append(jobs.submit(directory_path=f"/{i}"))
+        submitted[-1].future.result(5)
+    remaining = [job.id for job in jobs.list()]
+    assert submitted[0].id not in remaining
+    assert submitted[-1].id in remaining
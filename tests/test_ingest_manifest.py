@@ -0,0 +1,80 @@
+import os
+import json
+from app import ingest_manifest
+from app.ingest_manifest import IngestManifest
+
+def _touch(path, seconds=10):
+    stat = path.stat()
+    os.utime(path, (stat.st_atime + seconds, stat.st_mtime + seconds))
+    return path.stat().st_mtime
+
+def _counting_hash(monkeypatch):
+    calls = []
+    real = ingest_manifest.hash_file
+
+    def counting(file_path, *args):
+        calls.append(file_path)
+        return real(file_path, *args)
+    monkeypatch.setattr(ingest_manifest, "hash_file", counting)
+    return calls
+
+def test_unchanged_size_and_mtime_skip_hashing(tmp_path, monkeypatch):
+    path = tmp_path / "a.txt"
+    path.write_text("hello")
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    manifest.update(path, path.stat().st_size, path.stat().st_mtime, ["doc_1"])
+    calls = _counting_hash(monkeypatch)
+    assert manifest.is_unchanged(path, path.stat().st_size, path.stat().st_mtime)
+    assert calls == []
+
+def test_touched_file_is_hashed_once_across_a_reread(tmp_path, monkeypatch):
+    path = tmp_path / "a.txt"
+    path.write_text("hello")
+    manifest_path = str(tmp_path / "manifest.json")
+    manifest = IngestManifest(manifest_path)
+    manifest.update(path, path.stat().st_size, path.stat().st_mtime, ["doc_1"])
+    manifest.save()
+
+    mtime = _touch(path)
+    calls = _counting_hash(monkeypatch)
+    checked = IngestManifest(manifest_path)
+    assert checked.is_unchanged(path, path.stat().st_size, mtime)
+    assert len(calls) == 1
+
+    # As DataIngestion does: re-read under the lock, merge, save
+    reread = IngestManifest(manifest_path)
+    reread.merge_refreshed(checked)
+    reread.save()
+
+    assert IngestManifest(manifest_path).is_unchanged(path, path.stat().st_size, mtime)
+    assert len(calls) == 1
+
+def test_merge_refreshed_skips_entries_changed_meanwhile(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("hello")
+    manifest_path = str(tmp_path / "manifest.json")
+    manifest = IngestManifest(manifest_path)
+    manifest.update(path, path.stat().st_size, path.stat().st_mtime, ["doc_1"])
+    manifest.save()
+
+    mtime = _touch(path)
+    checked = IngestManifest(manifest_path)
+    assert checked.is_unchanged(path, path.stat().st_size, mtime)
+
+    # Another run re-ingested new content before this one saved
+    path.write_text("changed")
+    other = IngestManifest(manifest_path)
+    other.update(path, path.stat().st_size, path.stat().st_mtime, ["doc_2"])
+    other.save()
+
+    reread = IngestManifest(manifest_path)
+    reread.merge_refreshed(checked)
+    assert reread.get(path)["mtime"] == path.stat().st_mtime
+    assert reread.get(path)["chunk_ids"] == ["doc_2"]
+
+def test_unreadable_manifest_starts_empty(tmp_path):
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text("{not json")
+    assert IngestManifest(str(manifest_path)).files == {}
+    IngestManifest(str(manifest_path)).save()
+    assert json.loads(manifest_path.read_text())["files"] == {}
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import pytest
+
+main = pytest.importorskip("app.main")
+
+class StreamingEngine:
+    """query_stream yields one event, then blocks like a slow LLM stream"""
+
+    def __init__(self):
+        self.closed = threading.Event()
+        self.release = threading.Event()
+
+    def query_stream(self, question, n_results, where, mode):
+        # Held here so only an explicit close, not garbage collection, ends it
+        self.stream = self._events()
+        return self.stream
+
+    def _events(self):
+        try:
+            yield {"event": "context", "data": []}
+            self.release.wait(5)
+            yield {"event": "token", "data": "answer"}
+        finally:
+            self.closed.set()
+
+def _query():
+    return main.Query(question="what rhymes with moon?")
+
+def test_disconnect_between_events_closes_the_stream():
+    engine = StreamingEngine()
+
+    async def disconnect():
+        events = main._stream_query_events(engine, _query())
+        assert "context" in await events.__anext__()
+        await events.aclose()
+    asyncio.run(disconnect())
+    assert engine.closed.is_set()
+
+def test_disconnect_while_waiting_closes_the_stream_once_the_step_returns():
+    engine = StreamingEngine()
+
+    async def disconnect():
+        events = main._stream_query_events(engine, _query())
+        await events.__anext__()
+        waiting = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+    asyncio.run(disconnect())
+    assert not engine.closed.is_set()
+    engine.release.set()
+    assert engine.closed.wait(5)
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from app.rag.vector_store import VectorStore
+
+projection = pytest.importorskip("app.rag.visualization.projection")
+
+@pytest.fixture
+def store(tmp_path):
+    store = VectorStore("test", backend="numpy", data_dir=str(tmp_path))
+    rng = np.random.default_rng(0)
+    texts = [f"document {i}" for i in range(300)]
+    metadata = [{"source": "large.json" if i < 290 else "small.json"} for i in range(300)]
+    store.add_documents(texts, rng.standard_normal((300, 8)).astype(np.float32), metadata)
+    return store
+
+def test_label_pass_reads_no_vectors(store, monkeypatch):
+    requested = []
+    get = store.backend.get
+
+    def spy(ids, include=None):
+        requested.append((len(ids), tuple(include)))
+        return get(ids, include)
+    monkeypatch.setattr(store.backend, "get", spy)
+
+    sample = projection.sample_collection(store, max_points=20)
+    assert len(sample["ids"]) == 20 and len(sample["embeddings"]) == 20
+    assert "small.json" in {metadata["source"] for metadata in sample["metadatas"]}
+    # Every vector read was for a sampled document
+    assert sum(n for n, include in requested if "embeddings" in include) == 20
+    assert (300, ("metadatas",)) in requested
+
+def test_small_collection_is_returned_whole(store):
+    sample = projection.sample_collection(store, max_points=1000)
+    assert len(sample["ids"]) == 300
+    assert all(len(embedding) == 8 for embedding in sample["embeddings"])
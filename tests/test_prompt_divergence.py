@@ -0,0 +1,40 @@
+import random
+import numpy as np
+import pytest
+from percipientlab_sandbox.tools.prompt_divergence import DivergenceAccumulator, divergence
+
+def _outputs(seed, count=1000):
+    rng = random.Random(seed)
+    return ["x" * rng.randint(0, 300) for _ in range(count)]
+
+def _batch_divergence(outputs):
+    lengths = np.array([len(output) for output in outputs], dtype=np.float64)
+    mean = lengths.mean()
+    return max(outputs, key=lambda output: abs(len(output) - mean)), float(lengths.var())
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("chunk_size", [1, 7, 65536])
+def test_chunked_stream_equals_batch(seed, chunk_size):
+    outputs = _outputs(seed)
+    most_divergent, variance = DivergenceAccumulator().update(iter(outputs), chunk_size).result()
+    expected, expected_variance = _batch_divergence(outputs)
+    assert most_divergent == expected
+    assert variance == pytest.approx(expected_variance, rel=1e-9)
+
+def test_single_adds_and_chunks_can_be_mixed():
+    outputs = _outputs(7)
+    accumulator = DivergenceAccumulator()
+    for output in outputs[:300]:
+        accumulator.add(output)
+    accumulator.update(outputs[300:], chunk_size=64)
+    expected, expected_variance = _batch_divergence(outputs)
+    assert accumulator.result()[0] == expected
+    assert accumulator.result()[1] == pytest.approx(expected_variance, rel=1e-9)
+
+def test_ties_go_to_the_first_output():
+    outputs = ["aaaa", "aa", "a" * 6, "bb", "b" * 6]
+    assert divergence("prompt", outputs) == _batch_divergence(outputs) == ("aa", pytest.approx(3.2))
+    assert divergence("prompt", (output for output in ["ccc", "c", "ccccc"])) == ("c", pytest.approx(8 / 3))
+
+def test_no_outputs():
+    assert divergence("prompt", []) == ("", 0.0)
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from app.rag.visualization.similarity import row_tiles, similarity_edges, similarity_matrix
+
+def _unit_embeddings(n=97, dim=12, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+@pytest.mark.parametrize("n,tile_elements", [(10, 1), (97, 200), (97, 1 << 24), (0, 100)])
+def test_row_tiles_cover_every_row_once(n, tile_elements):
+    rows = [row for start, end in row_tiles(n, tile_elements) for row in range(start, end)]
+    assert rows == list(range(n))
+
+@pytest.mark.parametrize("tile_elements", [1, 300, 1 << 24])
+def test_tiled_matrix_equals_dense(tile_elements):
+    embeddings = _unit_embeddings()
+    assert np.allclose(similarity_matrix(embeddings, tile_elements), embeddings @ embeddings.T, atol=1e-6)
+
+@pytest.mark.parametrize("tile_elements", [1, 300, 1 << 24])
+def test_tiled_edges_equal_dense_all_pairs(tile_elements):
+    embeddings = _unit_embeddings()
+    threshold = 0.3
+    dense = embeddings @ embeddings.T
+    expected = [(i, j) for i in range(len(dense)) for j in range(i + 1, len(dense)) if dense[i, j] > threshold]
+
+    sources, targets, weights = similarity_edges(embeddings, threshold, tile_elements)
+    assert expected
+    assert list(zip(sources.tolist(), targets.tolist())) == expected
+    assert np.allclose(weights, [dense[i, j] for i, j in expected], atol=1e-6)
+
+def test_no_edges_for_tiny_inputs():
+    for n in (0, 1):
+        sources, targets, weights = similarity_edges(_unit_embeddings(n=n), 0.0)
+        assert len(sources) == len(targets) == len(weights) == 0
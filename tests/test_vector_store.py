@@ -0,0 +1,79 @@
+import threading
+import numpy as np
+import pytest
+from app.rag.vector_store import VectorStore
+
+def test_concurrent_writers_lose_nothing(tmp_path):
+    store = VectorStore("test", backend="numpy", data_dir=str(tmp_path))
+    errors = []
+
+    def write(worker):
+        rng = np.random.default_rng(worker)
+        try:
+            for batch in range(5):
+                texts = [f"worker {worker} batch {batch} text {i}" for i in range(10)]
+                store.add_documents(texts, rng.standard_normal((10, 8)).astype(np.float32))
+            if worker == 0:
+                store.delete([store.ids()[0]])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert store.count() == 4 * 5 * 10 - 1
+    assert store.keyword_index.count() == store.count()
+    # Without signatures (dedup off) the near-duplicate index is not written
+    assert store.near_duplicates.count() == 0
+
+def test_near_duplicates_are_backfilled_when_dedup_is_turned_on(tmp_path):
+    store = VectorStore("test", backend="numpy", data_dir=str(tmp_path))
+    message = ("the harbor lantern swings in the salt wind over the orchard while the night ferry "
+               "waits at the pier, the river keeps its silver counsel under the old stone bridge, "
+               "and the willow roots drink slowly from the meadow stream until the morning comes")
+    texts = [f"[night {i}] {message}" for i in range(3)]
+    store.add_documents(texts, np.eye(3, 8, dtype=np.float32))
+    assert store.near_duplicates.count() == 0
+
+    matches, signatures = store.find_near_duplicates([f"[night 9] {message}", "something else entirely"])
+    assert matches[0] in store.ids() and matches[1] is None
+    assert store.near_duplicates.count() == 3
+
+    # Documents added with signatures keep the index in step
+    store.add_documents(["something else entirely"], np.ones((1, 8), np.float32), signatures=signatures[1:])
+    assert store.near_duplicates.count() == store.count() == 4
+
+def _store_with_keyword(tmp_path):
+    store = VectorStore("test", backend="numpy", data_dir=str(tmp_path))
+    rng = np.random.default_rng(0)
+    texts = [f"common words about the sea number {i}" for i in range(50)]
+    texts[30] += " zx81"
+    embeddings = rng.standard_normal((50, 8)).astype(np.float32)
+    store.add_documents(texts, embeddings, [{"n": i} for i in range(50)])
+    return store, texts, embeddings
+
+def test_hybrid_surfaces_exact_token_match(tmp_path):
+    store, texts, embeddings = _store_with_keyword(tmp_path)
+    vector_hits = store.query(embeddings[0], 3, query_text="zx81")
+    assert not any("zx81" in hit["document"] for hit in vector_hits)
+
+    hits = store.query(embeddings[0], 3, mode="hybrid", query_text="zx81")
+    assert {texts[0], texts[30]} <= {hit["document"] for hit in hits}
+    assert all(hit["score"] > 0 for hit in hits)
+    # Keyword-only hits get their distance filled in from the stored vector
+    hit = next(hit for hit in hits if hit["document"] == texts[30])
+    assert hit["distance"] == pytest.approx(float(((embeddings[30] - embeddings[0]) ** 2).sum()), rel=1e-4)
+
+def test_hybrid_applies_where_to_both_searches(tmp_path):
+    store, texts, embeddings = _store_with_keyword(tmp_path)
+    hits = store.query(embeddings[0], 5, where={"n": {"$gte": 20}}, mode="hybrid", query_text="zx81")
+    assert hits and all(hit["metadata"]["n"] >= 20 for hit in hits)
+    assert texts[30] in {hit["document"] for hit in hits}
+
+def test_hybrid_needs_query_text(tmp_path):
+    store, _, embeddings = _store_with_keyword(tmp_path)
+    with pytest.raises(ValueError):
+        store.query(embeddings[0], 3, mode="hybrid")
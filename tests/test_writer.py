@@ -0,0 +1,67 @@
+import threading
+import time
+from multiprocessing.connection import Listener
+import pytest
+
+writer = pytest.importorskip("app.writer")
+
+AUTHKEY = b"test"
+
+class BlockingServices:
+    """Writer-side services whose ingest blocks until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def ingest(self, directory_path, batch_size=None, workers=None, incremental=True):
+        self.release.wait(10)
+        return {"processed_files": 1}
+
+    def ingest_jobs(self):
+        return [{"job_id": "abc", "status": "running"}]
+
+    def cancel_ingest_job(self, job_id):
+        return {"job_id": job_id, "status": "cancelling"}
+
+@pytest.fixture
+def running_writer():
+    services = BlockingServices()
+    listener = Listener(("127.0.0.1", 0), authkey=AUTHKEY)
+    # Daemon: accept() blocks for good once the test is over
+    threading.Thread(target=writer.accept_requests, args=(listener, services), daemon=True).start()
+    yield services, listener.address
+    services.release.set()
+    listener.close()
+
+def test_status_calls_are_answered_during_a_sync_ingest(running_writer):
+    services, address = running_writer
+    results = {}
+    ingest = threading.Thread(target=lambda: results.setdefault(
+        "ingest", writer.WriterClient(address, AUTHKEY, timeout=10).call("ingest", "/data")))
+    ingest.start()
+    time.sleep(0.1)
+
+    client = writer.WriterClient(address, AUTHKEY, timeout=2)
+    assert client.call("ingest_jobs") == [{"job_id": "abc", "status": "running"}]
+    assert client.call("cancel_ingest_job", "abc")["status"] == "cancelling"
+    assert ingest.is_alive()
+
+    services.release.set()
+    ingest.join(5)
+    assert results["ingest"] == {"processed_files": 1}
+
+def test_call_times_out_instead_of_waiting_forever(running_writer):
+    _, address = running_writer
+    with pytest.raises(RuntimeError, match="did not answer"):
+        writer.WriterClient(address, AUTHKEY, timeout=0.2).call("ingest", "/data")
+
+def test_unknown_method_is_an_error(running_writer):
+    _, address = running_writer
+    with pytest.raises(RuntimeError, match="Unknown writer method"):
+        writer.WriterClient(address, AUTHKEY, timeout=2).call("shutdown")
+
+def test_empty_authkey_is_refused():
+    with pytest.raises(ValueError, match="RAG_WRITER_AUTHKEY"):
+        writer.WriterClient(("127.0.0.1", 1), b"")
+    with pytest.raises(ValueError, match="RAG_WRITER_AUTHKEY"):
+        writer.serve(("127.0.0.1", 0), b"")